@@ -24,10 +24,12 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import re
 from threading import Thread
+import time
 
-from boac import std_commit
+from boac import db, std_commit
 from boac.externals import data_loch
 from boac.merged.sis_terms import all_term_ids, current_term_id
 from boac.models.alert import Alert
@@ -90,10 +92,11 @@ def continue_request_handler():
         }
 
 
-def background_thread_refresh(app_arg, term_id):
+def background_thread_refresh(app_arg, term_id, continuation=False):
     with app_arg.app_context():
         try:
-            refresh_current_term_index()
+            if not continuation:
+                refresh_current_term_index()
             load_term(term_id)
             JobProgress().end()
         except Exception as e:
@@ -122,23 +125,111 @@ def load_term(term_id=current_term_id(use_cache=False)):
         load_all_terms()
         return
 
-    JobProgress().update(f'About to refresh alerts for term {term_id}')
-    refresh_alerts(term_id)
-
+    steps = [RefreshStep('alerts', 'alerts', refresh_alerts, term_id=term_id)]
     if term_id == current_term_id():
-        JobProgress().update('About to refresh department memberships')
-        refresh_department_memberships()
-        JobProgress().update('About to refresh CalNet attributes for active users')
-        refresh_calnet_attributes()
-        JobProgress().update('About to load filtered cohort counts')
-        load_filtered_cohort_counts()
-        JobProgress().update('About to update curated group memberships')
-        update_curated_group_lists()
+        steps += [
+            RefreshStep('department_memberships', 'department memberships', refresh_department_memberships),
+            RefreshStep(
+                'calnet_attributes',
+                'CalNet attributes for active users',
+                refresh_calnet_attributes,
+                depends_on=['department_memberships'],
+            ),
+            RefreshStep(
+                'filtered_cohort_counts',
+                'filtered cohort counts',
+                load_filtered_cohort_counts,
+                depends_on=['alerts', 'department_memberships'],
+            ),
+            RefreshStep('curated_group_lists', 'curated group memberships', update_curated_group_lists),
+            RefreshStep('note_search_index', 'advising note search index', refresh_note_search_index),
+        ]
+    run_refresh_steps(term_id, steps)
+
+
+class RefreshStep:
+
+    def __init__(self, name, description, method, depends_on=(), **kwargs):
+        self.name = name
+        self.description = description
+        self.method = method
+        self.depends_on = set(depends_on)
+        self.kwargs = kwargs
+
+    def checkpoint_key(self, term_id):
+        return f'{term_id}:{self.name}'
+
+    def run(self):
+        start = time.perf_counter()
+        self.method(**self.kwargs)
+        std_commit()
+        return time.perf_counter() - start
+
+
+def run_refresh_steps(term_id, steps):
+    """Run steps in dependency order, skipping those already checkpointed by an interrupted run of the same job.
+
+    Steps are listed in an order that satisfies their dependencies. Unless REFRESH_JOB_MAX_WORKERS is 1, steps whose
+    dependencies are complete run concurrently.
+    """
+    checkpoints = JobProgress().checkpoints()
+    completed = set()
+    pending = []
+    for step in steps:
+        if step.checkpoint_key(term_id) in checkpoints:
+            app.logger.info(f'Skipping {step.description} for term {term_id}: already done')
+            completed.add(step.name)
+        else:
+            pending.append(step)
+    max_workers = app.config['REFRESH_JOB_MAX_WORKERS']
+    if max_workers > 1 and len(pending) > 1:
+        _run_steps_concurrently(term_id, pending, completed, max_workers)
+    else:
+        for step in pending:
+            JobProgress().update(f'About to refresh {step.description} for term {term_id}')
+            duration = step.run()
+            JobProgress().checkpoint(step.checkpoint_key(term_id), duration)
+
+
+def _run_steps_concurrently(term_id, pending, completed, max_workers):
+    failure = None
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresh_step') as executor:
+        while pending or running:
+            for step in [s for s in pending if s.depends_on <= completed]:
+                pending.remove(step)
+                JobProgress().update(f'About to refresh {step.description} for term {term_id}')
+                running[executor.submit(_run_step_in_app_context, app._get_current_object(), step)] = step
+            if not running:
+                raise ValueError(f'Refresh steps with unmet dependencies: {[s.name for s in pending]}')
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    duration = future.result()
+                except Exception as e:
+                    app.logger.exception(f'Failed to refresh {step.description} for term {term_id}')
+                    # Let running steps finish and checkpoint, but start no new ones.
+                    failure = failure or e
+                    pending = []
+                    continue
+                completed.add(step.name)
+                JobProgress().checkpoint(step.checkpoint_key(term_id), duration)
+    if failure:
+        raise failure
+
+
+def _run_step_in_app_context(app_arg, step):
+    # Flask-SQLAlchemy scopes sessions to the thread, so each step gets a DB session of its own.
+    with app_arg.app_context():
+        try:
+            return step.run()
+        finally:
+            db.session.remove()
 
 
 def refresh_alerts(term_id):
-    Alert.deactivate_all_for_term(term_id)
-    Alert.update_all_for_term(term_id)
+    Alert.refresh_all_for_term(term_id)
 
 
 def refresh_calnet_attributes():
@@ -146,15 +237,22 @@ def refresh_calnet_attributes():
     from boac.models.authorized_user import AuthorizedUser
     from boac.models import json_cache
     active_uids = {u.uid for u in AuthorizedUser.get_all_active_users()}
-    json_cache.clear('calnet_user_for_uid_%')
+    # Unknown users' negative entries are left to expire on their own schedule.
+    json_cache.expire('calnet_user_for_uid_%', keep_negative=True)
     new_attrs = calnet.get_calnet_users_for_uids(app, active_uids)
     app.logger.info(f'Cached {len(new_attrs)} CalNet records for {len(active_uids)} active users')
 
 
+def refresh_note_search_index():
+    from boac.models.note_search_index import NoteSearchIndex
+    NoteSearchIndex.sync_loch_notes()
+
+
 def refresh_current_term_index():
     from boac.merged import sis_terms
     from boac.models import json_cache
     json_cache.clear('current_term_index')
+    sis_terms.reset_term_snapshot()
     sis_terms.get_current_term_index()
     app.logger.info('Cached current and future SIS terms')
 
@@ -203,15 +301,13 @@ def refresh_department_memberships():
 
 
 def load_filtered_cohort_counts():
+    from boac.merged.cohort_filter_options import get_option_catalog
     from boac.models.cohort_filter import CohortFilter
     from boac.models import json_cache
     json_cache.clear('cohort_filter_options_%')
-    for cohort in CohortFilter.query.all():
-        # Remove!
-        cohort.clear_sids_and_student_count()
-        cohort.update_alert_count(None)
-        # Reload!
-        cohort.to_api_json(include_students=False, include_alerts_for_user_id=cohort.owner_id)
+    # Rebuild the option catalog once, up front, for all cohorts and workers to share.
+    get_option_catalog()
+    CohortFilter.refresh_all_sids_and_counts()
 
 
 def update_curated_group_lists():
@@ -109,9 +109,12 @@ def get_cohort(cohort_id):
     offset = get_param(request.args, 'offset', 0)
     limit = get_param(request.args, 'limit', 50)
     term_id = get_param(request.args, 'termId', None)
+    # An opaque 'nextCursor' from a previous page takes the place of offset.
+    cursor = get_param(request.args, 'cursor', None)
     benchmark('begin cohort filter query')
     cohort = CohortFilter.find_by_id(
         int(cohort_id),
+        cursor=cursor,
         order_by=order_by,
         offset=int(offset),
         limit=int(limit),
@@ -180,6 +183,7 @@ def get_cohort_per_filters():
     offset = get_param(params, 'offset', 0)
     limit = get_param(params, 'limit', 50)
     term_id = get_param(params, 'termId', None)
+    cursor = get_param(params, 'cursor', None)
     filter_keys = list(map(lambda f: f['key'], filters))
     if is_unauthorized_search(filter_keys, order_by):
         raise ForbiddenRequestError('You are unauthorized to access student data managed by other departments')
@@ -187,6 +191,7 @@ def get_cohort_per_filters():
     cohort = _construct_phantom_cohort(
         domain=domain,
         filters=filters,
+        cursor=cursor,
         order_by=order_by,
         offset=int(offset),
         limit=int(limit),
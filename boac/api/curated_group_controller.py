@@ -94,8 +94,10 @@ def get_curated_group(curated_group_id):
     limit = get_param(request.args, 'limit', 50)
     order_by = get_param(request.args, 'orderBy', 'last_name')
     term_id = get_param(request.args, 'termId', None)
+    cursor = get_param(request.args, 'cursor', None)
     curated_group = _curated_group_with_complete_student_profiles(
         curated_group_id=curated_group_id,
+        cursor=cursor,
         limit=int(limit),
         offset=int(offset),
         order_by=order_by,
@@ -209,6 +211,7 @@ def rename_curated_group():
 
 def _curated_group_with_complete_student_profiles(
         curated_group_id,
+        cursor=None,
         order_by='last_name',
         term_id=None,
         offset=0,
@@ -221,7 +224,7 @@ def _curated_group_with_complete_student_profiles(
         raise ResourceNotFoundError(f'Sorry, no curated group found with id {curated_group_id}.')
     if not _can_current_user_view_curated_group(curated_group):
         raise ForbiddenRequestError(f'Current user, {current_user.get_uid()}, cannot view curated group {curated_group.id}')
-    api_json = curated_group.to_api_json(include_students=True, limit=limit, offset=offset, order_by=order_by)
+    api_json = curated_group.to_api_json(include_students=True, limit=limit, offset=offset, order_by=order_by, cursor=cursor)
     sids = [s['sid'] for s in api_json['students']]
     benchmark('begin profile query')
     if curated_group.domain == 'admitted_students':
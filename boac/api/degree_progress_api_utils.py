@@ -47,12 +47,13 @@ def create_batch_degree_checks(template_id, sids):
     benchmark = get_benchmarker(f'create_batch_degree_checks template_id={template_id}')
     benchmark('begin')
     template = fetch_degree_template(template_id)
-    created_by = current_user.get_id()
-    results_by_sid = {}
     benchmark(f'creating {len(sids)} clones')
-    for sid in sids:
-        degree_check = clone(template, created_by, sid=sid)
-        results_by_sid[sid] = degree_check.id
+    results_by_sid = DegreeProgressTemplate.create_batch_clones(
+        template_id=template.id,
+        advisor_dept_codes=dept_codes_where_advising(current_user),
+        created_by=current_user.get_id(),
+        sids=sids,
+    )
     benchmark('end')
     return results_by_sid
 
@@ -239,6 +239,7 @@ def _student_search(search_phrase, params, order_by):
         order_by=order_by,
         offset=util.get(params, 'offset', 0),
         limit=util.get(params, 'limit', 50),
+        cursor=util.get(params, 'cursor'),
     )
     students = student_results['students']
     sids = [s['sid'] for s in students]
@@ -246,6 +247,7 @@ def _student_search(search_phrase, params, order_by):
     add_alert_counts(alert_counts, students)
     benchmark('end')
     return {
+        'nextCursor': student_results['nextCursor'],
         'students': students,
         'totalStudentCount': student_results['totalStudentCount'],
     }
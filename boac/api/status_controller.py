@@ -26,6 +26,8 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from boac import db
 from boac.externals import data_loch
 from boac.lib.http import tolerant_jsonify
+from boac.merged.student_profile_cache import profile_cache_stats
+from boac.models import json_cache
 from flask import current_app as app
 
 
@@ -47,5 +49,8 @@ def app_status():
         'app': True,
         'db': db_status(),
         'data_loch': data_loch_status(),
+        'data_loch_pool': data_loch.pool_stats(),
+        'json_cache': json_cache.memory_tier_stats(),
+        'student_profile_cache': profile_cache_stats(),
     }
     return tolerant_jsonify(resp)
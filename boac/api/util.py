@@ -24,12 +24,13 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from functools import wraps
+from itertools import islice
 import json
 
 from boac.api.errors import BadRequestError, ResourceNotFoundError
-from boac.externals.data_loch import get_admitted_students_by_sids, get_sis_holds, get_student_profiles
+from boac.externals.data_loch import get_admitted_students_by_sids, get_sis_holds, iter_student_profiles_by_name
 from boac.lib.berkeley import dept_codes_where_advising, previous_term_id
-from boac.lib.http import response_with_csv_download
+from boac.lib.http import response_with_csv_download, response_with_streaming_csv_download
 from boac.lib.util import get_benchmarker, join_if_present
 from boac.merged import calnet
 from boac.merged.advising_appointment import get_advising_appointments
@@ -456,9 +457,9 @@ def response_with_students_csv_download(benchmark, domain, fieldnames, sids):
 
 
 def _response_with_students_csv_download(sids, fieldnames, benchmark):
-    term_id_last = previous_term_id(current_term_id())
+    term_id_current = current_term_id()
+    term_id_last = previous_term_id(term_id_current)
     term_id_previous = previous_term_id(term_id_last)
-    rows = []
     getters = {
         'first_name': lambda profile: profile.get('firstName'),
         'last_name': lambda profile: profile.get('lastName'),
@@ -497,28 +498,29 @@ def _response_with_students_csv_download(sids, fieldnames, benchmark):
                                                     in (profile.get('sisProfile', {}).get('intendedMajors') or [])]),
         'units_in_progress': lambda profile: profile.get('enrolledUnits', {}),
     }
-    term_gpas = get_term_gpas_by_sid(sids)
-    term_units = get_term_units_by_sid(current_term_id(), sids)
-
-    def _add_row(student_profile):
-        student_profile['termGpa'] = term_gpas.get(student_profile['sid'], {})
-        student_profile['enrolledUnits'] = term_units.get(student_profile['sid'], '0')
-
-        row = {}
-        for fieldname in fieldnames:
-            row[fieldname] = getters[fieldname](student_profile)
-        rows.append(row)
-
-    students = get_student_profiles(sids=sids)
-    for student in students:
-        profile = student.get('profile')
-        if profile:
-            _add_row(json.loads(profile))
-
-    benchmark('end')
-
-    return response_with_csv_download(
-        rows=sorted(rows, key=lambda r: (_norm(r, 'last_name'), _norm(r, 'first_name'), _norm(r, 'sid'))),
+    # Rows come back from the loch in the order they are written, matching the name sort used for other CSV downloads.
+    name_columns = [f for f in ('last_name', 'first_name') if f in fieldnames]
+
+    def _rows():
+        profiles = iter_student_profiles_by_name(sids, name_columns=name_columns)
+        while True:
+            batch = list(islice(profiles, app.config['DATA_LOCH_FETCH_BATCH_SIZE']))
+            if not batch:
+                break
+            batch_sids = [sid for sid, profile in batch]
+            term_gpas = get_term_gpas_by_sid(batch_sids)
+            term_units = get_term_units_by_sid(term_id_current, batch_sids)
+            for sid, profile in batch:
+                student_profile = profile and json.loads(profile)
+                if not student_profile:
+                    continue
+                student_profile['termGpa'] = term_gpas.get(sid, {})
+                student_profile['enrolledUnits'] = term_units.get(sid, '0')
+                yield {fieldname: getters[fieldname](student_profile) for fieldname in fieldnames}
+        benchmark('end')
+
+    return response_with_streaming_csv_download(
+        rows=_rows(),
         filename_prefix='cohort',
         fieldnames=fieldnames,
     )
@@ -548,37 +550,37 @@ def _norm(row, key):
 
 
 def _has_role_in_any_department(user, role):
-    return next((d for d in user.departments if d['role'] == role), False)
+    return next((dept_code for dept_code, r in user.principal.department_roles if r == role), False)
 
 
 def _is_advisor_in_department(user, dept):
-    return next((d for d in user.departments if d['code'] == dept and d['role'] in ('advisor', 'director')), False)
+    return next((c for c, role in user.principal.department_roles if c == dept and role in ('advisor', 'director')), False)
 
 
 def _is_drop_in_advisor(user):
-    return next((d for d in user.drop_in_advisor_departments if d['deptCode'] in app.config['DEPARTMENTS_SUPPORTING_DROP_INS']), False)
+    return next((c for c in user.principal.drop_in_dept_codes if c in app.config['DEPARTMENTS_SUPPORTING_DROP_INS']), False)
 
 
 def _is_drop_in_enabled(user):
-    return next((d for d in user.departments if d['code'] in app.config['DEPARTMENTS_SUPPORTING_DROP_INS']), False)
+    return next((c for c, role in user.principal.department_roles if c in app.config['DEPARTMENTS_SUPPORTING_DROP_INS']), False)
 
 
 def _is_drop_in_scheduler(user):
-    scheduler_dept = _has_role_in_any_department(current_user, 'scheduler')
-    return scheduler_dept and scheduler_dept['code'] in app.config['DEPARTMENTS_SUPPORTING_DROP_INS']
+    scheduler_dept_code = _has_role_in_any_department(current_user, 'scheduler')
+    return scheduler_dept_code and scheduler_dept_code in app.config['DEPARTMENTS_SUPPORTING_DROP_INS']
 
 
 def _is_same_day_advisor(user):
-    return next((d for d in user.same_day_advisor_departments if d['deptCode'] in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS']), False)
+    return next((c for c in user.principal.same_day_dept_codes if c in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS']), False)
 
 
 def _is_same_day_enabled(user):
-    return next((d for d in user.departments if d['code'] in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS']), False)
+    return next((c for c, role in user.principal.department_roles if c in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS']), False)
 
 
 def _is_same_day_scheduler(user):
-    scheduler_dept = _has_role_in_any_department(current_user, 'scheduler')
-    return scheduler_dept and scheduler_dept['code'] in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS']
+    scheduler_dept_code = _has_role_in_any_department(current_user, 'scheduler')
+    return scheduler_dept_code and scheduler_dept_code in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS']
 
 
 def _api_key_ok():
@@ -25,9 +25,11 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 import os
 import ssl
+from threading import Lock
 
 from boac.lib import mockingbird
 import ldap3
+from ldap3.core.exceptions import LDAPServerPoolExhaustedError, LDAPSocketOpenError
 
 SCHEMA_DICT = {
     'berkeleyEduAffiliations': 'affiliations',
@@ -44,8 +46,23 @@ SCHEMA_DICT = {
     'uid': 'uid',
 }
 
+ACTIVE_OUS = ['people', 'advcon people']
+EXPIRED_OUS = ['expired people']
+
 BATCH_QUERY_MAXIMUM = 500
 
+SEARCH_BASE = 'dc=berkeley,dc=edu'
+
+# An unavailable server is checked this many times before the pool gives up, and is then left out for this many seconds.
+# Neither may be unbounded: ldap3 would otherwise wait forever on a server marked offline.
+SERVER_POOL_ACTIVE_TRIES = 3
+SERVER_POOL_EXHAUST_SECONDS = 60
+
+# Pooled connections, by LDAP host, are shared by all clients in this process so that TLS handshakes and binds are
+# not repeated per search.
+pooled_connections = {}
+pooled_connections_lock = Lock()
+
 
 def client(app):
     if mockingbird._environment_supports_mocks():
@@ -62,37 +79,78 @@ class Client:
         self.bind = app.config['LDAP_BIND']
         self.password = app.config['LDAP_PASSWORD']
         tls = ldap3.Tls(validate=ssl.CERT_REQUIRED)
-        server = ldap3.Server(self.host, port=636, use_ssl=True, get_info=ldap3.ALL, tls=tls)
+        server = ldap3.Server(
+            self.host,
+            port=636,
+            use_ssl=True,
+            get_info=ldap3.ALL,
+            tls=tls,
+            connect_timeout=app.config['LDAP_CONNECT_TIMEOUT'],
+        )
         self.server = server
 
     def connect(self):
-        conn = ldap3.Connection(self.server, user=self.bind, password=self.password, auto_bind=ldap3.AUTO_BIND_TLS_BEFORE_BIND)
-        return conn
-
-    def search_csids(self, csids, search_expired=False):
-        all_out = []
-        for i in range(0, len(csids), BATCH_QUERY_MAXIMUM):
-            csids_batch = csids[i:i + BATCH_QUERY_MAXIMUM]
-            with self.connect() as conn:
-                search_filter = self._ldap_search_filter(csids_batch, 'berkeleyeducsid', search_expired)
-                conn.search('dc=berkeley,dc=edu', search_filter, attributes=ldap3.ALL_ATTRIBUTES)
-                all_out += [_attributes_to_dict(entry, search_expired) for entry in conn.entries]
-        return all_out
-
-    def search_uids(self, uids, search_expired=False):
-        all_out = []
-        for i in range(0, len(uids), BATCH_QUERY_MAXIMUM):
-            uids_batch = uids[i:i + BATCH_QUERY_MAXIMUM]
-            with self.connect() as conn:
-                search_filter = self._ldap_search_filter(uids_batch, 'uid', search_expired)
-                conn.search('dc=berkeley,dc=edu', search_filter, attributes=ldap3.ALL_ATTRIBUTES)
-                all_out += [_attributes_to_dict(entry, search_expired) for entry in conn.entries]
-        return all_out
+        with pooled_connections_lock:
+            conn = pooled_connections.get(self.host)
+            if conn is None:
+                conn = ldap3.Connection(
+                    ldap3.ServerPool(
+                        [self.server],
+                        ldap3.ROUND_ROBIN,
+                        active=SERVER_POOL_ACTIVE_TRIES,
+                        exhaust=SERVER_POOL_EXHAUST_SECONDS,
+                    ),
+                    user=self.bind,
+                    password=self.password,
+                    auto_bind=ldap3.AUTO_BIND_TLS_BEFORE_BIND,
+                    client_strategy=ldap3.REUSABLE,
+                    pool_name=f'calnet_{self.host}',
+                    pool_size=self.app.config['LDAP_POOL_SIZE'],
+                    pool_lifetime=self.app.config['LDAP_POOL_LIFETIME'],
+                    receive_timeout=self.app.config['LDAP_RECEIVE_TIMEOUT'],
+                )
+                pooled_connections[self.host] = conn
+            return conn
+
+    def search_csids(self, csids, include_expired=False):
+        return self._search_in_batches(csids, 'berkeleyeducsid', include_expired)
+
+    def search_uids(self, uids, include_expired=False):
+        return self._search_in_batches(uids, 'uid', include_expired)
+
+    def _search_in_batches(self, ids, id_type, include_expired):
+        conn = self.connect()
+        try:
+            responses = self._search(conn, ids, id_type, include_expired)
+        except (LDAPServerPoolExhaustedError, LDAPSocketOpenError):
+            # Let the next search start over with a new pooled connection.
+            with pooled_connections_lock:
+                if pooled_connections.get(self.host) is conn:
+                    del pooled_connections[self.host]
+            raise
+        return [_attributes_to_dict(r['attributes']) for response in responses for r in response or [] if r['type'] == 'searchResEntry']
+
+    def _search(self, conn, ids, id_type, include_expired):
+        search_filters = [
+            self._ldap_search_filter(ids[i:i + BATCH_QUERY_MAXIMUM], id_type, include_expired)
+            for i in range(0, len(ids), BATCH_QUERY_MAXIMUM)
+        ]
+        if conn.strategy.sync:
+            responses = []
+            for search_filter in search_filters:
+                conn.search(SEARCH_BASE, search_filter, attributes=ldap3.ALL_ATTRIBUTES)
+                responses.append(conn.response)
+        else:
+            # Searches queue up on the pool, whose connections work through them concurrently.
+            message_ids = [conn.search(SEARCH_BASE, f, attributes=ldap3.ALL_ATTRIBUTES) for f in search_filters]
+            responses = [conn.get_response(message_id)[0] for message_id in message_ids]
+        return responses
 
     @classmethod
-    def _ldap_search_filter(cls, ids, id_type, search_expired=False):
+    def _ldap_search_filter(cls, ids, id_type, include_expired=False):
         ids_filter = ''.join(f'({id_type}={_id})' for _id in ids)
-        ou_scope = '(ou=expired people)' if search_expired else '(ou=people) (ou=advcon people)'
+        ous = ACTIVE_OUS + EXPIRED_OUS if include_expired else ACTIVE_OUS
+        ou_scope = ' '.join(f'(ou={ou})' for ou in ous)
         return f"""(&
             (objectclass=person)
             (|
@@ -116,26 +174,38 @@ class MockClient(Client):
     def connect(self):
         conn = ldap3.Connection(self.server, user=self.bind, password=self.password, client_strategy=ldap3.MOCK_SYNC)
         conn.strategy.entries_from_json(_fixture_path('search_entries'))
+        conn.open()
+        conn.bind()
         return conn
 
 
-def _attributes_to_dict(entry, expired_per_ldap):
+def _attributes_to_dict(attributes):
     out = dict.fromkeys(SCHEMA_DICT.values(), None)
-    out['expired'] = expired_per_ldap
-    # ldap3's entry.entry_attributes_as_dict would work for us, except that it wraps a single value as a list.
+    # An entry found in both active and expired scopes is reported as active, just as the active scope is searched first.
+    ous = [ou.lower() for ou in _values(attributes.get('ou'))]
+    out['expired'] = any(ou in EXPIRED_OUS for ou in ous) and not any(ou in ACTIVE_OUS for ou in ous)
     for attr in SCHEMA_DICT:
-        if attr in entry.entry_attributes:
-            out[SCHEMA_DICT[attr]] = entry[attr].value
+        if attr in attributes:
+            # Like ldap3's Entry attribute value: a single value is unwrapped from its list.
+            values = _values(attributes[attr])
+            out[SCHEMA_DICT[attr]] = (values[0] if len(values) == 1 else values) if values else None
     return out
 
 
+def _values(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
 def _create_fixtures(app, sample_csids):
     fixture_output = os.environ.get('FIXTURE_OUTPUT_PATH') or mockingbird._get_fixtures_path()
     cl = Client(app)
+    # Responses of a pooled connection are not recorded for replay, so fixtures come from a connection of their own.
+    conn = ldap3.Connection(cl.server, user=cl.bind, password=cl.password, auto_bind=ldap3.AUTO_BIND_TLS_BEFORE_BIND)
     cl.server.info.to_file(f'{fixture_output}/calnet_server_info.json')
     cl.server.schema.to_file(f'{fixture_output}/calnet_server_schema.json')
-    conn = cl.connect()
-    conn.search('ou=people,dc=berkeley,dc=edu', cl._csids_filter(sample_csids), attributes=ldap3.ALL_ATTRIBUTES)
+    conn.search('ou=people,dc=berkeley,dc=edu', cl._ldap_search_filter(sample_csids, 'berkeleyeducsid'), attributes=ldap3.ALL_ATTRIBUTES)
     conn.response_to_file(f'{fixture_output}/calnet_search_entries.json', raw=True)
     conn.unbind()
 
@@ -26,6 +26,9 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from contextlib import contextmanager
 from datetime import datetime
 import re
+import threading
+import time
+import uuid
 
 from boac import db
 from boac.lib.berkeley import previous_term_id, sis_term_id_for_name
@@ -34,27 +37,208 @@ from boac.lib.util import join_if_present, tolerant_remove
 from flask import current_app as app
 import psycopg2
 import psycopg2.extras
-from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+
+class LochConnectionPool(ThreadedConnectionPool):
+    """Thread-safe pool that waits rather than fails when all connections are checked out.
+
+    Connections idle for longer than validate_after seconds are checked with a trivial query on checkout, so that
+    connections broken by an RDS failover are discarded before they can fail a real query.
+    """
+
+    def __init__(self, minconn, maxconn, dsn, checkout_timeout, validate_after):
+        self.checkout_timeout = checkout_timeout
+        self.validate_after = validate_after
+        self.available = threading.BoundedSemaphore(maxconn)
+        self.last_used = {}
+        self.statement_timeouts = {}
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'checkouts': 0,
+            'discarded': 0,
+            'exhausted': 0,
+            'maxWaitMs': 0,
+            'totalWaitMs': 0,
+            'waits': 0,
+        }
+        # The parent constructor warms the pool by opening minconn connections.
+        super().__init__(minconn, maxconn, dsn)
+
+    def _connect(self, key=None):
+        connection = super()._connect(key)
+        # Loch queries are read-only; autocommit spares a rollback on every checkin.
+        connection.autocommit = True
+        self.last_used[id(connection)] = time.monotonic()
+        return connection
+
+    def checkout(self, statement_timeout=None):
+        start = time.monotonic()
+        acquired = self.available.acquire(blocking=False)
+        if not acquired:
+            acquired = self.available.acquire(timeout=self.checkout_timeout)
+            self._record_wait(time.monotonic() - start, exhausted=not acquired)
+            if not acquired:
+                raise PoolError(f'No data loch connection available after {self.checkout_timeout} seconds')
+        try:
+            connection = self.getconn()
+            while not self._is_healthy(connection):
+                self._discard(connection)
+                connection = self.getconn()
+            if self.statement_timeouts.get(id(connection)) != statement_timeout:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET statement_timeout = %s', (statement_timeout or 0,))
+                self.statement_timeouts[id(connection)] = statement_timeout
+        except Exception:
+            self.available.release()
+            raise
+        with self.metrics_lock:
+            self.metrics['checkouts'] += 1
+        return connection
+
+    def checkin(self, connection, discard=False):
+        try:
+            if discard or connection.closed:
+                self._discard(connection)
+            else:
+                self.last_used[id(connection)] = time.monotonic()
+                self.putconn(connection)
+        finally:
+            self.available.release()
+
+    def stats(self):
+        with self.metrics_lock:
+            return {
+                **self.metrics,
+                'idle': len(self._pool),
+                'inUse': len(self._used),
+                'maxConnections': self.maxconn,
+                'minConnections': self.minconn,
+            }
+
+    def _discard(self, connection):
+        self.last_used.pop(id(connection), None)
+        self.statement_timeouts.pop(id(connection), None)
+        self.putconn(connection, close=True)
+        with self.metrics_lock:
+            self.metrics['discarded'] += 1
+
+    def _is_healthy(self, connection):
+        if connection.closed:
+            return False
+        if time.monotonic() - self.last_used.get(id(connection), 0) < self.validate_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error as e:
+            app.logger.warning(f'Discarding stale data loch connection: {e}')
+            return False
+
+    def _record_wait(self, wait_seconds, exhausted):
+        wait_ms = round(wait_seconds * 1000)
+        with self.metrics_lock:
+            self.metrics['waits'] += 1
+            self.metrics['totalWaitMs'] += wait_ms
+            self.metrics['maxWaitMs'] = max(self.metrics['maxWaitMs'], wait_ms)
+            if exhausted:
+                self.metrics['exhausted'] += 1
 
 
 connection_pool = None
+connection_pool_lock = threading.Lock()
 
 
-def safe_execute_rds(string, **kwargs):
+def init_connection_pool(app):
+    """Create the connection pool at app startup, warmed to DATA_LOCH_MIN_CONNECTIONS."""
     global connection_pool
+    with connection_pool_lock:
+        if connection_pool is None:
+            try:
+                connection_pool = LochConnectionPool(
+                    minconn=app.config['DATA_LOCH_MIN_CONNECTIONS'],
+                    maxconn=app.config['DATA_LOCH_MAX_CONNECTIONS'],
+                    dsn=app.config['DATA_LOCH_RDS_URI'],
+                    checkout_timeout=app.config['DATA_LOCH_POOL_CHECKOUT_TIMEOUT'],
+                    validate_after=app.config['DATA_LOCH_POOL_VALIDATE_AFTER'],
+                )
+            except psycopg2.Error as e:
+                # The pool will be created on first query instead.
+                app.logger.error(f'Failed to create data loch connection pool: {e}')
+    return connection_pool
+
+
+def pool_stats():
+    return connection_pool.stats() if connection_pool else None
+
+
+def safe_execute_rds(string, query_class=None, **kwargs):
+    """Execute SQL against the loch, subject to the statement timeout configured for query_class."""
+    if connection_pool is None:
+        init_connection_pool(app)
+    try:
+        with cursor_from_pool(query_class) as cursor:
+            return _safe_execute(string, cursor, **kwargs)
+    except (PoolError, psycopg2.Error) as e:
+        app.logger.error(f'Data loch connection unavailable: {e}')
+        return None
+
+
+def safe_execute_rds_tuples(string, query_class=None, batch_size=None, **kwargs):
+    """Yield result rows as plain tuples, in column order, streamed from a server-side cursor in batches.
+
+    Neither the client nor libpq ever holds more than one batch of rows, so bulk callers scanning a whole population
+    run in flat memory. The pooled connection is held until the generator is exhausted or closed. Unlike
+    safe_execute_rds, SQL errors are raised rather than returned as None.
+    """
     if connection_pool is None:
-        connection_pool = ThreadedConnectionPool(1, app.config['DATA_LOCH_MAX_CONNECTIONS'], app.config['DATA_LOCH_RDS_URI'])
-    with cursor_from_pool() as cursor:
-        return _safe_execute(string, cursor, **kwargs)
+        init_connection_pool(app)
+    batch_size = batch_size or app.config['DATA_LOCH_FETCH_BATCH_SIZE']
+    with server_side_cursor_from_pool(query_class) as cursor:
+        ts = datetime.now().timestamp()
+        try:
+            cursor.execute(string, kwargs)
+        except psycopg2.Error as e:
+            app.logger.error(f'SQL {string} threw {e}')
+            raise
+        row_count = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            row_count += len(rows)
+            yield from rows
+        app.logger.debug(f'Query streamed {row_count} rows in {datetime.now().timestamp() - ts} seconds:\n{string}\n{kwargs}')
+
+
+@contextmanager
+def server_side_cursor_from_pool(query_class=None):
+    # Named cursors live only within a transaction, so pooled connections leave autocommit for the duration.
+    with cursor_from_pool(query_class, cursor_factory=None) as default_cursor:
+        connection = default_cursor.connection
+        default_cursor.close()
+        connection.autocommit = False
+        try:
+            yield connection.cursor(name=f'boac_stream_{uuid.uuid4().hex}')
+        finally:
+            if not connection.closed:
+                connection.rollback()
+                connection.autocommit = True
 
 
 @contextmanager
-def cursor_from_pool():
+def cursor_from_pool(query_class=None, cursor_factory=psycopg2.extras.DictCursor):
+    timeouts = app.config['DATA_LOCH_STATEMENT_TIMEOUTS']
+    connection = connection_pool.checkout(statement_timeout=timeouts.get(query_class, timeouts.get('default')))
+    discard = False
     try:
-        connection = connection_pool.getconn()
-        yield connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        yield connection.cursor(cursor_factory=cursor_factory)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
     finally:
-        connection_pool.putconn(connection)
+        connection_pool.checkin(connection, discard=discard or connection.closed)
 
 
 def _safe_execute(sql, cursor, **kwargs):
@@ -64,6 +248,8 @@ def _safe_execute(sql, cursor, **kwargs):
         query_time = datetime.now().timestamp() - ts
     except psycopg2.Error as e:
         app.logger.error(f'SQL {sql} threw {e}')
+        if cursor.connection.closed:
+            raise
         return None
     rows = [dict(r) for r in cursor.fetchall()]
     app.logger.debug(f'Query returned {len(rows)} rows in {query_time} seconds:\n{sql}\n{kwargs}')
@@ -312,7 +498,7 @@ def get_student_by_sid(sid):
     sql = f"""SELECT spi.*
         FROM {student_schema()}.student_profile_index spi
         WHERE spi.sid = %(sid)s"""
-    rows = safe_execute_rds(sql, sid=sid)
+    rows = safe_execute_rds(sql, query_class='profile', sid=sid)
     return None if not rows or (len(rows) == 0) else rows[0]
 
 
@@ -320,7 +506,7 @@ def get_student_by_uid(uid):
     sql = f"""SELECT spi.*
         FROM {student_schema()}.student_profile_index spi
         WHERE spi.uid = %(uid)s"""
-    rows = safe_execute_rds(sql, uid=uid)
+    rows = safe_execute_rds(sql, query_class='profile', uid=uid)
     return None if not rows or (len(rows) == 0) else rows[0]
 
 
@@ -332,13 +518,29 @@ def get_sid_by_uid(uid):
     return None if not rows or (len(rows) == 0) else rows[0]['sid']
 
 
-def get_active_student_profiles(sids=None):
+def iter_active_student_profiles():
+    """Yield (sid, profile) tuples for all active students."""
     sql = f"""SELECT sp.sid, sp.profile
         FROM {student_schema()}.student_profiles sp
         JOIN {student_schema()}.student_profile_index spi
         ON sp.sid = spi.sid
         AND spi.academic_career_status = 'active'"""
-    return safe_execute_rds(sql)
+    return safe_execute_rds_tuples(sql)
+
+
+def iter_student_profiles_by_name(sids, name_columns=('last_name', 'first_name')):
+    """Yield (sid, profile) tuples ordered by the given student_profile_index name columns, then by SID.
+
+    Upper-cased names and SIDs compare by code point, as they would in a Python sort, rather than by database collation.
+    """
+    order_by = [f'UPPER(spi.{column}) COLLATE "C"' for column in name_columns if column in ('first_name', 'last_name')]
+    order_by.append('sp.sid COLLATE "C"')
+    sql = f"""SELECT sp.sid, sp.profile
+        FROM {student_schema()}.student_profiles sp
+        LEFT JOIN {student_schema()}.student_profile_index spi ON sp.sid = spi.sid
+        WHERE sp.sid = ANY(%(sids)s)
+        ORDER BY {', '.join(order_by)}"""
+    return safe_execute_rds_tuples(sql, query_class='profile', sids=sids)
 
 
 def get_basic_student_data(sids):
@@ -353,7 +555,7 @@ def get_student_profiles(sids=None):
     sql = f'SELECT sid, profile FROM {student_schema()}.student_profiles'
     if sids is not None:
         sql += ' WHERE sid = ANY(%(sids)s)'
-        return safe_execute_rds(sql, sids=sids)
+        return safe_execute_rds(sql, query_class='profile', sids=sids)
     else:
         return safe_execute_rds(sql)
 
@@ -362,11 +564,30 @@ def get_student_profile_summaries(sids=None):
     sql = f'SELECT sid, profile_summary AS profile FROM {student_schema()}.student_profiles'
     if sids is not None:
         sql += ' WHERE sid = ANY(%(sids)s)'
-        return safe_execute_rds(sql, sids=sids)
+        return safe_execute_rds(sql, query_class='profile', sids=sids)
     else:
         return safe_execute_rds(sql)
 
 
+def get_student_profiles_generation():
+    """Return a marker that changes whenever the loch's student profile tables are reloaded, truncated or replaced.
+
+    Read from the Postgres catalog and statistics views, so the check costs nothing like a scan of the profiles. Note
+    that pg_stat_user_tables counts are not updated on read replicas, where only table rewrites change the marker.
+    """
+    sql = """SELECT string_agg(
+            c.oid::text || ':' || c.relfilenode::text || ':'
+                || (COALESCE(s.n_tup_ins, 0) + COALESCE(s.n_tup_upd, 0) + COALESCE(s.n_tup_del, 0))::text,
+            ',' ORDER BY c.oid
+        ) AS generation
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE c.relname = 'student_profiles' AND n.nspname = ANY(%(schemas)s)"""
+    rows = safe_execute_rds(sql, schemas=[asc_schema(), coe_schema(), student_schema()])
+    return rows[0]['generation'] if rows else None
+
+
 def extract_valid_sids(sids):
     sql = f'SELECT sid FROM {student_schema()}.student_profiles WHERE sid = ANY(%(sids)s)'
     return safe_execute_rds(sql, sids=sids)
@@ -380,6 +601,18 @@ def get_academic_standing(sids):
     return safe_execute_rds(sql, sids=sids)
 
 
+def iter_academic_standing_for_term(term_id):
+    """Yield (sid, status, action_date) tuples of each active student's earliest academic standing action in the term."""
+    sql = f"""SELECT DISTINCT ON (ass.sid) ass.sid, ass.acad_standing_status AS status, ass.action_date
+        FROM {student_schema()}.academic_standing ass
+        JOIN {student_schema()}.student_profile_index spi
+        ON spi.sid = ass.sid
+        AND spi.academic_career_status = 'active'
+        WHERE ass.term_id = %(term_id)s
+        ORDER BY ass.sid, ass.action_date, ass.acad_standing_status"""
+    return safe_execute_rds_tuples(sql, term_id=str(term_id))
+
+
 def get_academic_standing_terms(min_term_id=0):
     return safe_execute_rds(f"""SELECT DISTINCT term_id
         FROM {student_schema()}.academic_standing
@@ -404,7 +637,7 @@ def get_enrollments_for_sid(sid, latest_term_id=None):
     if latest_term_id:
         sql += f""" AND term_id <= '{latest_term_id}'"""
     sql += ' ORDER BY term_id DESC'
-    return safe_execute_rds(sql, sid=sid)
+    return safe_execute_rds(sql, query_class='profile', sid=sid)
 
 
 def get_enrollments_for_term(term_id, sids=None):
@@ -416,6 +649,14 @@ def get_enrollments_for_term(term_id, sids=None):
     return safe_execute_rds(sql, term_id=term_id, sids=sids)
 
 
+def iter_enrollments_for_term(term_id):
+    """Yield (sid, enrollment_term) tuples for all students enrolled in the term."""
+    sql = f"""SELECT sid, enrollment_term
+        FROM {student_schema()}.student_enrollment_terms
+        WHERE term_id = %(term_id)s"""
+    return safe_execute_rds_tuples(sql, term_id=term_id)
+
+
 def get_students_by_sids(sids):
     sql = f"""SELECT spi.first_name, spi.last_name, spi.sid, spi.uid
         FROM {student_schema()}.student_profile_index spi
@@ -441,7 +682,7 @@ def match_appointment_advisors_by_name(prefixes, limit=None):
         ORDER BY a.first_name, a.last_name"""
     if limit:
         sql += f' LIMIT {limit}'
-    return safe_execute_rds(sql, **prefix_kwargs)
+    return safe_execute_rds(sql, query_class='search', **prefix_kwargs)
 
 
 def match_advising_note_authors_by_name(prefixes, limit=None):
@@ -460,7 +701,7 @@ def match_advising_note_authors_by_name(prefixes, limit=None):
         ORDER BY a.first_name, a.last_name"""
     if limit:
         sql += f' LIMIT {limit}'
-    return safe_execute_rds(sql, **prefix_kwargs)
+    return safe_execute_rds(sql, query_class='search', **prefix_kwargs)
 
 
 def match_students_by_name_or_sid(prefixes, limit=None):
@@ -485,7 +726,7 @@ def match_students_by_name_or_sid(prefixes, limit=None):
         {' '.join(conditions)}"""
     if limit:
         sql += f' LIMIT {limit}'
-    return safe_execute_rds(sql, **prefix_kwargs)
+    return safe_execute_rds(sql, query_class='search', **prefix_kwargs)
 
 
 def get_asc_advising_notes(sid):
@@ -636,6 +877,14 @@ def get_sis_advising_note_attachment(sid, filename):
     return safe_execute_rds(sql, sid=sid, filename=filename)
 
 
+def get_sis_advising_note_attachments(sid, filenames):
+    sql = f"""SELECT advising_note_id, created_by, sis_file_name, user_file_name
+        FROM {sis_advising_notes_schema()}.advising_note_attachments
+        WHERE sid = %(sid)s
+        AND sis_file_name = ANY(%(filenames)s)"""
+    return safe_execute_rds(sql, sid=sid, filenames=filenames)
+
+
 def get_sis_advising_attachments(ids):
     sql = f"""SELECT DISTINCT advising_note_id, created_by, sis_file_name, user_file_name
         FROM {sis_advising_notes_schema()}.advising_note_attachments
@@ -718,42 +967,34 @@ def search_advising_appointments(
     )
 
 
-def search_advising_notes(
-    search_phrase,
-    author_uid=None,
-    author_csid=None,
-    student_csid=None,
-    topic=None,
-    datetime_from=None,
-    datetime_to=None,
-    offset=None,
-    limit=None,
-):
-    query_columns = """an.sid, an.id, an.note_body, an.advisor_sid, an.advisor_uid,
-            an.created_by, an.created_at, an.updated_at, an.note_category, an.note_subcategory,
-            spi.uid, spi.first_name, spi.last_name, an.advisor_first_name, an.advisor_last_name"""
-    query_tables = f"""{advising_notes_schema()}.advising_notes an
-        JOIN {student_schema()}.student_profile_index spi ON an.sid = spi.sid"""
-    if search_phrase:
-        query_tables += f"""
-            JOIN {advising_notes_schema()}.advising_notes_search_index idx
-            ON idx.id = an.id
-            AND idx.fts_index @@ plainto_tsquery('english', %(search_phrase)s)"""
-    uid_advisor_filter = 'an.advisor_uid = %(advisor_uid)s' if author_uid else None
-    return search_sis_advising(
-        query_columns=query_columns,
-        query_tables=query_tables,
-        uid_advisor_filter=uid_advisor_filter,
-        search_phrase=search_phrase,
-        advisor_uid=author_uid,
-        advisor_csid=author_csid,
-        student_csid=student_csid,
-        topic=topic,
-        datetime_from=datetime_from,
-        datetime_to=datetime_to,
-        offset=offset,
-        limit=limit,
-    )
+def get_advising_note_search_rows(note_ids):
+    """Return search index source data of the given legacy advising notes, each with the hash reported by iter_advising_note_search_hashes."""
+    sql = f"""SELECT n.*, md5(n::text) AS content_hash
+        FROM ({_advising_note_search_rows_sql()}) n
+        WHERE n.id = ANY(%(note_ids)s)"""
+    return safe_execute_rds(sql, note_ids=note_ids)
+
+
+def iter_advising_note_search_hashes():
+    """Yield (id, content hash) tuples of all legacy advising notes of students in the loch."""
+    sql = f'SELECT n.id, md5(n::text) FROM ({_advising_note_search_rows_sql()}) n'
+    return safe_execute_rds_tuples(sql)
+
+
+def _advising_note_search_rows_sql():
+    return f"""SELECT an.id, an.sid, an.advisor_uid, an.advisor_sid, an.advisor_first_name, an.advisor_last_name,
+            an.note_body, an.note_category, an.note_subcategory, an.created_by, an.created_at, an.updated_at,
+            idx.fts_index::text AS fts_index,
+            ARRAY(
+                SELECT DISTINCT antm.boa_topic
+                FROM {sis_advising_notes_schema()}.advising_note_topics ant
+                JOIN {sis_advising_notes_schema()}.advising_note_topic_mappings antm ON antm.sis_topic = ant.note_topic
+                WHERE ant.advising_note_id = an.id
+                ORDER BY antm.boa_topic
+            ) AS topics
+        FROM {advising_notes_schema()}.advising_notes an
+        JOIN {student_schema()}.student_profile_index spi ON an.sid = spi.sid
+        LEFT JOIN {advising_notes_schema()}.advising_notes_search_index idx ON idx.id = an.id"""
 
 
 def search_sis_advising(
@@ -825,7 +1066,7 @@ def search_sis_advising(
         offset=offset,
         limit=limit,
     )
-    return safe_execute_rds(sql, **params)
+    return safe_execute_rds(sql, query_class='search', **params)
 
 
 def get_academic_plans_for_advisor(advisor_sid):
@@ -23,6 +23,9 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import threading
+import time
+
 import boto3
 from flask import current_app as app
 import smart_open
@@ -30,14 +33,59 @@ import smart_open
 
 """Client code to run file operations against S3."""
 
+# Assumed-role credentials are shared by all threads; boto3 sessions are not thread-safe, so each thread keeps its own
+# session and client, rebuilt when the credentials rotate.
+credentials_lock = threading.Lock()
+cached_credentials = None
+thread_local = threading.local()
+
+signed_url_cache = {}
+signed_url_cache_lock = threading.Lock()
+
 
 def build_s3_url(bucket, key):
     return f's3://{bucket}/{key}'
 
 
 def get_signed_urls(bucket, keys, expiration):
-    client = _get_client()
-    return {key: _get_signed_url(client, bucket, key, expiration) for key in keys}
+    """Return URLs signed for the given number of seconds, reusing a cached URL while most of its lifetime remains."""
+    now = time.time()
+    signed_urls = {}
+    with signed_url_cache_lock:
+        for key in keys:
+            cached = signed_url_cache.get((bucket, key, expiration))
+            if cached and cached[0] > now:
+                signed_urls[key] = cached[1]
+    unsigned_keys = [key for key in keys if key not in signed_urls]
+    if unsigned_keys:
+        credentials = _get_sts_credentials()
+        client = _get_client()
+        # A URL signed with temporary credentials stops working when the credentials expire.
+        lifetime = min(expiration, credentials['Expiration'].timestamp() - now)
+        reuse_until = now + lifetime * app.config['S3_SIGNED_URL_REUSE_FRACTION']
+        new_urls = {key: _get_signed_url(client, bucket, key, expiration) for key in unsigned_keys}
+        signed_urls.update(new_urls)
+        _cache_signed_urls(bucket, expiration, new_urls, reuse_until)
+    return signed_urls
+
+
+def get_object(bucket, key):
+    """Return the object's content as bytes, or None if it cannot be read."""
+    try:
+        return _get_client().get_object(Bucket=bucket, Key=key)['Body'].read()
+    except Exception as e:
+        app.logger.error(f'S3 get operation failed (bucket={bucket}, key={key})')
+        app.logger.exception(e)
+        return None
+
+
+def reset_clients():
+    global cached_credentials
+    with credentials_lock:
+        cached_credentials = None
+    with signed_url_cache_lock:
+        signed_url_cache.clear()
+    thread_local.__dict__.clear()
 
 
 def stream_object(bucket, key):
@@ -59,7 +107,7 @@ def put_binary_data_to_s3(bucket, key, binary_data):
     _get_client().put_object(Body=binary_data, Bucket=bucket, Key=key, ServerSideEncryption=app.config['DATA_LOCH_S3_ENCRYPTION'])
 
 
-def _get_sts_credentials():
+def _assume_role():
     sts_client = boto3.client('sts')
     role_arn = app.config['AWS_APP_ROLE_ARN']
     assumed_role_object = sts_client.assume_role(
@@ -70,18 +118,47 @@ def _get_sts_credentials():
     return assumed_role_object['Credentials']
 
 
+def _cache_signed_urls(bucket, expiration, signed_urls, reuse_until):
+    if reuse_until <= time.time():
+        return
+    with signed_url_cache_lock:
+        if len(signed_url_cache) + len(signed_urls) > app.config['S3_SIGNED_URL_CACHE_MAX_ENTRIES']:
+            now = time.time()
+            for cache_key in [k for k, v in signed_url_cache.items() if v[0] <= now]:
+                del signed_url_cache[cache_key]
+            if len(signed_url_cache) + len(signed_urls) > app.config['S3_SIGNED_URL_CACHE_MAX_ENTRIES']:
+                signed_url_cache.clear()
+        for key, url in signed_urls.items():
+            signed_url_cache[(bucket, key, expiration)] = (reuse_until, url)
+
+
+def _get_sts_credentials():
+    global cached_credentials
+    with credentials_lock:
+        margin = app.config['AWS_CREDENTIALS_EXPIRY_MARGIN']
+        if not cached_credentials or cached_credentials['Expiration'].timestamp() - margin <= time.time():
+            cached_credentials = _assume_role()
+        return cached_credentials
+
+
 def _get_session():
     credentials = _get_sts_credentials()
-    return boto3.Session(
-        aws_access_key_id=credentials['AccessKeyId'],
-        aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken'],
-    )
+    if getattr(thread_local, 'access_key_id', None) != credentials['AccessKeyId']:
+        thread_local.access_key_id = credentials['AccessKeyId']
+        thread_local.session = boto3.Session(
+            aws_access_key_id=credentials['AccessKeyId'],
+            aws_secret_access_key=credentials['SecretAccessKey'],
+            aws_session_token=credentials['SessionToken'],
+        )
+        thread_local.client = None
+    return thread_local.session
 
 
 def _get_client():
     session = _get_session()
-    return session.client('s3', region_name=app.config['DATA_LOCH_S3_REGION'])
+    if thread_local.client is None:
+        thread_local.client = session.client('s3', region_name=app.config['DATA_LOCH_S3_REGION'])
+    return thread_local.client
 
 
 def _get_signed_url(client, bucket, key, expiration):
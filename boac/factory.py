@@ -42,4 +42,9 @@ def create_app():
     with app.app_context():
         register_routes(app)
 
+    from boac.externals.data_loch import init_connection_pool
+    from boac.models.json_cache import start_invalidation_listener
+    init_connection_pool(app)
+    start_invalidation_listener(app)
+
     return app
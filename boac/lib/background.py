@@ -23,7 +23,7 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-from threading import Thread
+from threading import Lock, Thread, Timer
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -48,6 +48,46 @@ def bg_execute(method):
         method(db_session=db.session)
 
 
+# Keys of debounced tasks that are scheduled but not yet started.
+debounced_keys = set()
+debounced_keys_lock = Lock()
+
+
+def bg_execute_debounced(key, method, delay):
+    """Run method as bg_execute would, after a delay in seconds, coalescing requests of the same key made in the meantime.
+
+    However many writes ask for the same rebuild, it runs once per delay period. A request made after the task has started
+    schedules another run, since the running task may not see the requester's changes.
+    """
+    from flask import current_app as app
+    if not app.config['BACKGROUND_TASKS']:
+        bg_execute(method)
+        return
+    with debounced_keys_lock:
+        if key in debounced_keys:
+            return
+        debounced_keys.add(key)
+    _start_debounce_timer(app._get_current_object(), key, method, delay)
+
+
+def _start_debounce_timer(app, key, method, delay):
+    timer = Timer(delay, _debounced_executor, kwargs={'app': app, 'key': key, 'method': method, 'delay': delay})
+    timer.daemon = True
+    timer.start()
+
+
+def _debounced_executor(app, key, method, delay):
+    with debounced_keys_lock:
+        debounced_keys.discard(key)
+    if not _bg_executor(app, method):
+        # Another background task holds the lock. Try again later rather than drop the run.
+        with debounced_keys_lock:
+            if key in debounced_keys:
+                return
+            debounced_keys.add(key)
+        _start_debounce_timer(app, key, method, delay)
+
+
 # Database engine and session factory for background threads, distinct from the request-bound Flask-SQLAlchemy db object.
 engine = None
 session_factory = None
@@ -89,6 +129,7 @@ def _bg_executor(app, method):
                     app.logger.debug('Background task complete.')
             else:
                 app.logger.warn('Was not granted advisory lock, will not run background method.')
+            return locked
 
 
 def try_advisory_lock(app, connection, lock_id):
@@ -25,11 +25,12 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 import csv
 from datetime import datetime
+import io
 import logging
 import urllib
 
 from flask import current_app as app
-from flask import Response
+from flask import Response, stream_with_context
 import requests
 import simplejson as json
 from werkzeug.wrappers import ResponseStream
@@ -129,14 +130,43 @@ def tolerant_jsonify(obj, status=200, **kwargs):
 
 
 def response_with_csv_download(rows, filename_prefix, fieldnames=None):
-    now = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     response = Response(
         content_type='text/csv',
-        headers={
-            'Content-disposition': f'attachment; filename="{filename_prefix}_{now}.csv"',
-        },
+        headers=_csv_download_headers(filename_prefix),
     )
     csv_writer = csv.DictWriter(ResponseStream(response), fieldnames=fieldnames)
     csv_writer.writeheader()
     csv_writer.writerows(rows)
     return response
+
+
+def response_with_streaming_csv_download(rows, filename_prefix, fieldnames=None, chunk_size=65536):
+    """Write CSV rows, which may come from a generator, only as the client reads the response."""
+    def _generate():
+        buffer = io.StringIO()
+        csv_writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        csv_writer.writeheader()
+        # Send the header right away, before the first batch of rows is fetched.
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            csv_writer.writerow(row)
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(_generate()),
+        content_type='text/csv',
+        headers=_csv_download_headers(filename_prefix),
+    )
+
+
+def _csv_download_headers(filename_prefix):
+    now = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    return {
+        'Content-disposition': f'attachment; filename="{filename_prefix}_{now}.csv"',
+    }
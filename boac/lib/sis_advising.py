@@ -59,28 +59,34 @@ def get_sis_advising_attachments(ids):
 
 
 def get_legacy_attachment_stream(filename):
-    # Filenames come prefixed with SID by convention.
-    for i, c in enumerate(filename):
-        if not c.isdigit():
-            break
-    sid = filename[:i]
+    sid = _sid_prefix(filename)
     if not sid:
         return None
     # Ensure that the file exists.
     attachment_result = data_loch.get_sis_advising_note_attachment(sid, filename)
     if not attachment_result or not attachment_result[0]:
         return None
-    if attachment_result[0].get('created_by') == 'UCBCONVERSION':
-        display_filename = filename
-    else:
-        display_filename = attachment_result[0].get('user_file_name')
-    s3_key = '/'.join([app.config['DATA_LOCH_S3_ADVISING_NOTE_ATTACHMENT_PATH'], sid, filename])
+    attachment = _legacy_attachment(sid, attachment_result[0])
     return {
-        'filename': display_filename,
-        'stream': s3.stream_object(app.config['DATA_LOCH_S3_ADVISING_NOTE_BUCKET'], s3_key),
+        'filename': attachment['filename'],
+        'stream': s3.stream_object(app.config['DATA_LOCH_S3_ADVISING_NOTE_BUCKET'], attachment['s3_key']),
     }
 
 
+def get_legacy_attachments(filenames):
+    """Return display filename and S3 key of those legacy attachments found in the loch, keyed by SIS filename."""
+    filenames_by_sid = {}
+    for filename in filenames:
+        sid = _sid_prefix(filename)
+        if sid:
+            filenames_by_sid.setdefault(sid, []).append(filename)
+    attachments = {}
+    for sid, sid_filenames in filenames_by_sid.items():
+        for row in data_loch.get_sis_advising_note_attachments(sid, sid_filenames) or []:
+            attachments[row['sis_file_name']] = _legacy_attachment(sid, row)
+    return attachments
+
+
 def resolve_sis_created_at(note_or_appointment):
     if note_or_appointment.get('created_by') == 'UCBCONVERSION' or note_or_appointment.get('eform_id'):
         return note_or_appointment.get('created_at').date().isoformat()
@@ -106,5 +112,24 @@ def _isoformat(obj, key):
     return value and value.astimezone(tzutc()).isoformat()
 
 
+def _legacy_attachment(sid, attachment_result):
+    if attachment_result.get('created_by') == 'UCBCONVERSION':
+        display_filename = attachment_result['sis_file_name']
+    else:
+        display_filename = attachment_result.get('user_file_name')
+    return {
+        'filename': display_filename,
+        's3_key': '/'.join([app.config['DATA_LOCH_S3_ADVISING_NOTE_ATTACHMENT_PATH'], sid, attachment_result['sis_file_name']]),
+    }
+
+
+def _sid_prefix(filename):
+    # Filenames come prefixed with SID by convention.
+    for i, c in enumerate(filename):
+        if not c.isdigit():
+            break
+    return filename[:i]
+
+
 def _tzinfo(_datetime):
     return _datetime and _datetime.tzinfo
@@ -23,7 +23,9 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
 from html.parser import HTMLParser
 import inspect
 import re
@@ -256,57 +258,74 @@ class HTMLTagStripper(HTMLParser):
         self.fed = []
 
 
-tag_stripper = HTMLTagStripper()
 stemmer = SnowballStemmer('english')
 
+# Search results share a vocabulary, so stems of the words most recently seen are kept for reuse.
+STEM_CACHE_SIZE = 10000
 
-def search_result_text_snippet(text, search_terms, search_pattern):
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def _stem(word):
+    return stemmer.stem(word)
+
+
+def strip_tags(text):
+    if '<' not in text and '&' not in text:
+        # Nothing for the parser to strip or unescape.
+        return text
+    tag_stripper = HTMLTagStripper()
     tag_stripper.feed(text)
-    tag_stripped_body = tag_stripper.get_data()
-    tag_stripper.reset()
+    return tag_stripper.get_data()
 
-    snippet_padding = app.config['NOTES_SEARCH_RESULT_SNIPPET_PADDING']
-    words = list(re.finditer(search_pattern, tag_stripped_body))
-    stemmed_search_terms = [stemmer.stem(term) for term in search_terms]
 
-    snippet = None
-    match_index = None
-    start_position = 0
+def search_result_text_snippet(text, search_terms, search_pattern):
+    tag_stripped_body = strip_tags(text)
+    snippet_padding = app.config['NOTES_SEARCH_RESULT_SNIPPET_PADDING']
+    stemmed_search_terms = {_stem(term) for term in search_terms}
 
+    # Scan for the first match, tracking only the starts of the preceding words that could open the snippet.
+    words = re.finditer(search_pattern, tag_stripped_body)
+    preceding_starts = deque(maxlen=snippet_padding)
+    padded_end_position = None
     for index, word_match in enumerate(words):
-        stem = stemmer.stem(word_match.group(0))
-        if match_index is None and stem in stemmed_search_terms:
-            match_index = index
-            if index > snippet_padding:
-                start_position = words[index - snippet_padding].start(0)
-            snippet = '...' if start_position > 0 else ''
-        if match_index is not None:
-            snippet += tag_stripped_body[start_position:word_match.start(0)]
-            if stem in stemmed_search_terms:
-                snippet += '<strong>'
-            snippet += word_match.group(0)
-            if stem in stemmed_search_terms:
-                snippet += '</strong>'
-            if index == len(words) - 1:
-                snippet += tag_stripped_body[word_match.end(0):len(tag_stripped_body)]
-                break
-            elif index == match_index + snippet_padding:
-                end_position = words[index].end(0)
-                snippet += tag_stripped_body[word_match.end(0):end_position]
-                snippet += '...'
-                break
-            else:
-                start_position = word_match.end(0)
-
-    if snippet:
-        return snippet
+        if _stem(word_match.group(0)) in stemmed_search_terms:
+            break
+        if index == snippet_padding:
+            padded_end_position = word_match.end(0)
+        preceding_starts.append(word_match.start(0))
     else:
-        if len(words) > snippet_padding:
-            end_position = words[snippet_padding].end(0)
-            return tag_stripped_body[0:end_position] + '...'
+        if padded_end_position is not None:
+            return tag_stripped_body[0:padded_end_position] + '...'
         else:
             return tag_stripped_body
 
+    match_index = index
+    if index > snippet_padding:
+        # With no padding at all, the snippet opens at the match itself.
+        start_position = preceding_starts[0] if preceding_starts else word_match.start(0)
+    else:
+        start_position = 0
+    snippet = ['...' if start_position > 0 else '']
+    is_match = True
+    while True:
+        next_word_match = next(words, None)
+        snippet.append(tag_stripped_body[start_position:word_match.start(0)])
+        if is_match:
+            snippet.append(f'<strong>{word_match.group(0)}</strong>')
+        else:
+            snippet.append(word_match.group(0))
+        if next_word_match is None:
+            snippet.append(tag_stripped_body[word_match.end(0):])
+            break
+        elif index == match_index + snippet_padding:
+            snippet.append('...')
+            break
+        start_position = word_match.end(0)
+        word_match = next_word_match
+        index += 1
+        is_match = _stem(word_match.group(0)) in stemmed_search_terms
+    return ''.join(snippet)
+
 
 def _localize_datetime(dt):
     return dt.astimezone(pytz.timezone(app.config['TIMEZONE']))
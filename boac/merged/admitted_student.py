@@ -80,7 +80,7 @@ def search_for_admitted_students(
         ORDER BY sa.{order_by}, sa.last_name, sa.first_name, sa.middle_name, sa.cs_empl_id"""
 
     benchmark('begin admit search query')
-    admits = data_loch.safe_execute_rds(sql, **query_bindings)
+    admits = data_loch.safe_execute_rds(sql, query_class='cohort', **query_bindings)
     benchmark('end')
     return {
         'admits': [_to_api_json(row) for row in islice(admits, 50)] if admits else None,
@@ -130,7 +130,11 @@ def query_admitted_students(
         student_dependent_ranges=student_dependent_ranges,
         x_ethnicities=x_ethnicities,
     )
-    sids_result = data_loch.safe_execute_rds(f'SELECT DISTINCT(cs_empl_id) as sid {query_tables} {query_filter}', **query_bindings)
+    sids_result = data_loch.safe_execute_rds(
+        f'SELECT DISTINCT(cs_empl_id) as sid {query_tables} {query_filter}',
+        query_class='cohort',
+        **query_bindings,
+    )
     if sids_result is None:
         return None
     summary = {
@@ -159,7 +163,7 @@ def query_admitted_students(
         if limit and limit < 100:  # Sanity check large limits
             query_bindings['limit'] = limit
             sql += ' LIMIT %(limit)s'
-        admits = data_loch.safe_execute_rds(sql, **query_bindings)
+        admits = data_loch.safe_execute_rds(sql, query_class='cohort', **query_bindings)
         summary['students'] = [_to_api_json(row) for row in admits] if admits else None
     return summary
 
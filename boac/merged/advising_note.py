@@ -23,6 +23,7 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import csv
 from datetime import datetime
 import io
@@ -30,18 +31,19 @@ from itertools import groupby
 from operator import itemgetter
 from os import path
 import re
+from threading import Lock
+import time
 
 from boac.externals import data_loch, s3
 from boac.lib.berkeley import BERKELEY_DEPT_CODE_TO_NAME, term_name_for_sis_id
 from boac.lib.sis_advising import (
-    get_legacy_attachment_stream,
+    get_legacy_attachments,
     get_sis_advising_attachments,
     get_sis_advising_topics,
     resolve_sis_created_at,
     resolve_sis_updated_at,
 )
 from boac.lib.util import (
-    camelize,
     get_benchmarker,
     is_int,
     join_if_present,
@@ -53,6 +55,7 @@ from boac.merged.calnet import get_calnet_users_for_csids, get_uid_for_csid
 from boac.models.note import Note
 from boac.models.note_attachment import NoteAttachment
 from boac.models.note_read import NoteRead
+from boac.models.note_search_index import NoteSearchIndex
 from dateutil.tz import tzutc
 from flask import current_app as app
 from flask_login import current_user
@@ -65,21 +68,26 @@ import zipstream
 def get_advising_notes(sid):
     benchmark = get_benchmarker(f'get_advising_notes {sid}')
     benchmark('begin')
-    notes_by_id = {}
-    benchmark('begin SIS advising notes query')
-    notes_by_id.update(get_sis_advising_notes(sid))
-    benchmark('begin ASC advising notes query')
-    notes_by_id.update(get_asc_advising_notes(sid))
-    benchmark('begin Data Science advising notes query')
-    notes_by_id.update(get_data_science_advising_notes(sid))
-    benchmark('begin E&I advising notes query')
-    notes_by_id.update(get_e_i_advising_notes(sid))
-    benchmark('begin History Dept advising notes query')
-    notes_by_id.update(get_history_dept_advising_notes(sid))
+    deadline = time.monotonic() + app.config['ADVISING_NOTE_SOURCE_TIMEOUT']
+    fetches = [(source, _submit_loch_note_fetch(source, sid)) for source in LOCH_NOTE_SOURCES]
     benchmark('begin non legacy advising notes query')
-    notes_by_id.update(get_non_legacy_advising_notes(sid))
-    benchmark('begin SIS late drop eforms  query')
-    notes_by_id.update(get_sis_late_drop_eforms(sid))
+    # BOA notes come from the app's own database session, which belongs to this thread.
+    non_legacy_notes = get_non_legacy_advising_notes(sid)
+    benchmark('begin loch advising notes queries')
+    notes_by_id = {}
+    for source, future in fetches:
+        try:
+            result, duration = future.result(timeout=max(deadline - time.monotonic(), 0))
+            notes_by_id.update(source.to_json(result))
+        except FuturesTimeoutError:
+            future.cancel()
+            app.logger.error(f'{source.name} for SID {sid} did not return in time; omitting from timeline')
+        except Exception as e:
+            app.logger.exception(e)
+            app.logger.error(f'{source.name} for SID {sid} failed; omitting from timeline')
+        else:
+            benchmark(f'{source.name} query took {round(duration * 1000)} ms')
+    notes_by_id.update(non_legacy_notes)
     if not notes_by_id.values():
         return None
     notes_read = NoteRead.get_notes_read_by_user(current_user.get_id(), notes_by_id.keys())
@@ -94,11 +102,51 @@ def get_advising_notes(sid):
 
 
 def get_sis_advising_notes(sid):
+    return _sis_advising_notes_to_json(_fetch_sis_advising_notes(sid))
+
+
+def get_asc_advising_notes(sid):
+    return _asc_advising_notes_to_json(_fetch_asc_advising_notes(sid))
+
+
+def get_data_science_advising_notes(sid):
+    return _data_science_advising_notes_to_json(data_loch.get_data_science_advising_notes(sid))
+
+
+def get_e_i_advising_notes(sid):
+    return _e_i_advising_notes_to_json(_fetch_e_i_advising_notes(sid))
+
+
+def get_history_dept_advising_notes(sid):
+    return _history_dept_advising_notes_to_json(data_loch.get_history_dept_advising_notes(sid))
+
+
+def get_non_legacy_advising_notes(sid):
     notes_by_id = {}
+    for row in Note.get_notes_by_sid(sid):
+        note = row.__dict__
+        note_id = note['id']
+        notes_by_id[str(note_id)] = note_to_compatible_json(
+            note=note,
+            attachments=[a.to_api_json() for a in row.attachments if not a.deleted_at],
+            topics=[t.to_api_json() for t in row.topics if not t.deleted_at],
+        )
+    return notes_by_id
+
+
+def get_sis_late_drop_eforms(sid):
+    return _sis_late_drop_eforms_to_json(data_loch.get_sis_late_drop_eforms(sid))
+
+
+def _fetch_sis_advising_notes(sid):
     legacy_notes = data_loch.get_sis_advising_notes(sid)
     note_ids = [n['id'] for n in legacy_notes]
-    legacy_topics = get_sis_advising_topics(note_ids)
-    legacy_attachments = get_sis_advising_attachments(note_ids)
+    return legacy_notes, get_sis_advising_topics(note_ids), get_sis_advising_attachments(note_ids)
+
+
+def _sis_advising_notes_to_json(fetched):
+    legacy_notes, legacy_topics, legacy_attachments = fetched
+    notes_by_id = {}
     for legacy_note in legacy_notes:
         note_id = legacy_note['id']
         notes_by_id[note_id] = note_to_compatible_json(
@@ -110,10 +158,14 @@ def get_sis_advising_notes(sid):
     return notes_by_id
 
 
-def get_asc_advising_notes(sid):
+def _fetch_asc_advising_notes(sid):
+    return data_loch.get_asc_advising_notes(sid), _get_asc_advising_note_topics(sid)
+
+
+def _asc_advising_notes_to_json(fetched):
+    legacy_notes, legacy_topics = fetched
     notes_by_id = {}
-    legacy_topics = _get_asc_advising_note_topics(sid)
-    for legacy_note in data_loch.get_asc_advising_notes(sid):
+    for legacy_note in legacy_notes:
         note_id = legacy_note['id']
         legacy_note['dept_code'] = ['UWASC']
         notes_by_id[note_id] = note_to_compatible_json(
@@ -124,9 +176,13 @@ def get_asc_advising_notes(sid):
     return notes_by_id
 
 
-def get_data_science_advising_notes(sid):
+def _fetch_data_science_advising_notes(sid):
+    return data_loch.get_data_science_advising_notes(sid)
+
+
+def _data_science_advising_notes_to_json(legacy_notes):
     notes_by_id = {}
-    for legacy_note in data_loch.get_data_science_advising_notes(sid):
+    for legacy_note in legacy_notes:
         note_id = legacy_note['id']
         legacy_note['dept_code'] = ['DSDDO']
         notes_by_id[note_id] = note_to_compatible_json(
@@ -137,10 +193,14 @@ def get_data_science_advising_notes(sid):
     return notes_by_id
 
 
-def get_e_i_advising_notes(sid):
+def _fetch_e_i_advising_notes(sid):
+    return data_loch.get_e_i_advising_notes(sid), _get_e_i_advising_note_topics(sid)
+
+
+def _e_i_advising_notes_to_json(fetched):
+    legacy_notes, legacy_topics = fetched
     notes_by_id = {}
-    legacy_topics = _get_e_i_advising_note_topics(sid)
-    for legacy_note in data_loch.get_e_i_advising_notes(sid):
+    for legacy_note in legacy_notes:
         note_id = legacy_note['id']
         legacy_note['dept_code'] = ['ZCEEE']
         notes_by_id[note_id] = note_to_compatible_json(
@@ -151,9 +211,13 @@ def get_e_i_advising_notes(sid):
     return notes_by_id
 
 
-def get_history_dept_advising_notes(sid):
+def _fetch_history_dept_advising_notes(sid):
+    return data_loch.get_history_dept_advising_notes(sid)
+
+
+def _history_dept_advising_notes_to_json(legacy_notes):
     notes_by_id = {}
-    for note in data_loch.get_history_dept_advising_notes(sid):
+    for note in legacy_notes:
         note['dept_code'] = ['SHIST']
         note_id = note['id']
         notes_by_id[note_id] = note_to_compatible_json(note=note)
@@ -161,28 +225,60 @@ def get_history_dept_advising_notes(sid):
     return notes_by_id
 
 
-def get_non_legacy_advising_notes(sid):
-    notes_by_id = {}
-    for row in Note.get_notes_by_sid(sid):
-        note = row.__dict__
-        note_id = note['id']
-        notes_by_id[str(note_id)] = note_to_compatible_json(
-            note=note,
-            attachments=[a.to_api_json() for a in row.attachments if not a.deleted_at],
-            topics=[t.to_api_json() for t in row.topics if not t.deleted_at],
-        )
-    return notes_by_id
+def _fetch_sis_late_drop_eforms(sid):
+    return data_loch.get_sis_late_drop_eforms(sid)
 
 
-def get_sis_late_drop_eforms(sid):
+def _sis_late_drop_eforms_to_json(eforms):
     eforms_by_id = {}
-    for eform in data_loch.get_sis_late_drop_eforms(sid):
+    for eform in eforms:
         eform_id = eform['id']
         eforms_by_id[eform_id] = note_to_compatible_json(eform)
         eforms_by_id[eform_id]['legacySource'] = 'SIS'
     return eforms_by_id
 
 
+class LochNoteSource:
+
+    def __init__(self, name, fetch, to_json):
+        # Fetching is pure loch I/O and may run on any thread. Conversion to JSON consults current_user and so stays
+        # on the request thread.
+        self.name = name
+        self.fetch = fetch
+        self.to_json = to_json
+
+
+LOCH_NOTE_SOURCES = [
+    LochNoteSource('SIS advising notes', _fetch_sis_advising_notes, _sis_advising_notes_to_json),
+    LochNoteSource('ASC advising notes', _fetch_asc_advising_notes, _asc_advising_notes_to_json),
+    LochNoteSource('Data Science advising notes', _fetch_data_science_advising_notes, _data_science_advising_notes_to_json),
+    LochNoteSource('E&I advising notes', _fetch_e_i_advising_notes, _e_i_advising_notes_to_json),
+    LochNoteSource('History Dept advising notes', _fetch_history_dept_advising_notes, _history_dept_advising_notes_to_json),
+    LochNoteSource('SIS late drop eforms', _fetch_sis_late_drop_eforms, _sis_late_drop_eforms_to_json),
+]
+
+loch_note_executor = None
+loch_note_executor_lock = Lock()
+
+
+def _submit_loch_note_fetch(source, sid):
+    global loch_note_executor
+    with loch_note_executor_lock:
+        if loch_note_executor is None:
+            loch_note_executor = ThreadPoolExecutor(
+                max_workers=app.config['ADVISING_NOTE_SOURCE_MAX_WORKERS'],
+                thread_name_prefix='loch_note_source',
+            )
+    return loch_note_executor.submit(_fetch_in_app_context, app._get_current_object(), source, sid)
+
+
+def _fetch_in_app_context(app_arg, source, sid):
+    with app_arg.app_context():
+        start = time.perf_counter()
+        result = source.fetch(sid)
+        return result, time.perf_counter() - start
+
+
 def search_advising_notes(
     search_phrase,
     author_csid=None,
@@ -205,35 +301,10 @@ def search_advising_notes(
 
     author_uid = get_uid_for_csid(app, author_csid) if (not author_uid and author_csid) else author_uid
 
-    # TODO We're currently retrieving all results for the sake of subsequent offset calculations. As the number of notes in
-    # BOA grows (and possibly requires us to use some kind of staging table for search indexing), we'll need to revisit.
-    benchmark('begin local notes query')
-    local_results = Note.search(
-        search_phrase=search_phrase,
-        author_uid=author_uid,
-        student_csid=student_csid,
-        topic=topic,
-        datetime_from=datetime_from,
-        datetime_to=datetime_to,
-    )
-    benchmark('end local notes query')
-
-    benchmark('begin local notes parsing')
-    # Our offset calculations are unforuntately fussy because note parsing might reveal notes associated with students no
-    # longer in BOA, which we won't include in the feed; so we don't actually know the length of our result set until parsing
-    # is complete.
-    cutoff = min(len(local_results), offset + limit)
-    notes_feed = _get_local_notes_search_results(local_results, cutoff, search_terms)
-    local_notes_count = len(notes_feed)
-    notes_feed = notes_feed[offset:]
-
-    benchmark('end local notes parsing')
-
-    if len(notes_feed) == limit:
-        return notes_feed
-
-    benchmark('begin loch notes query')
-    loch_results = data_loch.search_advising_notes(
+    benchmark('begin notes query')
+    # Availability of students is a filter in the index, kept up to date by the refresh job, so that offsets count over
+    # the same rows on every page. A student who has left the loch since then is simply omitted from the page.
+    rows = NoteSearchIndex.search(
         search_phrase=search_phrase,
         author_uid=author_uid,
         author_csid=author_csid,
@@ -241,70 +312,56 @@ def search_advising_notes(
         topic=topic,
         datetime_from=datetime_from,
         datetime_to=datetime_to,
-        offset=max(0, offset - local_notes_count),
-        limit=(limit - len(notes_feed)),
+        offset=offset,
+        limit=limit,
     )
-    benchmark('end loch notes query')
-
-    benchmark('begin loch notes parsing')
-    notes_feed += _get_loch_notes_search_results(loch_results, search_terms)
-    benchmark('end loch notes parsing')
-
+    benchmark('end notes query')
+    sids = list({row['sid'] for row in rows})
+    student_rows = data_loch.get_basic_student_data(sids) if sids else []
+    students_by_sid = {r.get('sid'): r for r in student_rows or []}
+
+    benchmark('begin notes parsing')
+    notes_feed = _get_notes_search_results(rows, students_by_sid, search_terms)
+    benchmark('end notes parsing')
     return notes_feed
 
 
-def _get_local_notes_search_results(local_results, cutoff, search_terms):
+def _get_notes_search_results(rows, students_by_sid, search_terms):
     results = []
-    student_rows = data_loch.get_basic_student_data([row.get('sid') for row in local_results])
-    students_by_sid = {r.get('sid'): r for r in student_rows}
-    for row in local_results:
-        note = {camelize(key): row[key] for key in row.keys()}
-        sid = note.get('sid')
-        student_row = students_by_sid.get(sid, {})
-        if student_row:
-            omit_note_body = note.get('isPrivate') and not current_user.can_access_private_notes
-            subject = note.get('subject')
-            text = subject if omit_note_body else join_if_present(' - ', [subject, note.get('body')])
-            results.append({
-                'id': note.get('id'),
-                'studentSid': sid,
-                'studentUid': student_row.get('uid'),
-                'studentName': join_if_present(' ', [student_row.get('first_name'), student_row.get('last_name')]),
-                'advisorUid': note.get('authorUid'),
-                'advisorName': note.get('authorName'),
-                'noteSnippet': search_result_text_snippet(text, search_terms, TEXT_SEARCH_PATTERN),
-                'createdAt': _isoformat(note, 'createdAt'),
-                'updatedAt': _isoformat(note, 'updatedAt'),
+    advisor_sids = list(set([row['author_sid'] for row in rows if row['source'] == 'loch' and row['author_sid'] is not None]))
+    calnet_advisor_feeds = get_calnet_users_for_csids(app, advisor_sids) if advisor_sids else {}
+    for row in rows:
+        student_row = students_by_sid.get(row['sid'])
+        if not student_row:
+            continue
+        note = {
+            'studentSid': row['sid'],
+            'studentUid': student_row.get('uid'),
+            'studentName': join_if_present(' ', [student_row.get('first_name'), student_row.get('last_name')]),
+            'noteSnippet': search_result_text_snippet(row['snippet_source'], search_terms, TEXT_SEARCH_PATTERN),
+        }
+        if row['source'] == 'boa':
+            note.update({
+                'id': int(row['note_id']),
+                'advisorUid': row['author_uid'],
+                'advisorName': row['author_name'],
+                'createdAt': _isoformat(row, 'created_at'),
+                'updatedAt': _isoformat(row, 'updated_at'),
             })
-        if len(results) == cutoff:
-            break
-    return results
-
-
-def _get_loch_notes_search_results(loch_results, search_terms):
-    results = []
-    if not loch_results:
-        return results
-    sids = list(set([row.get('advisor_sid') for row in loch_results if row.get('advisor_sid') is not None]))
-    calnet_advisor_feeds = get_calnet_users_for_csids(app, sids)
-    for note in loch_results:
-        advisor_feed = calnet_advisor_feeds.get(note.get('advisor_sid'))
-        if advisor_feed:
-            advisor_name = advisor_feed.get('name') or join_if_present(' ', [advisor_feed.get('first_name'), advisor_feed.get('last_name')])
         else:
-            advisor_name = None
-        note_body = (note.get('note_body') or '').strip() or join_if_present(', ', [note.get('note_category'), note.get('note_subcategory')])
-        results.append({
-            'id': note.get('id'),
-            'studentSid': note.get('sid'),
-            'studentUid': note.get('uid'),
-            'studentName': join_if_present(' ', [note.get('first_name'), note.get('last_name')]),
-            'advisorSid': note.get('advisor_sid'),
-            'advisorName': advisor_name or join_if_present(' ', [note.get('advisor_first_name'), note.get('advisor_last_name')]),
-            'noteSnippet': search_result_text_snippet(note_body, search_terms, TEXT_SEARCH_PATTERN),
-            'createdAt': resolve_sis_created_at(note),
-            'updatedAt': resolve_sis_updated_at(note),
-        })
+            advisor_feed = calnet_advisor_feeds.get(row['author_sid'])
+            if advisor_feed:
+                advisor_name = advisor_feed.get('name') or join_if_present(' ', [advisor_feed.get('first_name'), advisor_feed.get('last_name')])
+            else:
+                advisor_name = None
+            note.update({
+                'id': row['note_id'],
+                'advisorSid': row['author_sid'],
+                'advisorName': advisor_name or row['author_name'],
+                'createdAt': resolve_sis_created_at(row),
+                'updatedAt': resolve_sis_updated_at(row),
+            })
+        results.append(note)
     return results
 
 
@@ -384,34 +441,67 @@ def get_zip_stream(filename, notes, student):
                 f"{e_form['sectionId']} {e_form['courseName']} - {e_form['courseTitle']} {e_form['section']}" if e_form.get('sectionId') else None,
             ])
 
-    z = zipstream.ZipFile(mode='w', compression=zipstream.ZIP_DEFLATED)
+    default_compression = zipstream.ZIP_STORED if app.config['NOTES_DOWNLOAD_COMPRESSION'] == 'stored' else zipstream.ZIP_DEFLATED
+    stored_extensions = {e.lower() for e in app.config['NOTES_DOWNLOAD_STORED_EXTENSIONS']}
+    z = zipstream.ZipFile(mode='w', compression=default_compression)
     csv_filename = f'{filename}.csv'
     z.write_iter(csv_filename, iter_csv())
 
     if notes:
+        attachments = _get_downloadable_attachments(notes)
+        prefetcher = AttachmentPrefetcher([a['s3_key'] for a in attachments])
         all_attachment_filenames = {csv_filename}
-        for note in notes:
-            if not note.get('isPrivate') or current_user.can_access_private_notes:
-                for attachment in note['attachments'] or []:
-                    is_legacy_attachment = not is_int(attachment['id'])
-                    id_ = attachment['id'] if is_legacy_attachment else int(attachment['id'])
-                    if is_legacy_attachment:
-                        stream_data = get_legacy_attachment_stream(id_)
-                    else:
-                        attachment = NoteAttachment.find_by_id(id_)
-                        stream_data = get_boa_attachment_stream(attachment)
-                    if stream_data:
-                        attachment_filename = stream_data['filename']
-                        basename, extension = path.splitext(attachment_filename)
-                        suffix = 1
-                        while attachment_filename in all_attachment_filenames:
-                            attachment_filename = f'{basename} ({suffix}){extension}'
-                            suffix += 1
-                        all_attachment_filenames.add(attachment_filename)
-                        z.write_iter(attachment_filename, stream_data['stream'])
+        for index, attachment in enumerate(attachments):
+            attachment_filename = attachment['filename']
+            basename, extension = path.splitext(attachment_filename)
+            suffix = 1
+            while attachment_filename in all_attachment_filenames:
+                attachment_filename = f'{basename} ({suffix}){extension}'
+                suffix += 1
+            all_attachment_filenames.add(attachment_filename)
+            z.write_iter(
+                attachment_filename,
+                prefetcher.iter_content(index),
+                compress_type=zipstream.ZIP_STORED if extension.lower() in stored_extensions else default_compression,
+            )
     return z
 
 
+class AttachmentPrefetcher:
+    """Download attachments from S3 on a shared thread pool, staying a bounded number of objects ahead of the reader.
+
+    zipstream reads entries strictly in order, so while one attachment is written the next NOTES_DOWNLOAD_PREFETCH_DEPTH
+    are already in flight, and no more than that many downloaded attachments are held in memory.
+    """
+
+    def __init__(self, s3_keys):
+        self.app = app._get_current_object()
+        self.bucket = app.config['DATA_LOCH_S3_ADVISING_NOTE_BUCKET']
+        self.depth = max(app.config['NOTES_DOWNLOAD_PREFETCH_DEPTH'], 1)
+        self.futures = {}
+        self.next_index = 0
+        self.s3_keys = s3_keys
+
+    def iter_content(self, index):
+        self._prefetch_through(index)
+        content = self.futures.pop(index).result()
+        self._prefetch_through(index + self.depth)
+        if content is None:
+            app.logger.error(f'Attachment {self.s3_keys[index]} could not be fetched; writing an empty file to ZIP')
+        yield content or b''
+
+    def _prefetch_through(self, last_index):
+        executor = _get_attachment_executor()
+        while self.next_index <= min(last_index, len(self.s3_keys) - 1):
+            self.futures[self.next_index] = executor.submit(
+                _fetch_attachment_in_app_context,
+                self.app,
+                self.bucket,
+                self.s3_keys[self.next_index],
+            )
+            self.next_index += 1
+
+
 def note_to_compatible_json(
         note,
         topics=(),
@@ -474,6 +564,11 @@ def _eform_to_json(eform):
         }
 
 
+def _fetch_attachment_in_app_context(app_arg, bucket, key):
+    with app_arg.app_context():
+        return s3.get_object(bucket, key)
+
+
 def _get_asc_advising_note_topics(sid):
     topics = data_loch.get_asc_advising_note_topics(sid)
     topics_by_id = {}
@@ -490,6 +585,45 @@ def _get_e_i_advising_note_topics(sid):
     return topics_by_id
 
 
+attachment_executor = None
+attachment_executor_lock = Lock()
+
+
+def _get_attachment_executor():
+    global attachment_executor
+    with attachment_executor_lock:
+        if attachment_executor is None:
+            attachment_executor = ThreadPoolExecutor(
+                max_workers=app.config['NOTES_DOWNLOAD_MAX_WORKERS'],
+                thread_name_prefix='note_attachment_fetch',
+            )
+        return attachment_executor
+
+
+def _get_downloadable_attachments(notes):
+    # Attachment feeds of legacy notes carry SIS filenames as ids; those of BOA notes carry integer ids.
+    attachment_feeds = []
+    for note in notes:
+        if not note.get('isPrivate') or current_user.can_access_private_notes:
+            attachment_feeds += note['attachments'] or []
+    legacy_ids = [a['id'] for a in attachment_feeds if not is_int(a['id'])]
+    legacy_attachments = get_legacy_attachments(legacy_ids) if legacy_ids else {}
+    boa_ids = [int(a['id']) for a in attachment_feeds if is_int(a['id'])]
+    boa_attachments = {a.id: a for a in NoteAttachment.find_by_ids(boa_ids)} if boa_ids else {}
+    attachments = []
+    for attachment_feed in attachment_feeds:
+        if is_int(attachment_feed['id']):
+            boa_attachment = boa_attachments.get(int(attachment_feed['id']))
+            if boa_attachment:
+                attachments.append({
+                    'filename': boa_attachment.get_user_filename(),
+                    's3_key': boa_attachment.path_to_attachment,
+                })
+        elif attachment_feed['id'] in legacy_attachments:
+            attachments.append(legacy_attachments[attachment_feed['id']])
+    return attachments
+
+
 def _isoformat(obj, key):
     value = obj.get(key)
     return value and value.astimezone(tzutc()).isoformat()
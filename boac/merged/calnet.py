@@ -26,34 +26,24 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from boac.api.errors import InternalServerError
 from boac.externals import calnet
 from boac.lib.berkeley import BERKELEY_DEPT_CODE_TO_NAME
-from boac.models.json_cache import fetch_bulk, insert_row, stow
+from boac.models.json_cache import fetch_bulk, insert_rows, stow
 
 
-@stow('calnet_user_for_uid_{uid}')
 def get_calnet_user_for_uid(app, uid, force_feed=True, skip_expired_users=False):
-    if skip_expired_users:
-        persons = calnet.client(app).search_uids([uid])
-    else:
-        for search_expired in (False, True):
-            persons = calnet.client(app).search_uids([uid], search_expired)
-            if persons:
-                break
-    if not persons and not force_feed:
-        return None
-    return {
-        **_calnet_user_api_feed(persons[0] if len(persons) else None),
-        **{'uid': uid},
-    }
+    calnet_user = _get_calnet_user_for_uid(app, uid)
+    if calnet_user and skip_expired_users and calnet_user['isExpiredPerLdap']:
+        calnet_user = None
+    if calnet_user is None and force_feed:
+        return {
+            **_calnet_user_api_feed(None),
+            **{'uid': uid},
+        }
+    return calnet_user
 
 
-@stow('calnet_user_for_csid_{csid}')
 def get_calnet_user_for_csid(app, csid):
-    for search_expired in (False, True):
-        persons = calnet.client(app).search_csids([csid], search_expired)
-        if persons:
-            break
-    return {
-        **_calnet_user_api_feed(persons[0] if len(persons) else None),
+    return _get_calnet_user_for_csid(app, csid) or {
+        **_calnet_user_api_feed(None),
         **{'csid': csid},
     }
 
@@ -78,26 +68,71 @@ def get_uid_for_csid(app, csid):
         return user_feed.get('uid')
 
 
+# A miss is stowed as a negative entry, so that users unknown to CalNet are not searched for on every request. Cached
+# entries cover expired users too, so that a negative entry means unknown to CalNet, whatever the caller's preference.
+@stow('calnet_user_for_uid_{uid}', ttl_config='CALNET_USER_CACHE_TTL', negative_ttl_config='CALNET_USER_NEGATIVE_CACHE_TTL')
+def _get_calnet_user_for_uid(app, uid):
+    persons = calnet.client(app).search_uids([uid], include_expired=True)
+    if persons:
+        return {
+            **_calnet_user_api_feed(_first_active(persons)),
+            **{'uid': uid},
+        }
+
+
+@stow('calnet_user_for_csid_{csid}', ttl_config='CALNET_USER_CACHE_TTL', negative_ttl_config='CALNET_USER_NEGATIVE_CACHE_TTL')
+def _get_calnet_user_for_csid(app, csid):
+    persons = calnet.client(app).search_csids([csid], include_expired=True)
+    if persons:
+        return {
+            **_calnet_user_api_feed(_first_active(persons)),
+            **{'csid': csid},
+        }
+
+
 def _get_calnet_users(app, id_type, ids):
     cached_users = fetch_bulk([f'calnet_user_for_{id_type}_{_id}' for _id in ids])
-    users_by_id = {k.replace(f'calnet_user_for_{id_type}_', ''): v for k, v in cached_users.items()}
+    users_by_id = {}
+    for key, cached_user in cached_users.items():
+        _id = key.replace(f'calnet_user_for_{id_type}_', '')
+        users_by_id[_id] = cached_user or {
+            **_calnet_user_api_feed(None),
+            **{id_type: _id},
+        }
     uncached_ids = [c for c in ids if c not in users_by_id]
     calnet_client = calnet.client(app)
+    # As above, expired users are cached so that misses are true negatives.
     if id_type == 'uid':
-        calnet_results = calnet_client.search_uids(uncached_ids)
+        calnet_results = calnet_client.search_uids(uncached_ids, include_expired=True)
     elif id_type == 'csid':
-        calnet_results = calnet_client.search_csids(uncached_ids)
+        calnet_results = calnet_client.search_csids(uncached_ids, include_expired=True)
     else:
         raise InternalServerError(f'get_calnet_users: {id_type} is an invalid id type')
-    # Cache rows individually so that an isolated conflict doesn't sink the rest of the update.
+    calnet_results_by_id = {}
+    for calnet_result in calnet_results:
+        # Active records take precedence over expired ones; otherwise first result wins. A multi-valued id attribute
+        # matches no single id.
+        _id = calnet_result[id_type]
+        if isinstance(_id, str):
+            existing = calnet_results_by_id.get(_id)
+            if existing is None or (existing['expired'] and not calnet_result['expired']):
+                calnet_results_by_id[_id] = calnet_result
+    feeds_by_key = {}
+    misses_by_key = {}
     for _id in uncached_ids:
-        calnet_result = next((r for r in calnet_results if r[id_type] == _id), None)
+        calnet_result = calnet_results_by_id.get(_id)
         feed = {
             **_calnet_user_api_feed(calnet_result),
             **{id_type: _id},
         }
-        insert_row(f'calnet_user_for_{id_type}_{_id}', feed)
+        if calnet_result:
+            feeds_by_key[f'calnet_user_for_{id_type}_{_id}'] = feed
+        else:
+            misses_by_key[f'calnet_user_for_{id_type}_{_id}'] = None
         users_by_id[_id] = feed
+    # A row cached meanwhile by a concurrent request is left in place rather than sinking the rest of the update.
+    insert_rows(feeds_by_key, ttl=app.config['CALNET_USER_CACHE_TTL'])
+    insert_rows(misses_by_key, ttl=app.config['CALNET_USER_NEGATIVE_CACHE_TTL'])
     return users_by_id
 
 
@@ -126,6 +161,11 @@ def _calnet_user_api_feed(person):
     }
 
 
+def _first_active(persons):
+    # Active records take precedence over expired ones.
+    return next((p for p in persons if not p['expired']), persons[0] if persons else None)
+
+
 def _get_dept_code(p):
     return p and (p['primary_dept_code'] or p['dept_code'])
 
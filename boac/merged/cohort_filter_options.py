@@ -25,6 +25,8 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 from copy import copy, deepcopy
 from datetime import datetime
+import threading
+import time
 
 from boac.lib.berkeley import sis_term_id_for_name
 from boac.lib.cohort_utils import academic_career_status_options, academic_division_options, \
@@ -35,8 +37,11 @@ from boac.lib.cohort_utils import academic_career_status_options, academic_divis
     student_admit_ethnicity_options, student_admit_freshman_or_transfer_options, \
     student_admit_residency_category_options, student_admit_special_program_cep_options, team_groups, \
     unit_range_options, visa_types
+from boac.lib.util import utc_now
 from boac.merged.student import get_student_query_scope
 from boac.models.authorized_user import AuthorizedUser
+from boac.models.json_cache import get_memory_tier, on_invalidation, stow
+from flask import current_app as app
 
 
 class CohortFilterOptions:
@@ -74,38 +79,33 @@ class CohortFilterOptions:
         return option_groups
 
     def get_filter_option_groups(self):
-        current_year = datetime.now().year
-        owner_user_id = AuthorizedUser.get_id_per_uid(self.owner_uid) if self.owner_uid else None
+        # Menu options are callables, evaluated only for filters available in scope. See get_option_catalog.
         return {
             'Academic': [
-                _filter(
-                    'academicStandings',
-                    'Academic Standing',
-                    options=academic_standing_options(min_term_id=sis_term_id_for_name(f'Fall {current_year - 5}')),
-                ),
+                _filter('academicStandings', 'Academic Standing', options=_catalog_options('academicStandings')),
                 _filter('academicCareerStatus', 'Career Status', options=academic_career_status_options()),
-                _filter('academicDivisions', 'Academic Division', options=academic_division_options()),
-                _filter('colleges', 'College', options=colleges()),
-                _filter('degrees', 'Degree Awarded', options=degrees()),
-                _filter('degreeTerms', 'Degree Term', options=degree_terms()),
-                _filter('enteringTerms', 'Entering Term', options=entering_terms()),
-                _filter('epnCpnGradingTerms', 'EPN/CPN Grading Option', options=grading_terms()),
-                _filter('expectedGradTerms', 'Expected Graduation Term', options=grad_terms()),
+                _filter('academicDivisions', 'Academic Division', options=_catalog_options('academicDivisions')),
+                _filter('colleges', 'College', options=_catalog_options('colleges')),
+                _filter('degrees', 'Degree Awarded', options=_catalog_options('degrees')),
+                _filter('degreeTerms', 'Degree Term', options=_catalog_options('degreeTerms')),
+                _filter('enteringTerms', 'Entering Term', options=_catalog_options('enteringTerms')),
+                _filter('epnCpnGradingTerms', 'EPN/CPN Grading Option', options=_catalog_options('epnCpnGradingTerms')),
+                _filter('expectedGradTerms', 'Expected Graduation Term', options=_catalog_options('expectedGradTerms')),
                 _range_filter('gpaRanges', 'GPA (Cumulative)', labels_range=['', '-'], validation='gpa'),
                 _range_filter('lastTermGpaRanges', 'GPA (Last Term)', labels_range=['', '-'], validation='gpa'),
-                _filter('graduatePrograms', 'Graduate Plan', options=graduate_programs()),
+                _filter('graduatePrograms', 'Graduate Plan', options=_catalog_options('graduatePrograms')),
                 _boolean_filter('studentHolds', 'Holds'),
-                _filter('intendedMajors', 'Intended Major', options=intended_majors()),
+                _filter('intendedMajors', 'Intended Major', options=_catalog_options('intendedMajors')),
                 _filter('levels', 'Level', options=level_options()),
-                _filter('majors', 'Major', options=majors()),
-                _filter('minors', 'Minor', options=minors()),
+                _filter('majors', 'Major', options=_catalog_options('majors')),
+                _filter('minors', 'Minor', options=_catalog_options('minors')),
                 _boolean_filter('midpointDeficient', 'Midpoint Deficient Grade'),
                 _boolean_filter('transfer', 'Transfer Student'),
                 _filter('unitRanges', 'Units Completed', options=unit_range_options()),
             ],
             'Demographics': [
-                _filter('ethnicities', 'Ethnicity', options=ethnicities()),
-                _filter('genders', 'Gender', options=genders()),
+                _filter('ethnicities', 'Ethnicity', options=_catalog_options('ethnicities')),
+                _filter('genders', 'Gender', options=_catalog_options('genders')),
                 _range_filter(
                     'lastNameRanges',
                     'Last Name',
@@ -114,7 +114,7 @@ class CohortFilterOptions:
                     validation='char[2]',
                 ),
                 _boolean_filter('underrepresented', 'Underrepresented Minority'),
-                _filter('visaTypes', 'Visa Type', options=visa_types()),
+                _filter('visaTypes', 'Visa Type', options=_catalog_options('visaTypes')),
             ],
             'Departmental (ASC)': [
                 _boolean_filter_asc(
@@ -123,11 +123,11 @@ class CohortFilterOptions:
                     default_value=False if 'UWASC' in self.scope else None,
                 ),
                 _boolean_filter('inIntensiveCohort', 'Intensive (ASC)', available_to=['UWASC']),
-                _filter('groupCodes', 'Team (ASC)', options=team_groups(), available_to=['UWASC']),
+                _filter('groupCodes', 'Team (ASC)', options=_catalog_options('groupCodes'), available_to=['UWASC']),
             ],
             'Departmental (COE)': [
-                _filter('coeAdvisorLdapUids', 'Advisor (COE)', options=get_coe_profiles(), available_to=['COENG']),
-                _filter('coeEthnicities', 'Ethnicity (COE)', options=coe_ethnicities(), available_to=['COENG']),
+                _filter('coeAdvisorLdapUids', 'Advisor (COE)', options=_catalog_options('coeAdvisorLdapUids'), available_to=['COENG']),
+                _filter('coeEthnicities', 'Ethnicity (COE)', options=_catalog_options('coeEthnicities'), available_to=['COENG']),
                 _filter('coeGenders', 'Gender (COE)', options=coe_gender_options(), available_to=['COENG']),
                 _filter('coePrepStatuses', 'PREP (COE)', options=coe_prep_status_options(), available_to=['COENG']),
                 _boolean_filter_coe('coeProbation', 'Probation (COE)'),
@@ -138,18 +138,18 @@ class CohortFilterOptions:
                 _filter(
                     'curatedGroupIds',
                     'My Curated Groups',
-                    options=curated_group_options(owner_user_id) if owner_user_id else None,
+                    options=self._curated_group_options,
                 ),
                 _filter(
                     'cohortOwnerAcademicPlans',
                     'My Students',
-                    options=academic_plans_for_cohort_owner(self.owner_uid) if self.owner_uid else None,
+                    options=self._academic_plan_options,
                 ),
 
                 _filter(
                     'freshmanOrTransfer',
                     'Freshman or Transfer',
-                    options=student_admit_freshman_or_transfer_options(),
+                    options=_catalog_options('freshmanOrTransfer'),
                     available_to=['ZCEEE'],
                     domain_='admitted_students',
                 ),
@@ -159,14 +159,14 @@ class CohortFilterOptions:
                     'College',
                     available_to=['ZCEEE'],
                     domain_='admitted_students',
-                    options=student_admit_college_options(),
+                    options=_catalog_options('admitColleges'),
                 ),
                 _filter(
                     'xEthnicities',
                     'XEthnic',
                     available_to=['ZCEEE'],
                     domain_='admitted_students',
-                    options=student_admit_ethnicity_options(),
+                    options=_catalog_options('xEthnicities'),
                 ),
                 _boolean_filter_ce3('isHispanic', 'Hispanic'),
                 _boolean_filter_ce3('isUrem', 'UREM'),
@@ -177,7 +177,7 @@ class CohortFilterOptions:
                     'Residency',
                     available_to=['ZCEEE'],
                     domain_='admitted_students',
-                    options=student_admit_residency_category_options(),
+                    options=_catalog_options('residencyCategories'),
                 ),
                 _boolean_filter_ce3('inFosterCare', 'Foster Care'),
                 _boolean_filter_ce3('isFamilySingleParent', 'Family Is Single Parent'),
@@ -207,11 +207,18 @@ class CohortFilterOptions:
                     'Special Program CEP',
                     available_to=['ZCEEE'],
                     domain_='admitted_students',
-                    options=student_admit_special_program_cep_options(),
+                    options=_catalog_options('specialProgramCep'),
                 ),
             ],
         }
 
+    def _academic_plan_options(self):
+        return academic_plans_for_cohort_owner(self.owner_uid) if self.owner_uid else None
+
+    def _curated_group_options(self):
+        owner_user_id = AuthorizedUser.get_id_per_uid(self.owner_uid) if self.owner_uid else None
+        return curated_group_options(owner_user_id) if owner_user_id else None
+
     @classmethod
     def translate_to_filter_options(cls, owner_uid, domain, criteria=None):
         # Transform cohort filter criteria in the database to a UX-compatible data structure.
@@ -304,6 +311,83 @@ class CohortFilterOptions:
                     cohort_filter['disabled'] = True
 
 
+option_catalog = None
+option_catalog_invalidations = 0
+option_catalog_lock = threading.Lock()
+
+
+def get_option_catalog():
+    """Return filter menu options drawn from the loch, as built once per refresh and held in memory on each worker.
+
+    The catalog is shared: callers must copy options before modifying them.
+    """
+    global option_catalog
+    tier = get_memory_tier()
+    if tier is None:
+        return _get_option_catalog()
+    with option_catalog_lock:
+        if option_catalog and option_catalog[0] > time.monotonic():
+            return option_catalog[1]
+        invalidations = option_catalog_invalidations
+    catalog = _get_option_catalog()
+    with option_catalog_lock:
+        # Do not hold on to a catalog which was cleared while we loaded it.
+        if invalidations == option_catalog_invalidations:
+            option_catalog = (time.monotonic() + tier.ttl, catalog)
+    return catalog
+
+
+@stow('cohort_filter_options_catalog')
+def _get_option_catalog():
+    current_year = datetime.now().year
+    version = utc_now().isoformat()
+    catalog = {
+        'options': {
+            'academicDivisions': academic_division_options(),
+            'academicStandings': academic_standing_options(min_term_id=sis_term_id_for_name(f'Fall {current_year - 5}')),
+            'admitColleges': student_admit_college_options(),
+            'coeAdvisorLdapUids': get_coe_profiles(),
+            'coeEthnicities': coe_ethnicities(),
+            'colleges': colleges(),
+            'degrees': degrees(),
+            'degreeTerms': degree_terms(),
+            'enteringTerms': entering_terms(),
+            'epnCpnGradingTerms': grading_terms(),
+            'ethnicities': ethnicities(),
+            'expectedGradTerms': grad_terms(),
+            'freshmanOrTransfer': student_admit_freshman_or_transfer_options(),
+            'genders': genders(),
+            'graduatePrograms': graduate_programs(),
+            'groupCodes': team_groups(),
+            'intendedMajors': intended_majors(),
+            'majors': majors(),
+            'minors': minors(),
+            'residencyCategories': student_admit_residency_category_options(),
+            'specialProgramCep': student_admit_special_program_cep_options(),
+            'visaTypes': visa_types(),
+            'xEthnicities': student_admit_ethnicity_options(),
+        },
+        'version': version,
+    }
+    app.logger.info(f'Built cohort filter option catalog, version {version}')
+    return catalog
+
+
+def _catalog_options(key):
+    return lambda: deepcopy(get_option_catalog()['options'][key])
+
+
+def _evict_option_catalog(is_invalidated):
+    global option_catalog, option_catalog_invalidations
+    if is_invalidated('cohort_filter_options_catalog'):
+        with option_catalog_lock:
+            option_catalog = None
+            option_catalog_invalidations += 1
+
+
+on_invalidation(_evict_option_catalog)
+
+
 def _filter(
         key,
         label_primary,
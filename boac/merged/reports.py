@@ -47,10 +47,8 @@ def low_assignment_scores(term_id=None):
     primary_sections_with_scored_assignments = set()
     primary_sections_with_plottable_assignments = set()
 
-    enrollments_for_term = data_loch.get_enrollments_for_term(term_id)
-    enrollments_by_sid = {row['sid']: json.loads(row['enrollment_term']) for row in enrollments_for_term}
-    itr = iter(enrollments_by_sid.items())
-    for (sid, term) in itr:
+    for sid, enrollment_term in data_loch.iter_enrollments_for_term(term_id):
+        term = json.loads(enrollment_term)
         examined_sids.add(sid)
         for enr in term['enrollments']:
             first_section = enr['sections'][0]
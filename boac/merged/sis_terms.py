@@ -26,7 +26,27 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from boac.externals import data_loch
 from boac.lib.berkeley import previous_term_id, sis_term_id_for_name
 from boac.models.json_cache import stow
-from flask import current_app as app
+from flask import current_app as app, g
+
+
+class TermSnapshot:
+    """Current and future terms, resolved from a single read of the current term index."""
+
+    __slots__ = ['current_term_id', 'current_term_name', 'future_term_id', 'settings']
+
+    def __init__(self, current_term_setting, future_term_setting, index=None):
+        self.settings = (current_term_setting, future_term_setting)
+        if index is None and 'auto' in self.settings:
+            index = get_current_term_index()
+        if current_term_setting == 'auto':
+            self.current_term_name = index and index['current_term_name']
+        else:
+            self.current_term_name = current_term_setting
+        self.current_term_id = sis_term_id_for_name(self.current_term_name)
+        if future_term_setting == 'auto':
+            self.future_term_id = index and sis_term_id_for_name(index['future_term_name'])
+        else:
+            self.future_term_id = sis_term_id_for_name(future_term_setting)
 
 
 @stow('current_term_index')
@@ -34,24 +54,38 @@ def get_current_term_index():
     return data_loch.get_current_term_index()
 
 
+def term_snapshot():
+    """Return the term snapshot of the current app context, which lives as long as a request or background job."""
+    settings = (app.config['CANVAS_CURRENT_ENROLLMENT_TERM'], app.config['CANVAS_FUTURE_ENROLLMENT_TERM'])
+    snapshot = g.get('term_snapshot')
+    if snapshot is None or snapshot.settings != settings:
+        snapshot = TermSnapshot(*settings)
+        g.term_snapshot = snapshot
+    return snapshot
+
+
+def reset_term_snapshot():
+    g.pop('term_snapshot', None)
+
+
 def current_term_id(use_cache=True):
+    if use_cache:
+        return term_snapshot().current_term_id
     return sis_term_id_for_name(current_term_name(use_cache))
 
 
 def current_term_name(use_cache=True):
+    if use_cache:
+        return term_snapshot().current_term_name
     term_name = app.config['CANVAS_CURRENT_ENROLLMENT_TERM']
     if term_name == 'auto':
-        index = get_current_term_index() if use_cache else data_loch.get_current_term_index()
+        index = data_loch.get_current_term_index()
         return index and index['current_term_name']
     return term_name
 
 
 def future_term_id():
-    term_name = app.config['CANVAS_FUTURE_ENROLLMENT_TERM']
-    if term_name == 'auto':
-        index = get_current_term_index()
-        return index and sis_term_id_for_name(index['future_term_name'])
-    return sis_term_id_for_name(term_name)
+    return term_snapshot().future_term_id
 
 
 def all_term_ids():
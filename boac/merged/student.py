@@ -23,16 +23,19 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import base64
 from itertools import groupby
 import json
 import operator
 
 from boac import db
+from boac.api.errors import BadRequestError
 from boac.externals import data_loch, s3
 from boac.lib import analytics
 from boac.lib.berkeley import academic_year_for_term_name, dept_codes_where_advising, term_name_for_sis_id
 from boac.lib.util import get_benchmarker
-from boac.merged.sis_terms import current_term_id, current_term_name, future_term_id
+from boac.merged.sis_terms import current_term_id, future_term_id, term_snapshot
+from boac.merged.student_profile_cache import get_decoded_profiles
 from flask import current_app as app
 from flask_login import current_user
 from sqlalchemy import text
@@ -80,11 +83,10 @@ def get_full_student_profiles(sids):
     if not sids:
         return []
     benchmark('begin SIS profile query')
-    profile_results = data_loch.get_student_profiles(sids)
+    profiles_by_sid = _get_profiles_by_sid('profile', sids)
     benchmark('end SIS profile query')
-    if not profile_results:
+    if not profiles_by_sid:
         return []
-    profiles_by_sid = _get_profiles_by_sid(profile_results)
     profiles = []
     for sid in sids:
         profile = profiles_by_sid.get(sid)
@@ -220,10 +222,9 @@ def get_student_profile_summaries(sids, term_id=None):
         return []
     benchmark = get_benchmarker('get_student_profile_summaries')
     benchmark('begin')
-    profile_results = data_loch.get_student_profile_summaries(sids)
-    if not profile_results:
+    profiles_by_sid = _get_profiles_by_sid('summary', sids)
+    if not profiles_by_sid:
         return []
-    profiles_by_sid = _get_profiles_by_sid(profile_results)
     profiles = []
     for sid in sids:
         profile = profiles_by_sid.get(sid)
@@ -333,6 +334,7 @@ def query_students(
     coe_underrepresented=None,
     colleges=None,
     curated_group_ids=None,
+    cursor=None,
     degree_terms=None,
     degrees=None,
     entering_terms=None,
@@ -356,6 +358,7 @@ def query_students(
     minors=None,
     offset=0,
     order_by=None,
+    include_sids=True,
     sids=(),
     sids_only=False,
     student_holds=None,
@@ -434,48 +437,173 @@ def query_students(
             'sids': [],
             'students': [],
             'totalStudentCount': 0,
-        }    # First, get total_count of matching students
-    sids_result = data_loch.safe_execute_rds(f'SELECT DISTINCT(spi.sid) {query_tables} {query_filter}', **query_bindings)
-    if sids_result is None:
+        }
+    if sids_only:
+        sids_result = data_loch.safe_execute_rds(
+            f'SELECT DISTINCT(spi.sid) {query_tables} {query_filter}',
+            query_class='cohort',
+            **query_bindings,
+        )
+        if sids_result is None:
+            return None
+        return {
+            'sids': [row['sid'] for row in sids_result],
+            'totalStudentCount': len(sids_result),
+        }
+    o, o_secondary, o_tertiary, o_direction, supplemental_query_tables = data_loch.get_students_ordering(
+        current_term_id=current_term_id(),
+        order_by=order_by,
+        group_codes=group_codes,
+        majors=majors,
+        scope=scope,
+    )
+    if supplemental_query_tables:
+        query_tables += supplemental_query_tables
+    nulls_last = ('entering_term', 'group_name', 'term_gpa', 'terms_in_attendance', 'units')
+    o_null_order = 'NULLS LAST' if any(s in o for s in nulls_last) else 'NULLS FIRST'
+    result = _query_page_and_count(
+        query_bindings=query_bindings,
+        query_class='cohort',
+        query_filter=query_filter,
+        query_tables=query_tables,
+        cursor=cursor,
+        include_sids=include_sids,
+        limit=limit,
+        offset=offset,
+        order_by=order_by,
+        ordering=(o, o_secondary, o_tertiary, o_direction, o_null_order),
+    )
+    if result is None:
         return None
     # Upstream logic may require the full list of SIDs even if we're only returning full results for a particular
     # paged slice.
     summary = {
-        'sids': [row['sid'] for row in sids_result],
-        'totalStudentCount': len(sids_result),
+        'nextCursor': result['next_cursor'],
+        'totalStudentCount': result['total_student_count'],
     }
-    if not sids_only:
-        o, o_secondary, o_tertiary, o_direction, supplemental_query_tables = data_loch.get_students_ordering(
-            current_term_id=current_term_id(),
-            order_by=order_by,
-            group_codes=group_codes,
-            majors=majors,
-            scope=scope,
-        )
-        if supplemental_query_tables:
-            query_tables += supplemental_query_tables
+    if include_sids:
+        summary['sids'] = result['sids']
+    if include_profiles:
+        summary['students'] = get_student_profile_summaries(result['page_sids'], term_id=term_id)
+    else:
+        summary['students'] = get_distilled_student_profiles(result['page_sids'])
+    return summary
+
 
-        nulls_last = ('entering_term', 'group_name', 'term_gpa', 'terms_in_attendance', 'units')
-        o_null_order = 'NULLS LAST' if any(s in o for s in nulls_last) else 'NULLS FIRST'
-        sql = f"""SELECT
-            spi.sid, MIN({o}), MIN({o_secondary}), MIN({o_tertiary})
+def decode_page_cursor(cursor, order_by):
+    """Decode a token returned as 'nextCursor', which must have been issued for the same sort order."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (AttributeError, TypeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != 5 or values[0] != (order_by or None):
+        raise BadRequestError('Invalid or expired page cursor')
+    return values[1:]
+
+
+def encode_page_cursor(order_by, keys):
+    return base64.urlsafe_b64encode(json.dumps([order_by or None] + list(keys)).encode()).decode()
+
+
+def _keyset_predicate(ordering, cursor_values, query_bindings):
+    # Matches rows that sort strictly after the cursor row. Row-value comparison can't express mixed directions and null
+    # ordering, so the predicate is expanded key by key: (k1 after v1) OR (k1 = v1 AND ((k2 after v2) OR ...)).
+    o_direction, o_null_order = ordering[3], ordering[4]
+    keys = [
+        ('order_1', o_direction, o_null_order),
+        ('order_2', 'asc', 'NULLS FIRST'),
+        ('order_3', 'asc', 'NULLS FIRST'),
+        ('sid', 'asc', 'NULLS FIRST'),
+    ]
+    predicate = None
+    for index in reversed(range(len(keys))):
+        column, direction, null_order = keys[index]
+        bind = f'cursor_{index}'
+        query_bindings[bind] = cursor_values[index]
+        if cursor_values[index] is None:
+            after = f'{column} IS NOT NULL' if null_order == 'NULLS FIRST' else 'FALSE'
+        else:
+            after = f"{column} {'<' if direction == 'desc' else '>'} %({bind})s"
+            if null_order == 'NULLS LAST':
+                after = f'({after} OR {column} IS NULL)'
+        if predicate:
+            predicate = f'({after} OR ({column} IS NOT DISTINCT FROM %({bind})s AND {predicate}))'
+        else:
+            predicate = after
+    return predicate
+
+
+def _query_page_and_count(
+        query_bindings,
+        query_class,
+        query_filter,
+        query_tables,
+        include_sids,
+        limit,
+        offset,
+        order_by,
+        ordering,
+        cursor=None,
+):
+    # The filtered, grouped students are computed once; the page, total count and (optionally) full SID list are all
+    # read from the same CTE in a single round-trip. Given a cursor, the page starts after the cursor row rather than
+    # at an offset. Unless the full SID list is wanted, a cursor page is then read by a plain top-N query with no CTE to
+    # materialize and no total count: total_student_count is None, and callers should keep the first page's count.
+    o, o_secondary, o_tertiary, o_direction, o_null_order = ordering
+    order_clause = f'order_1 {o_direction} {o_null_order}, order_2 NULLS FIRST, order_3 NULLS FIRST, sid'
+    if cursor:
+        page_filter = 'WHERE ' + _keyset_predicate(ordering, decode_page_cursor(cursor, order_by), query_bindings)
+        query_bindings['offset'] = 0
+    else:
+        page_filter = ''
+        query_bindings['offset'] = offset
+    limit_clause = ''
+    if limit and limit < 100:  # Sanity check large limits
+        query_bindings['limit'] = limit
+        limit_clause = 'LIMIT %(limit)s'
+    matches = f"""SELECT spi.sid, MIN({o}) AS order_1, MIN({o_secondary}) AS order_2, MIN({o_tertiary}) AS order_3
             {query_tables}
             {query_filter}
-            GROUP BY spi.sid
-            ORDER BY MIN({o}) {o_direction} {o_null_order}, MIN({o_secondary}) NULLS FIRST, MIN({o_tertiary}) NULLS FIRST"""
-        if o_tertiary != 'spi.sid':
-            sql += ', spi.sid'
-        sql += ' OFFSET %(offset)s'
-        query_bindings['offset'] = offset
-        if limit and limit < 100:  # Sanity check large limits
-            query_bindings['limit'] = limit
-            sql += ' LIMIT %(limit)s'
-        students_result = data_loch.safe_execute_rds(sql, **query_bindings)
-        if include_profiles:
-            summary['students'] = get_student_profile_summaries([row['sid'] for row in students_result], term_id=term_id)
-        else:
-            summary['students'] = get_distilled_student_profiles([row['sid'] for row in students_result])
-    return summary
+            GROUP BY spi.sid"""
+    page_keys_column = f"""(
+                SELECT json_agg(json_build_array(order_1::text, order_2::text, order_3::text, sid) ORDER BY {order_clause})
+                FROM page
+            ) AS page_keys"""
+    if cursor and not include_sids:
+        sql = f"""WITH page AS (
+            SELECT * FROM ({matches}) AS matches
+            {page_filter}
+            ORDER BY {order_clause}
+            {limit_clause}
+        )
+        SELECT NULL AS total_student_count, {page_keys_column}"""
+    else:
+        sids_column = ', ARRAY(SELECT sid FROM matches) AS sids' if include_sids else ''
+        sql = f"""WITH matches AS (
+            {matches}
+        ),
+        page AS (
+            SELECT * FROM matches
+            {page_filter}
+            ORDER BY {order_clause}
+            OFFSET %(offset)s {limit_clause}
+        )
+        SELECT
+            (SELECT COUNT(*) FROM matches) AS total_student_count,
+            {page_keys_column}
+            {sids_column}"""
+    rows = data_loch.safe_execute_rds(sql, query_class=query_class, **query_bindings)
+    if not rows:
+        return None
+    result = rows[0]
+    page_keys = result['page_keys'] or []
+    result['page_sids'] = [keys[3] for keys in page_keys]
+    # A full page may be followed by more students; hand out a cursor for the row after it.
+    if page_keys and limit_clause and len(page_keys) == limit:
+        result['next_cursor'] = encode_page_cursor(order_by, page_keys[-1])
+    else:
+        result['next_cursor'] = None
+    return result
 
 
 def search_for_students(
@@ -483,6 +611,7 @@ def search_for_students(
     order_by=None,
     offset=0,
     limit=None,
+    cursor=None,
 ):
     benchmark = get_benchmarker('search_for_students')
     benchmark('begin')
@@ -499,31 +628,26 @@ def search_for_students(
     )
     if supplemental_query_tables:
         query_tables += supplemental_query_tables
-    benchmark('begin SID query')
-    result = data_loch.safe_execute_rds(f'SELECT DISTINCT(spi.sid) {query_tables} {query_filter}', **query_bindings)
-    benchmark('end SID query')
-    total_student_count = len(result)
-
-    sql = f"""SELECT
-        spi.sid
-        {query_tables}
-        {query_filter}
-        GROUP BY spi.sid
-        ORDER BY MIN({o}) {o_direction} NULLS FIRST, MIN({o_secondary}) NULLS FIRST, MIN({o_tertiary}) NULLS FIRST"""
-    if o_tertiary != 'spi.sid':
-        sql += ', spi.sid'
-    sql += f' OFFSET {offset}'
-    if limit and limit < 100:  # Sanity check large limits
-        sql += ' LIMIT %(limit)s'
-        query_bindings['limit'] = limit
     benchmark('begin student query')
-    result = data_loch.safe_execute_rds(sql, **query_bindings)
+    result = _query_page_and_count(
+        query_bindings=query_bindings,
+        query_class='search',
+        query_filter=query_filter,
+        query_tables=query_tables,
+        cursor=cursor,
+        include_sids=False,
+        limit=limit,
+        offset=offset,
+        order_by=order_by,
+        ordering=(o, o_secondary, o_tertiary, o_direction, 'NULLS FIRST'),
+    )
     benchmark('begin profile collection')
-    students = get_student_profile_summaries([row['sid'] for row in result])
+    students = get_student_profile_summaries(result['page_sids']) if result else []
     benchmark('end')
     return {
+        'nextCursor': result['next_cursor'] if result else None,
         'students': students,
-        'totalStudentCount': total_student_count,
+        'totalStudentCount': result['total_student_count'] if result else 0,
     }
 
 
@@ -549,15 +673,16 @@ def get_student_query_scope(user=None):
 
 
 def merge_enrollment_terms(enrollment_results, academic_standing=None):
+    terms = term_snapshot()
     current_term_found = False
     filtered_enrollment_terms = []
     for row in enrollment_results:
         term = json.loads(row['enrollment_term'])
         term_id = term['termId']
-        if term_id == current_term_id():
+        if term_id == terms.current_term_id:
             current_term_found = True
         else:
-            if term_id < current_term_id():
+            if term_id < terms.current_term_id:
                 # Skip past terms with no enrollments or drops.
                 if not term.get('enrollments') and not term.get('droppedSections'):
                     continue
@@ -577,11 +702,11 @@ def merge_enrollment_terms(enrollment_results, academic_standing=None):
         filtered_enrollment_terms.append(term)
     if not current_term_found:
         current_term = {
-            'academicYear': academic_year_for_term_name(current_term_name()),
+            'academicYear': academic_year_for_term_name(terms.current_term_name),
             'enrolledUnits': 0,
             'enrollments': [],
-            'termId': current_term_id(),
-            'termName': current_term_name(),
+            'termId': terms.current_term_id,
+            'termName': terms.current_term_name,
         }
         filtered_enrollment_terms.append(current_term)
     return filtered_enrollment_terms
@@ -692,20 +817,14 @@ def _construct_student_profile(student):
     return profile
 
 
-def _get_profiles_by_sid(profiles):
-    profiles_by_sid = {}
-    for row in profiles:
-        profile = json.loads(row['profile'])
-        if profile:
-            profiles_by_sid[row['sid']] = profile
-    return profiles_by_sid
+def _get_profiles_by_sid(kind, sids):
+    return {sid: profile for sid, profile in get_decoded_profiles(kind, sids).items() if profile}
 
 
 def _merge_asc_student_profile_data(profiles_by_sid, scope):
-    athletics_profiles = data_loch.get_athletics_profiles(list(profiles_by_sid))
-    for athletics_profile in athletics_profiles or []:
-        profile = profiles_by_sid.get(athletics_profile['sid'])
-        athletics_profile = json.loads(athletics_profile['profile'])
+    athletics_profiles = get_decoded_profiles('athletics', list(profiles_by_sid))
+    for sid, athletics_profile in athletics_profiles.items():
+        profile = profiles_by_sid.get(sid)
         if 'UWASC' in scope or 'ADMIN' in scope:
             profile['athleticsProfile'] = athletics_profile
         else:
@@ -714,10 +833,10 @@ def _merge_asc_student_profile_data(profiles_by_sid, scope):
 
 
 def _merge_coe_student_profile_data(profiles_by_sid):
-    coe_profiles = data_loch.get_coe_profiles(list(profiles_by_sid))
-    for coe_profile in coe_profiles or []:
-        profile = profiles_by_sid.get(coe_profile['sid'])
-        profile['coeProfile'] = json.loads(coe_profile['profile'])
+    coe_profiles = get_decoded_profiles('coe', list(profiles_by_sid))
+    for sid, coe_profile in coe_profiles.items():
+        profile = profiles_by_sid.get(sid)
+        profile['coeProfile'] = coe_profile
         if 'minority' in profile['coeProfile']:
             profile['coeProfile']['underrepresented'] = profile['coeProfile']['minority']
         if profile['coeProfile'].get('status') in ['D', 'P', 'U', 'W', 'X', 'Z']:
@@ -0,0 +1,126 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+# Per-worker cache of student profile JSON from the loch, dropped whenever the loch's profile tables change.
+#
+# Changes are detected by a generation marker drawn partly from pg_stat_user_tables (see
+# data_loch.get_student_profiles_generation). Those counters are not maintained on read replicas: against a replica,
+# in-place updates go unnoticed, and cached profiles are bounded only by STUDENT_PROFILE_CACHE_TTL.
+
+import json
+import threading
+import time
+
+from boac.externals import data_loch
+from boac.models.json_cache import MemoryTier
+from flask import current_app as app
+
+
+# Profile kind to the data_loch function which fetches (sid, profile) rows for a list of SIDs.
+PROFILE_FETCHERS = {
+    'athletics': 'get_athletics_profiles',
+    'coe': 'get_coe_profiles',
+    'profile': 'get_student_profiles',
+    'summary': 'get_student_profile_summaries',
+}
+
+profile_tier = None
+generation = None
+generation_checked_at = None
+generation_lock = threading.Lock()
+
+
+def get_decoded_profiles(kind, sids):
+    """Return a dict of freshly decoded profiles by SID, fetching from the loch only those SIDs not already cached.
+
+    Every call returns new objects, so callers are free to merge data into the profiles they receive. SIDs without a
+    profile of the given kind (most students have no ASC or COE profile) are cached as such, and omitted from the result.
+    """
+    fetch = getattr(data_loch, PROFILE_FETCHERS[kind])
+    tier = _get_profile_tier()
+    if tier is None:
+        rows = fetch(sids)
+        return {row['sid']: json.loads(row['profile']) for row in rows or []}
+    profiles_by_sid = {}
+    missing_sids = []
+    for sid in sids:
+        found, profile = tier.get(f'{kind}_{sid}')
+        if not found:
+            missing_sids.append(sid)
+        elif profile is not None:
+            profiles_by_sid[sid] = profile
+    if missing_sids:
+        rows = fetch(missing_sids)
+        # A failed loch query tells us nothing about which SIDs lack a profile.
+        if rows is not None:
+            serialized_by_sid = {row['sid']: row['profile'] for row in rows}
+            for sid in missing_sids:
+                serialized = serialized_by_sid.get(sid)
+                tier.put_serialized(f'{kind}_{sid}', serialized or 'null')
+                if serialized:
+                    profiles_by_sid[sid] = json.loads(serialized)
+    return profiles_by_sid
+
+
+def profile_cache_stats():
+    return profile_tier.stats() if profile_tier else None
+
+
+def reset_profile_cache():
+    global generation, generation_checked_at
+    with generation_lock:
+        if profile_tier:
+            profile_tier.flush()
+        generation = None
+        generation_checked_at = None
+
+
+def _get_profile_tier():
+    global profile_tier
+    max_entries = app.config['STUDENT_PROFILE_CACHE_MAX_ENTRIES']
+    if not max_entries or max_entries <= 0:
+        return None
+    if profile_tier is None:
+        profile_tier = MemoryTier(max_entries=max_entries, ttl=app.config['STUDENT_PROFILE_CACHE_TTL'])
+    _check_generation()
+    return profile_tier
+
+
+def _check_generation():
+    global generation, generation_checked_at
+    now = time.monotonic()
+    with generation_lock:
+        interval = app.config['STUDENT_PROFILE_CACHE_GENERATION_CHECK_INTERVAL']
+        if generation_checked_at is not None and now - generation_checked_at < interval:
+            return
+        generation_checked_at = now
+    current_generation = data_loch.get_student_profiles_generation()
+    with generation_lock:
+        # If the marker can't be read, nothing cached can be vouched for.
+        if current_generation is None or current_generation != generation:
+            if generation is not None:
+                app.logger.info('Loch student profiles have changed; flushing profile cache')
+            profile_tier.flush()
+            generation = current_generation
@@ -23,12 +23,154 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from collections import OrderedDict
+import threading
+import time
+
+from boac import db
 from boac.lib.berkeley import BERKELEY_DEPT_CODE_TO_NAME
 from boac.merged import calnet
 from boac.models.authorized_user import AuthorizedUser
-from boac.models.json_cache import clear, stow
+from boac.models.json_cache import clear, get_memory_tier, on_invalidation, stow
 from flask import current_app as app
 from flask_login import UserMixin
+from sqlalchemy.sql import text
+
+
+class SessionPrincipal:
+    """Compact summary of a user's permissions, which is all that most requests need of their session.
+
+    Principals are cached per worker. Each carries the cache version current when it was loaded; a principal loaded
+    while an invalidation arrived is returned but not cached.
+    """
+
+    __slots__ = (
+        'can_access_advising_data',
+        'can_access_canvas_data',
+        'can_access_ce3_features',
+        'degree_progress_permission',
+        'department_roles',
+        'drop_in_dept_codes',
+        'in_demo_mode',
+        'is_active',
+        'is_admin',
+        'same_day_dept_codes',
+        'uid',
+        'user_id',
+        'version',
+    )
+
+    def __init__(
+            self,
+            can_access_advising_data=False,
+            can_access_canvas_data=False,
+            can_access_ce3_features=False,
+            degree_progress_permission=None,
+            department_roles=(),
+            drop_in_dept_codes=(),
+            in_demo_mode=False,
+            is_active=False,
+            is_admin=False,
+            same_day_dept_codes=(),
+            uid=None,
+            user_id=None,
+            version=0,
+    ):
+        self.can_access_advising_data = can_access_advising_data
+        self.can_access_canvas_data = can_access_canvas_data
+        self.can_access_ce3_features = can_access_ce3_features
+        self.degree_progress_permission = degree_progress_permission
+        # Tuple of (dept_code, role) pairs.
+        self.department_roles = department_roles
+        self.drop_in_dept_codes = drop_in_dept_codes
+        self.in_demo_mode = in_demo_mode
+        self.is_active = is_active
+        self.is_admin = is_admin
+        self.same_day_dept_codes = same_day_dept_codes
+        self.uid = uid
+        self.user_id = user_id
+        self.version = version
+
+    def __repr__(self):
+        return f'<SessionPrincipal user_id={self.user_id}, uid={self.uid}, version={self.version}>'
+
+    @classmethod
+    def for_user_id(cls, user_id):
+        tier = get_memory_tier()
+        if tier is None:
+            return cls._load(user_id, principals_version)
+        with principals_lock:
+            entry = principals.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                principals.move_to_end(user_id)
+                return entry[1]
+            version = principals_version
+        principal = cls._load(user_id, version)
+        with principals_lock:
+            if version == principals_version:
+                principals[user_id] = (time.monotonic() + tier.ttl, principal)
+                principals.move_to_end(user_id)
+                while len(principals) > app.config['USER_SESSION_PRINCIPAL_MAX_ENTRIES']:
+                    principals.popitem(last=False)
+        return principal
+
+    @classmethod
+    def _load(cls, user_id, version):
+        sql = """SELECT u.id, u.uid, u.is_admin, u.in_demo_mode, u.can_access_advising_data, u.can_access_canvas_data,
+              CAST(u.degree_progress_permission AS TEXT) AS degree_progress_permission,
+              COALESCE(
+                (SELECT json_agg(json_build_array(d.dept_code, m.role) ORDER BY d.dept_code)
+                  FROM university_dept_members m
+                  JOIN university_depts d ON d.id = m.university_dept_id
+                  WHERE m.authorized_user_id = u.id),
+                '[]'
+              ) AS department_roles,
+              ARRAY(SELECT dept_code FROM drop_in_advisors WHERE authorized_user_id = u.id) AS drop_in_dept_codes,
+              ARRAY(SELECT dept_code FROM same_day_advisors WHERE authorized_user_id = u.id) AS same_day_dept_codes
+            FROM authorized_users u
+            WHERE u.id = :user_id AND u.deleted_at IS NULL"""
+        row = db.session.execute(text(sql), {'user_id': user_id}).first()
+        if not row:
+            return cls(user_id=user_id, version=version)
+        department_roles = tuple((dept_code, role) for dept_code, role in row['department_roles'])
+        calnet_profile = calnet.get_calnet_user_for_uid(app, row['uid'], force_feed=False, skip_expired_users=True)
+        if not calnet_profile:
+            is_active = False
+        elif row['is_admin']:
+            is_active = True
+        else:
+            is_active = any(role for dept_code, role in department_roles)
+        return cls(
+            can_access_advising_data=row['can_access_advising_data'],
+            can_access_canvas_data=row['can_access_canvas_data'],
+            can_access_ce3_features=bool(row['is_admin'] or any(dept_code == 'ZCEEE' for dept_code, role in department_roles)),
+            degree_progress_permission='read_write' if row['is_admin'] else row['degree_progress_permission'],
+            department_roles=department_roles,
+            drop_in_dept_codes=tuple(row['drop_in_dept_codes']),
+            in_demo_mode=row['in_demo_mode'],
+            is_active=is_active,
+            is_admin=row['is_admin'],
+            same_day_dept_codes=tuple(row['same_day_dept_codes']),
+            uid=row['uid'],
+            user_id=row['id'],
+            version=version,
+        )
+
+
+principals = OrderedDict()
+principals_lock = threading.Lock()
+principals_version = 0
+
+
+def _evict_principals(is_invalidated):
+    global principals_version
+    with principals_lock:
+        principals_version += 1
+        for user_id in [u for u in principals if is_invalidated(f'boa_user_session_{u}')]:
+            del principals[user_id]
+
+
+on_invalidation(_evict_principals)
 
 
 class UserSession(UserMixin):
@@ -42,33 +184,41 @@ class UserSession(UserMixin):
         if self.user_id:
             if flush_cached:
                 self.flush_cached()
-            self.api_json = self.load_user(self.user_id)
+            self.principal = SessionPrincipal.for_user_id(self.user_id)
         else:
-            self.api_json = self._get_api_json()
+            self.principal = SessionPrincipal()
+        # The full feed, with CalNet profile and department details, is loaded only if asked for.
+        self._api_json = None
+
+    @property
+    def api_json(self):
+        if self._api_json is None:
+            self._api_json = self.load_user(self.user_id) if self.user_id else self._get_api_json()
+        return self._api_json
 
     @property
     def can_access_admitted_students(self):
-        return self.api_json['canAccessAdmittedStudents']
+        return bool(app.config['FEATURE_FLAG_ADMITTED_STUDENTS'] and self.principal.can_access_ce3_features)
 
     @property
     def can_access_advising_data(self):
-        return self.api_json['canAccessAdvisingData']
+        return self.principal.can_access_advising_data
 
     @property
     def can_access_canvas_data(self):
-        return self.api_json['canAccessCanvasData']
+        return self.principal.can_access_canvas_data
 
     @property
     def can_access_private_notes(self):
-        return self.api_json['canAccessPrivateNotes']
+        return self.principal.can_access_ce3_features
 
     @property
     def can_edit_degree_progress(self):
-        return self.api_json['canEditDegreeProgress']
+        return self.principal.degree_progress_permission == 'read_write'
 
     @property
     def can_read_degree_progress(self):
-        return self.api_json['canReadDegreeProgress']
+        return self.principal.degree_progress_permission in ['read', 'read_write']
 
     @property
     def departments(self):
@@ -92,41 +242,35 @@ class UserSession(UserMixin):
         return self.user_id
 
     def get_uid(self):
-        return self.api_json['uid']
+        return self.principal.uid
 
     @property
     def in_demo_mode(self):
-        return self.api_json['inDemoMode']
+        return self.principal.in_demo_mode
 
     @property
     def is_active(self):
-        return self.api_json['isActive']
+        return self.principal.is_active
 
     @property
     def is_admin(self):
-        return self.api_json['isAdmin']
+        return self.principal.is_admin
 
     @property
     def is_anonymous(self):
-        return not self.api_json['isAnonymous']
+        return self.principal.is_active
 
     @property
     def is_authenticated(self):
-        return self.api_json['isAuthenticated']
+        return self.principal.is_active
 
     @property
     def is_drop_in_advisor(self):
-        if self.api_json['dropInAdvisorStatus']:
-            return True
-        else:
-            return False
+        return any(c in app.config['DEPARTMENTS_SUPPORTING_DROP_INS'] for c in self.principal.drop_in_dept_codes)
 
     @property
     def is_same_day_advisor(self):
-        if self.api_json['sameDayAdvisorStatus']:
-            return True
-        else:
-            return False
+        return any(c in app.config['DEPARTMENTS_SUPPORTING_SAME_DAY_APPTS'] for c in self.principal.same_day_dept_codes)
 
     @classmethod
     @stow('boa_user_session_{user_id}')
@@ -0,0 +1,76 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac import db, std_commit
+from boac.lib.background import bg_execute_debounced
+from flask import current_app as app
+from sqlalchemy.sql import text
+
+
+class AdvisorAuthorIndex(db.Model):
+    """Distinct name and UID of every advisor or author of a BOA appointment or note, for advisor search by name."""
+
+    __tablename__ = 'advisor_author_index'
+
+    advisor_name = db.Column(db.String(255), nullable=False, primary_key=True)
+    advisor_uid = db.Column(db.String(255), nullable=False, primary_key=True)
+
+    @classmethod
+    def add(cls, advisor_name, advisor_uid):
+        if advisor_name and advisor_uid:
+            query = text("""
+                INSERT INTO advisor_author_index (advisor_name, advisor_uid)
+                VALUES (:advisor_name, :advisor_uid)
+                ON CONFLICT DO NOTHING
+            """)
+            db.session.execute(query, {'advisor_name': advisor_name, 'advisor_uid': advisor_uid})
+
+    @classmethod
+    def schedule_rebuild(cls):
+        """Drop names no longer found on any appointment or note, once the current burst of writes has settled.
+
+        Only needed when an advisor is taken off an appointment; additions are indexed as they happen.
+        """
+        bg_execute_debounced('advisor_author_index', _rebuild, app.config['SEARCH_INDEX_REBUILD_DELAY'])
+
+
+def _rebuild(db_session):
+    db_session.execute(text("""
+        WITH authors AS (
+            SELECT advisor_name, advisor_uid FROM appointments
+            WHERE advisor_name IS NOT NULL AND advisor_uid IS NOT NULL
+            UNION
+            SELECT author_name, author_uid FROM notes
+            WHERE author_name IS NOT NULL AND author_uid IS NOT NULL
+        ),
+        deleted AS (
+            DELETE FROM advisor_author_index
+            WHERE (advisor_name, advisor_uid) NOT IN (SELECT advisor_name, advisor_uid FROM authors)
+        )
+        INSERT INTO advisor_author_index (advisor_name, advisor_uid)
+        SELECT advisor_name, advisor_uid FROM authors
+        ON CONFLICT DO NOTHING
+    """))
+    std_commit(session=db_session)
@@ -32,9 +32,8 @@ from boac import db, std_commit
 from boac.api.errors import BadRequestError
 from boac.externals import data_loch
 from boac.lib.berkeley import ACADEMIC_STANDING_DESCRIPTIONS, section_is_eligible_for_alerts, term_name_for_sis_id
-from boac.lib.util import camelize, unix_timestamp_to_localtime, utc_timestamp_to_localtime
+from boac.lib.util import camelize, unix_timestamp_to_localtime, utc_now, utc_timestamp_to_localtime
 from boac.merged.sis_terms import current_term_id, current_term_name
-from boac.merged.student import get_academic_standing_by_sid
 from boac.models.base import Base
 from boac.models.db_relationships import AlertView
 from flask import current_app as app
@@ -88,6 +87,7 @@ class Alert(Base):
             alert.created_at = created_at
             alert.updated_at = created_at
         db.session.add(alert)
+        alert._refresh_counts()
         std_commit()
 
     def __init__(self, sid, alert_type, key, message=None, deleted_at=None):
@@ -117,6 +117,7 @@ class Alert(Base):
                 alert_view.dismissed_at = datetime.now()
             else:
                 db.session.add(AlertView(viewer_id=viewer_id, alert_id=alert_id, dismissed_at=datetime.now()))
+            alert._refresh_counts()
             std_commit()
         else:
             raise BadRequestError(f'No alert found for id {alert_id}')
@@ -132,16 +133,16 @@ class Alert(Base):
         limit=None,
     ):
         query = """
-            SELECT alerts.sid, count(*) as alert_count
-            FROM alerts LEFT JOIN alert_views
-                ON alert_views.alert_id = alerts.id
-                AND alert_views.viewer_id = :viewer_id
-            WHERE alerts.deleted_at IS NULL
-                AND alerts.key LIKE :key
-                AND alerts.sid = ANY(:sids)
-                AND alert_views.dismissed_at IS NULL
-            GROUP BY alerts.sid
-            ORDER BY alert_count DESC, alerts.sid
+            SELECT c.sid, c.alert_count - COALESCE(d.dismissed_count, 0) AS alert_count
+            FROM alert_counts c
+            LEFT JOIN alert_dismissal_counts d
+                ON d.viewer_id = :viewer_id
+                AND d.term_id = c.term_id
+                AND d.sid = c.sid
+            WHERE c.term_id = :term_id
+                AND c.sid = ANY(:sids)
+                AND c.alert_count > COALESCE(d.dismissed_count, 0)
+            ORDER BY alert_count DESC, c.sid
         """
         if offset:
             query += ' OFFSET :offset'
@@ -149,7 +150,7 @@ class Alert(Base):
             query += ' LIMIT :limit'
         params = {
             'viewer_id': viewer_id,
-            'key': current_term_id() + '_%',
+            'term_id': current_term_id(),
             'sids': sids,
             'offset': offset,
             'limit': limit,
@@ -219,12 +220,74 @@ class Alert(Base):
         # and shouldn't be treated as updated after creation.
         if preserve_creation_date:
             self.updated_at = self.created_at
+        self._refresh_counts()
         std_commit()
 
     def deactivate(self):
         self.deleted_at = datetime.now()
+        self._refresh_counts()
         std_commit()
 
+    def _refresh_counts(self):
+        term_id = _term_id_for_key(self.key)
+        if term_id:
+            # Raw SQL below does not autoflush, so pending changes to this alert must reach the database first.
+            db.session.flush()
+            Alert.refresh_counts(term_id, sids=[self.sid])
+
+    @classmethod
+    def refresh_counts(cls, term_id, sids=None):
+        """Recompute alert_counts and alert_dismissal_counts rows of the term, for the given students or for all of them.
+
+        alert_counts holds the number of active alerts per student and term; alert_dismissal_counts holds, per viewer,
+        how many of those active alerts the viewer has dismissed. Their difference is the viewer's alert count.
+        """
+        sid_filter = 'AND sid = ANY(:sids)' if sids is not None else ''
+        alerts_sid_filter = 'AND alerts.sid = ANY(:sids)' if sids is not None else ''
+        params = {'key': f'{term_id}_%', 'sids': sids, 'term_id': str(term_id)}
+        db.session.execute(
+            text(f"""
+                WITH counts AS (
+                    SELECT sid, count(*) AS alert_count
+                    FROM alerts
+                    WHERE key LIKE :key AND deleted_at IS NULL {sid_filter}
+                    GROUP BY sid
+                ),
+                deleted AS (
+                    DELETE FROM alert_counts
+                    WHERE term_id = :term_id {sid_filter}
+                        AND sid NOT IN (SELECT sid FROM counts)
+                )
+                INSERT INTO alert_counts (term_id, sid, alert_count)
+                SELECT :term_id, sid, alert_count FROM counts
+                ON CONFLICT (term_id, sid) DO UPDATE SET alert_count = EXCLUDED.alert_count
+            """),
+            params,
+        )
+        db.session.execute(
+            text(f"""
+                WITH counts AS (
+                    SELECT alert_views.viewer_id, alerts.sid, count(*) AS dismissed_count
+                    FROM alerts
+                    JOIN alert_views ON alert_views.alert_id = alerts.id
+                    WHERE alerts.key LIKE :key
+                        AND alerts.deleted_at IS NULL
+                        AND alert_views.dismissed_at IS NOT NULL
+                        {alerts_sid_filter}
+                    GROUP BY alert_views.viewer_id, alerts.sid
+                ),
+                deleted AS (
+                    DELETE FROM alert_dismissal_counts d
+                    WHERE term_id = :term_id {sid_filter}
+                        AND NOT EXISTS (SELECT 1 FROM counts WHERE counts.viewer_id = d.viewer_id AND counts.sid = d.sid)
+                )
+                INSERT INTO alert_dismissal_counts (viewer_id, term_id, sid, dismissed_count)
+                SELECT viewer_id, :term_id, sid, dismissed_count FROM counts
+                ON CONFLICT (viewer_id, term_id, sid) DO UPDATE SET dismissed_count = EXCLUDED.dismissed_count
+            """),
+            params,
+        )
+
     @classmethod
     def create_or_activate(
             cls,
@@ -263,6 +326,7 @@ class Alert(Base):
             filter(cls.deleted_at == None)  # noqa: E711
         )
         results = query.update({cls.deleted_at: datetime.now()}, synchronize_session='fetch')
+        cls.refresh_counts(term_id, sids=[sid])
         std_commit()
         return results
 
@@ -300,104 +364,163 @@ class Alert(Base):
             filter(cls.deleted_at == None)  # noqa: E711
         )
         results = query.update({cls.deleted_at: datetime.now()}, synchronize_session='fetch')
+        cls.refresh_counts(term_id)
         std_commit()
         return results
 
+    @classmethod
+    def refresh_all_for_term(cls, term_id):
+        # Equivalent to deactivate_all_for_term followed by update_all_for_term, but alerts which survive the refresh are
+        # never deactivated in the first place.
+        cls._apply_alerts_for_term(term_id, deactivate_missing=True)
+
     @classmethod
     def update_all_for_term(cls, term_id):
+        cls._apply_alerts_for_term(term_id, deactivate_missing=False)
+
+    @classmethod
+    def _apply_alerts_for_term(cls, term_id, deactivate_missing):
         app.logger.info('Starting alert update')
-        enrollments_for_term = data_loch.get_enrollments_for_term(str(term_id))
+        desired_alerts = {}
+        for alert in cls._generate_alerts_for_term(term_id):
+            # When the same alert is generated more than once (e.g., multiple sections of a class), the last one wins.
+            desired_alerts[(alert['sid'], alert['alert_type'], alert['key'])] = alert
+        existing_alerts = cls._get_reusable_alerts_for_term(term_id)
+
+        now = utc_now()
+        reactivations = []
+        insertions = []
+        for alert_key, alert in desired_alerts.items():
+            existing_alert = existing_alerts.get(alert_key)
+            # Same rules as create_or_activate. An alert still active at the start of this run would have been deactivated
+            # by deactivate_all_for_term moments ago, so it is always eligible for reactivation.
+            if existing_alert and (
+                alert['force_use_existing']
+                or existing_alert['deleted_at'] is None
+                or (now - existing_alert['updated_at']).total_seconds() < (2 * 3600)
+            ):
+                reactivations.append({
+                    'id': existing_alert['id'],
+                    'message': alert['message'],
+                    'preserve_creation_date': alert['preserve_creation_date'],
+                })
+            else:
+                insertions.append({
+                    'sid': alert['sid'],
+                    'alert_type': alert['alert_type'],
+                    'key': alert['key'],
+                    'message': alert['message'],
+                    'created_at': alert['created_at'] or now.isoformat(),
+                })
+        deactivated_count = 0
+        if deactivate_missing:
+            deactivated_count = cls._bulk_deactivate_for_term(term_id, [r['id'] for r in reactivations], now)
+        cls._bulk_reactivate(reactivations, now, touch_active=deactivate_missing)
+        cls._bulk_insert(insertions)
+        cls.refresh_counts(term_id)
+        std_commit()
+        app.logger.info(
+            f'Alert update complete: {len(insertions)} created, {len(reactivations)} reactivated, {deactivated_count} deactivated',
+        )
+
+    @classmethod
+    def _generate_alerts_for_term(cls, term_id):
         no_activity_alerts_enabled = cls.no_activity_alerts_enabled()
         infrequent_activity_alerts_enabled = cls.infrequent_activity_alerts_enabled()
-        for row in enrollments_for_term:
-            enrollments = json.loads(row['enrollment_term']).get('enrollments', [])
+        for sid, enrollment_term in data_loch.iter_enrollments_for_term(str(term_id)):
+            enrollments = json.loads(enrollment_term).get('enrollments', [])
             for enrollment in enrollments:
-                cls.update_alerts_for_enrollment(
-                    sid=row['sid'],
+                yield from _alerts_for_enrollment(
+                    sid=sid,
                     term_id=term_id,
                     enrollment=enrollment,
                     no_activity_alerts_enabled=no_activity_alerts_enabled,
                     infrequent_activity_alerts_enabled=infrequent_activity_alerts_enabled,
                 )
-        profiles = data_loch.get_active_student_profiles()
         if app.config['ALERT_WITHDRAWAL_ENABLED'] and str(term_id) == current_term_id():
-            for row in profiles:
-                sis_profile_feed = json.loads(row['profile']).get('sisProfile') or {}
+            for sid, profile in data_loch.iter_active_student_profiles():
+                sis_profile_feed = json.loads(profile).get('sisProfile') or {}
                 if sis_profile_feed.get('withdrawalCancel', {}).get('termId') == str(term_id):
-                    cls.update_withdrawal_cancel_alerts(row['sid'], term_id)
-
-        sids = [p['sid'] for p in profiles]
-        for sid, academic_standing_list in get_academic_standing_by_sid(sids).items():
-            standing = next((s for s in academic_standing_list if s['termId'] == str(term_id)), None)
-            if standing and standing['status'] in ('DIS', 'PRO', 'SUB'):
-                cls.update_academic_standing_alerts(
-                    action_date=standing['actionDate'],
-                    sid=standing['sid'],
-                    status=standing['status'],
-                    term_id=term_id,
-                )
-        app.logger.info('Alert update complete')
+                    yield _withdrawal_cancel_alert(sid, term_id)
+
+        for sid, status, action_date in data_loch.iter_academic_standing_for_term(term_id):
+            if status in ('DIS', 'PRO', 'SUB'):
+                yield _academic_standing_alert(action_date=action_date, sid=sid, status=status, term_id=term_id)
+
+    @classmethod
+    def _get_reusable_alerts_for_term(cls, term_id):
+        # For each (sid, alert_type, key), the alert that create_or_activate would pick up after deactivate_all_for_term:
+        # active alerts first, since deactivation would make them the most recently updated, then by updated_at.
+        query = text("""
+            SELECT DISTINCT ON (sid, alert_type, key) id, sid, alert_type, key, deleted_at, updated_at
+            FROM alerts
+            WHERE key LIKE :key
+            ORDER BY sid, alert_type, key, (deleted_at IS NULL) DESC, updated_at DESC
+        """)
+        results = db.session.execute(query, {'key': f'{term_id}_%'})
+        return {(row['sid'], row['alert_type'], row['key']): row for row in results}
+
+    @classmethod
+    def _bulk_deactivate_for_term(cls, term_id, excluded_ids, now):
+        query = text("""
+            UPDATE alerts SET deleted_at = :now, updated_at = :now
+            WHERE key LIKE :key
+                AND deleted_at IS NULL
+                AND NOT (id = ANY(:excluded_ids))
+        """)
+        result = db.session.execute(query, {'excluded_ids': excluded_ids, 'key': f'{term_id}_%', 'now': now})
+        return result.rowcount
+
+    @classmethod
+    def _bulk_reactivate(cls, reactivations, now, touch_active):
+        # If touch_active is False, an alert that is already active with an unchanged message keeps its updated_at,
+        # just as the ORM would skip the UPDATE in create_or_activate.
+        count_per_chunk = 10000
+        for chunk in range(0, len(reactivations), count_per_chunk):
+            query = text("""
+                UPDATE alerts SET
+                    message = v.message,
+                    deleted_at = NULL,
+                    updated_at = CASE
+                        WHEN v.preserve_creation_date THEN alerts.created_at
+                        WHEN NOT :touch_active AND alerts.deleted_at IS NULL AND alerts.message = v.message THEN alerts.updated_at
+                        ELSE :now
+                    END
+                FROM json_to_recordset(:json_dumps) AS v(id INTEGER, message TEXT, preserve_creation_date BOOLEAN)
+                WHERE alerts.id = v.id
+            """)
+            data = reactivations[chunk:chunk + count_per_chunk]
+            db.session.execute(query, {'json_dumps': json.dumps(data), 'now': now, 'touch_active': touch_active})
+
+    @classmethod
+    def _bulk_insert(cls, insertions):
+        count_per_chunk = 10000
+        for chunk in range(0, len(insertions), count_per_chunk):
+            query = text("""
+                INSERT INTO alerts (sid, alert_type, key, message, created_at, updated_at)
+                SELECT sid, alert_type, key, message, created_at, created_at
+                FROM json_to_recordset(:json_dumps) AS v(sid VARCHAR, alert_type VARCHAR, key VARCHAR, message TEXT, created_at TIMESTAMPTZ)
+                ON CONFLICT ON CONSTRAINT alerts_sid_alert_type_key_created_at_unique_constraint
+                DO UPDATE SET message = EXCLUDED.message, deleted_at = NULL
+            """)
+            data = insertions[chunk:chunk + count_per_chunk]
+            db.session.execute(query, {'json_dumps': json.dumps(data)})
 
     @classmethod
     def update_academic_standing_alerts(cls, action_date, sid, status, term_id):
-        key = f'{term_id}_{action_date}_academic_standing_{status}'
-        status_description = ACADEMIC_STANDING_DESCRIPTIONS.get(status, status)
-        message = f"Student's academic standing is '{status_description}'."
-        datetime.strptime(action_date, '%Y-%m-%d')
-        cls.create_or_activate(
-            alert_type='academic_standing',
-            created_at=action_date,
-            force_use_existing=True,
-            key=key,
-            message=message,
-            preserve_creation_date=True,
-            sid=sid,
-        )
+        cls.create_or_activate(**_academic_standing_alert(action_date=action_date, sid=sid, status=status, term_id=term_id))
 
     @classmethod
     def update_alerts_for_enrollment(cls, sid, term_id, enrollment, no_activity_alerts_enabled, infrequent_activity_alerts_enabled):
-        for section in enrollment['sections']:
-            if section_is_eligible_for_alerts(enrollment=enrollment, section=section):
-                # If the grade is in, what's done is done.
-                if section.get('grade'):
-                    continue
-                if section.get('midtermGrade'):
-                    cls.update_midterm_grade_alerts(sid, term_id, section['ccn'], enrollment['displayName'], section['midtermGrade'])
-                last_activity = None
-                activity_percentile = None
-                for canvas_site in enrollment.get('canvasSites', []):
-                    student_activity = canvas_site.get('analytics', {}).get('lastActivity', {}).get('student')
-                    if not student_activity or student_activity.get('roundedUpPercentile') is None:
-                        continue
-                    raw_epoch = student_activity.get('raw')
-                    if last_activity is None or raw_epoch > last_activity:
-                        last_activity = raw_epoch
-                        activity_percentile = student_activity.get('roundedUpPercentile')
-                if last_activity is None:
-                    continue
-                if (
-                    no_activity_alerts_enabled
-                        and last_activity == 0
-                        and activity_percentile <= app.config['ALERT_NO_ACTIVITY_PERCENTILE_CUTOFF']
-                ):
-                    cls.update_no_activity_alerts(sid, term_id, enrollment['displayName'])
-                elif (
-                    infrequent_activity_alerts_enabled
-                    and last_activity > 0
-                ):
-                    localized_last_activity = unix_timestamp_to_localtime(last_activity).date()
-                    localized_today = unix_timestamp_to_localtime(time.time()).date()
-                    days_since = (localized_today - localized_last_activity).days
-                    if (
-                            days_since >= app.config['ALERT_INFREQUENT_ACTIVITY_DAYS']
-                            and activity_percentile <= app.config['ALERT_INFREQUENT_ACTIVITY_PERCENTILE_CUTOFF']
-                    ):
-                        cls.update_infrequent_activity_alerts(
-                            sid,
-                            term_id,
-                            enrollment['displayName'],
-                            days_since,
-                        )
+        alerts = _alerts_for_enrollment(
+            sid=sid,
+            term_id=term_id,
+            enrollment=enrollment,
+            no_activity_alerts_enabled=no_activity_alerts_enabled,
+            infrequent_activity_alerts_enabled=infrequent_activity_alerts_enabled,
+        )
+        for alert in alerts:
+            cls.create_or_activate(**alert)
 
     @classmethod
     def update_assignment_alerts(cls, sid, term_id, assignment_id, due_at, status, course_site_name):
@@ -409,33 +532,26 @@ class Alert(Base):
 
     @classmethod
     def update_midterm_grade_alerts(cls, sid, term_id, section_id, class_name, grade):
-        key = f'{term_id}_{section_id}'
-        message = f'{class_name} midpoint deficient grade of {grade}.'
-        cls.create_or_activate(sid=sid, alert_type='midterm', key=key, message=message, preserve_creation_date=True)
+        cls.create_or_activate(**_midterm_grade_alert(sid, term_id, section_id, class_name, grade))
 
     @classmethod
     def update_no_activity_alerts(cls, sid, term_id, class_name):
-        key = f'{term_id}_{class_name}'
-        message = f'No activity! Student has never visited the {class_name} bCourses site for {term_name_for_sis_id(term_id)}.'
-        cls.create_or_activate(sid=sid, alert_type='no_activity', key=key, message=message)
+        cls.create_or_activate(**_no_activity_alert(sid, term_id, class_name))
 
     @classmethod
     def update_infrequent_activity_alerts(cls, sid, term_id, class_name, days_since):
-        key = f'{term_id}_{class_name}'
-        message = f'Infrequent activity! Last {class_name} bCourses activity was {days_since} days ago.'
+        alert = _infrequent_activity_alert(sid, term_id, class_name, days_since)
         # If an active infrequent activity alert already exists and is more recent, skip the update.
-        existing_alert = cls.query.filter_by(sid=sid, alert_type='infrequent_activity', key=key, deleted_at=None).first()
+        existing_alert = cls.query.filter_by(sid=sid, alert_type='infrequent_activity', key=alert['key'], deleted_at=None).first()
         if existing_alert:
-            match = re.search('(\d+) days ago.$', message)
+            match = re.search('(\d+) days ago.$', alert['message'])
             if match and match[1] and int(match[1]) < days_since:
                 return
-        cls.create_or_activate(sid=sid, alert_type='infrequent_activity', key=key, message=message)
+        cls.create_or_activate(**alert)
 
     @classmethod
     def update_withdrawal_cancel_alerts(cls, sid, term_id):
-        key = f'{term_id}_withdrawal'
-        message = f'Student is no longer enrolled in the {term_name_for_sis_id(term_id)} term.'
-        cls.create_or_activate(sid=sid, alert_type='withdrawal', key=key, message=message, preserve_creation_date=True)
+        cls.create_or_activate(**_withdrawal_cancel_alert(sid, term_id))
 
     @classmethod
     def include_alert_counts_for_students(
@@ -462,3 +578,102 @@ class Alert(Base):
                 sid = student['sid']
                 student['alertCount'] = counts_per_sid.get(sid) if sid in counts_per_sid else 0
         return alert_counts
+
+
+def _alert(alert_type, key, message, sid, created_at=None, force_use_existing=False, preserve_creation_date=False):
+    # Keyword arguments of Alert.create_or_activate
+    return {
+        'alert_type': alert_type,
+        'created_at': created_at,
+        'force_use_existing': force_use_existing,
+        'key': key,
+        'message': message,
+        'preserve_creation_date': preserve_creation_date,
+        'sid': sid,
+    }
+
+
+def _term_id_for_key(key):
+    # Keys of term-scoped alerts start with the SIS term id; the default date keys belong to no term.
+    match = re.match(r'^(\d{4})_', key)
+    return match and match[1]
+
+
+def _academic_standing_alert(action_date, sid, status, term_id):
+    key = f'{term_id}_{action_date}_academic_standing_{status}'
+    status_description = ACADEMIC_STANDING_DESCRIPTIONS.get(status, status)
+    message = f"Student's academic standing is '{status_description}'."
+    datetime.strptime(action_date, '%Y-%m-%d')
+    return _alert(
+        alert_type='academic_standing',
+        created_at=action_date,
+        force_use_existing=True,
+        key=key,
+        message=message,
+        preserve_creation_date=True,
+        sid=sid,
+    )
+
+
+def _alerts_for_enrollment(sid, term_id, enrollment, no_activity_alerts_enabled, infrequent_activity_alerts_enabled):
+    for section in enrollment['sections']:
+        if section_is_eligible_for_alerts(enrollment=enrollment, section=section):
+            # If the grade is in, what's done is done.
+            if section.get('grade'):
+                continue
+            if section.get('midtermGrade'):
+                yield _midterm_grade_alert(sid, term_id, section['ccn'], enrollment['displayName'], section['midtermGrade'])
+            last_activity = None
+            activity_percentile = None
+            for canvas_site in enrollment.get('canvasSites', []):
+                student_activity = canvas_site.get('analytics', {}).get('lastActivity', {}).get('student')
+                if not student_activity or student_activity.get('roundedUpPercentile') is None:
+                    continue
+                raw_epoch = student_activity.get('raw')
+                if last_activity is None or raw_epoch > last_activity:
+                    last_activity = raw_epoch
+                    activity_percentile = student_activity.get('roundedUpPercentile')
+            if last_activity is None:
+                continue
+            if (
+                no_activity_alerts_enabled
+                    and last_activity == 0
+                    and activity_percentile <= app.config['ALERT_NO_ACTIVITY_PERCENTILE_CUTOFF']
+            ):
+                yield _no_activity_alert(sid, term_id, enrollment['displayName'])
+            elif (
+                infrequent_activity_alerts_enabled
+                and last_activity > 0
+            ):
+                localized_last_activity = unix_timestamp_to_localtime(last_activity).date()
+                localized_today = unix_timestamp_to_localtime(time.time()).date()
+                days_since = (localized_today - localized_last_activity).days
+                if (
+                        days_since >= app.config['ALERT_INFREQUENT_ACTIVITY_DAYS']
+                        and activity_percentile <= app.config['ALERT_INFREQUENT_ACTIVITY_PERCENTILE_CUTOFF']
+                ):
+                    yield _infrequent_activity_alert(sid, term_id, enrollment['displayName'], days_since)
+
+
+def _infrequent_activity_alert(sid, term_id, class_name, days_since):
+    key = f'{term_id}_{class_name}'
+    message = f'Infrequent activity! Last {class_name} bCourses activity was {days_since} days ago.'
+    return _alert(sid=sid, alert_type='infrequent_activity', key=key, message=message)
+
+
+def _midterm_grade_alert(sid, term_id, section_id, class_name, grade):
+    key = f'{term_id}_{section_id}'
+    message = f'{class_name} midpoint deficient grade of {grade}.'
+    return _alert(sid=sid, alert_type='midterm', key=key, message=message, preserve_creation_date=True)
+
+
+def _no_activity_alert(sid, term_id, class_name):
+    key = f'{term_id}_{class_name}'
+    message = f'No activity! Student has never visited the {class_name} bCourses site for {term_name_for_sis_id(term_id)}.'
+    return _alert(sid=sid, alert_type='no_activity', key=key, message=message)
+
+
+def _withdrawal_cancel_alert(sid, term_id):
+    key = f'{term_id}_withdrawal'
+    message = f'Student is no longer enrolled in the {term_name_for_sis_id(term_id)} term.'
+    return _alert(sid=sid, alert_type='withdrawal', key=key, message=message, preserve_creation_date=True)
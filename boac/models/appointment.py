@@ -28,13 +28,13 @@ import re
 
 from boac import db, std_commit
 from boac.externals import data_loch
-from boac.lib.background import bg_execute
 from boac.lib.berkeley import BERKELEY_DEPT_CODE_TO_NAME
 from boac.lib.util import (
     camelize, localize_datetime, localized_timestamp_to_utc,
     search_result_text_snippet, TEXT_SEARCH_PATTERN, titleize, utc_now, vacuum_whitespace,
 )
 from boac.merged import calnet
+from boac.models.advisor_author_index import AdvisorAuthorIndex
 from boac.models.appointment_event import appointment_event_type, AppointmentEvent
 from boac.models.appointment_read import AppointmentRead
 from boac.models.appointment_topic import AppointmentTopic
@@ -212,7 +212,10 @@ class Appointment(Base):
             user_id=created_by,
             event_type=status,
         )
-        cls.refresh_search_index()
+        cls._index_for_search([appointment.id])
+        if advisor_attrs:
+            AdvisorAuthorIndex.add(advisor_attrs['name'], advisor_attrs['uid'])
+        std_commit()
         return appointment
 
     @classmethod
@@ -233,6 +236,10 @@ class Appointment(Base):
                 advisor_id=advisor_attrs['id'],
                 event_type='checked_in',
             )
+            cls._index_for_search([appointment.id])
+            AdvisorAuthorIndex.add(advisor_attrs['name'], advisor_attrs['uid'])
+            std_commit()
+            AdvisorAuthorIndex.schedule_rebuild()
             return appointment
         else:
             return None
@@ -255,9 +262,10 @@ class Appointment(Base):
                 cancel_reason=cancel_reason,
                 cancel_reason_explained=cancel_reason_explained,
             )
+            cls._index_for_search([appointment.id])
             std_commit()
             db.session.refresh(appointment)
-            cls.refresh_search_index()
+            AdvisorAuthorIndex.schedule_rebuild()
             return appointment
         else:
             return None
@@ -279,8 +287,11 @@ class Appointment(Base):
                 advisor_id=advisor_attrs['id'],
                 event_type=event_type,
             )
+            cls._index_for_search([appointment.id])
+            AdvisorAuthorIndex.add(advisor_attrs['name'], advisor_attrs['uid'])
             std_commit()
             db.session.refresh(appointment)
+            AdvisorAuthorIndex.schedule_rebuild()
             return appointment
         else:
             return None
@@ -298,8 +309,10 @@ class Appointment(Base):
             user_id=updated_by,
             event_type=event_type,
         )
+        self._index_for_search([self.id])
         std_commit()
         db.session.refresh(self)
+        AdvisorAuthorIndex.schedule_rebuild()
 
     @classmethod
     def unreserve_all_for_advisor(cls, advisor_uid, updated_by):
@@ -317,7 +330,10 @@ class Appointment(Base):
                 user_id=updated_by,
                 event_type=event_type,
             )
+        cls._index_for_search([a.id for a in appointments])
         std_commit()
+        if appointments:
+            AdvisorAuthorIndex.schedule_rebuild()
 
     @classmethod
     def search(
@@ -401,17 +417,41 @@ class Appointment(Base):
         self.student_contact_info = student_contact_info
         self.student_contact_type = student_contact_type
         _update_appointment_topics(self, topics, updated_by)
+        self._index_for_search([self.id])
         std_commit()
         db.session.refresh(self)
-        self.refresh_search_index()
 
     @classmethod
-    def refresh_search_index(cls):
-        def _refresh_search_index(db_session):
-            db_session.execute(text('REFRESH MATERIALIZED VIEW appointments_fts_index'))
-            db_session.execute(text('REFRESH MATERIALIZED VIEW advisor_author_index'))
-            std_commit(session=db_session)
-        bg_execute(_refresh_search_index)
+    def _index_for_search(cls, appointment_ids):
+        """Add, update or remove rows of appointments_fts_index according to the current state of the given appointments.
+
+        Searchable text comes from the appointment details and the cancel reason, if any, of its latest event.
+        """
+        if not appointment_ids:
+            return
+        # Pending ORM changes must reach the database before the raw SQL below reads them.
+        db.session.flush()
+        query = text("""
+            WITH deleted AS (
+                DELETE FROM appointments_fts_index
+                WHERE id = ANY(:ids)
+                    AND id NOT IN (SELECT id FROM appointments WHERE id = ANY(:ids) AND details IS NOT NULL AND deleted_at IS NULL)
+            )
+            INSERT INTO appointments_fts_index (id, fts_index)
+            SELECT
+                a.id,
+                to_tsvector('english', trim(concat(a.details, ' ', e.cancel_reason, ' ', e.cancel_reason_explained)))
+            FROM appointments a
+            JOIN LATERAL (
+                SELECT cancel_reason, cancel_reason_explained FROM appointment_events
+                WHERE appointment_id = a.id
+                ORDER BY id DESC
+                LIMIT 1
+            ) e ON TRUE
+            WHERE a.id = ANY(:ids) AND a.details IS NOT NULL AND a.deleted_at IS NULL
+            ON CONFLICT (id) DO UPDATE SET fts_index = EXCLUDED.fts_index
+        """)
+        db.session.execute(query, {'ids': [int(appointment_id) for appointment_id in appointment_ids]})
 
     @classmethod
     def delete(cls, appointment_id):
@@ -421,8 +461,8 @@ class Appointment(Base):
             appointment.deleted_at = now
             for topic in appointment.topics:
                 topic.deleted_at = now
+            cls._index_for_search([appointment.id])
             std_commit()
-            cls.refresh_search_index()
 
     def status_change_available(self):
         return self.status in ['reserved', 'waiting']
@@ -23,6 +23,7 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from datetime import datetime
 import json
 
 from boac import db, std_commit
@@ -213,25 +214,86 @@ class CohortFilter(Base):
             SET alert_count = updated_cohort_counts.alert_count
             FROM
             (
-                SELECT cohort_filters.id AS cohort_filter_id, count(*) AS alert_count
-                FROM alerts
+                SELECT cohort_filters.id AS cohort_filter_id, sum(c.alert_count - COALESCE(d.dismissed_count, 0)) AS alert_count
+                FROM alert_counts c
                 JOIN cohort_filters
-                    ON alerts.sid = ANY(cohort_filters.sids)
-                    AND alerts.key LIKE :key
-                    AND alerts.deleted_at IS NULL
+                    ON c.sid = ANY(cohort_filters.sids)
+                    AND c.term_id = :term_id
                     AND cohort_filters.owner_id = :owner_id
-                LEFT JOIN alert_views
-                    ON alert_views.alert_id = alerts.id
-                    AND alert_views.viewer_id = :owner_id
-                WHERE alert_views.dismissed_at IS NULL
+                LEFT JOIN alert_dismissal_counts d
+                    ON d.viewer_id = :owner_id
+                    AND d.term_id = c.term_id
+                    AND d.sid = c.sid
                 GROUP BY cohort_filters.id
             ) updated_cohort_counts
             WHERE cohort_filters.id = updated_cohort_counts.cohort_filter_id
         """)
-        result = db.session.execute(query, {'owner_id': owner_id, 'key': current_term_id() + '_%'})
+        result = db.session.execute(query, {'owner_id': owner_id, 'term_id': current_term_id()})
         std_commit()
         return result
 
+    @classmethod
+    def refresh_all_sids_and_counts(cls):
+        """Recompute sids, student_count and alert_count of every cohort, with one students query per distinct criteria.
+
+        Unlike a clear-and-reload through to_api_json, cohorts sharing the same domain and filter_criteria are evaluated
+        together, and their sids and membership events are written in a single statement.
+        """
+        benchmark = get_benchmarker('CohortFilter refresh_all_sids_and_counts')
+        benchmark('begin')
+        cohorts_by_criteria = {}
+        for cohort in cls.query.all():
+            cohorts_by_criteria.setdefault(cohort._criteria_key(), []).append(cohort)
+        now = datetime.now()
+        for cohorts in cohorts_by_criteria.values():
+            cohort = cohorts[0]
+            criteria = cohort.to_base_json()['criteria']
+            if cohort.domain == 'admitted_students':
+                results = _query_admitted_students(
+                    benchmark=benchmark,
+                    criteria=criteria,
+                    limit=50,
+                    offset=0,
+                    order_by=None,
+                    sids_only=True,
+                )
+            else:
+                results = _query_students(
+                    benchmark=benchmark,
+                    criteria=criteria,
+                    cursor=None,
+                    include_profiles=False,
+                    include_sids=True,
+                    limit=50,
+                    offset=0,
+                    order_by=None,
+                    owner=cohort.owner,
+                    sids_only=True,
+                    term_id=None,
+                )
+            _bulk_update_sids_and_student_count(
+                cohort_ids=[c.id for c in cohorts],
+                now=now,
+                sids=results['sids'] if results else [],
+                student_count=results['totalStudentCount'] if results else 0,
+                track_membership_changes=cohort.domain == 'default',
+            )
+        all_cohort_ids = [c.id for cohorts in cohorts_by_criteria.values() for c in cohorts]
+        _bulk_update_alert_counts(all_cohort_ids)
+        std_commit()
+        # Bulk statements bypass the ORM; make sure cohorts already in the session are reloaded.
+        for cohorts in cohorts_by_criteria.values():
+            for cohort in cohorts:
+                db.session.expire(cohort)
+        benchmark(f'end: {len(all_cohort_ids)} cohorts, {len(cohorts_by_criteria)} distinct criteria')
+
+    def _criteria_key(self):
+        c = self.filter_criteria
+        c = c if isinstance(c, dict) else json.loads(c)
+        # The "My Students" filter translates to the owner's own advisees.
+        owner_id = self.owner_id if c.get('cohortOwnerAcademicPlans') else None
+        return self.domain, json.dumps(c, sort_keys=True), owner_id
+
     @classmethod
     def find_by_id(cls, cohort_id, **kwargs):
         cohort = cls.query.filter_by(id=cohort_id).first()
@@ -278,6 +340,7 @@ class CohortFilter(Base):
 
     def to_api_json(
         self,
+        cursor=None,
         order_by=None,
         offset=0,
         limit=50,
@@ -301,6 +364,8 @@ class CohortFilter(Base):
             return cohort_json
 
         sids_only = not include_students
+        # The full SID list is needed to stash it in the db or to count alerts; a page of students does not need it.
+        include_all_sids = include_sids or self.student_count is None or bool(include_alerts_for_user_id)
 
         if self.domain == 'admitted_students':
             results = _query_admitted_students(
@@ -315,7 +380,9 @@ class CohortFilter(Base):
             results = _query_students(
                 benchmark=benchmark,
                 criteria=cohort_json['criteria'],
+                cursor=cursor,
                 include_profiles=include_profiles,
+                include_sids=include_all_sids,
                 limit=limit,
                 offset=offset,
                 order_by=order_by,
@@ -338,10 +405,12 @@ class CohortFilter(Base):
             if include_sids:
                 cohort_json['sids'] = results['sids']
             cohort_json.update({
-                'totalStudentCount': results['totalStudentCount'],
+                # Pages fetched by cursor skip the count.
+                'totalStudentCount': self.student_count if results['totalStudentCount'] is None else results['totalStudentCount'],
             })
             if include_students:
                 cohort_json.update({
+                    'nextCursor': results.get('nextCursor'),
                     'students': results['students'],
                 })
             if include_alerts_for_user_id and self.domain == 'default':
@@ -365,10 +434,66 @@ class CohortFilter(Base):
         return cohort_json
 
 
+def _bulk_update_alert_counts(cohort_ids):
+    query = text("""
+        UPDATE cohort_filters
+        SET alert_count = (
+            SELECT COALESCE(sum(c.alert_count - COALESCE(d.dismissed_count, 0)), 0)
+            FROM alert_counts c
+            LEFT JOIN alert_dismissal_counts d
+                ON d.viewer_id = cohort_filters.owner_id
+                AND d.term_id = c.term_id
+                AND d.sid = c.sid
+            WHERE c.term_id = :term_id
+                AND c.sid = ANY(cohort_filters.sids)
+        )
+        WHERE id = ANY(:cohort_ids) AND domain = 'default'
+    """)
+    db.session.execute(query, {'cohort_ids': cohort_ids, 'term_id': current_term_id()})
+
+
+def _bulk_update_sids_and_student_count(cohort_ids, now, sids, student_count, track_membership_changes):
+    # All statements of the CTE see the same snapshot, so 'previous' holds the sids from before the UPDATE.
+    query = text("""
+        WITH previous AS (
+            SELECT id, COALESCE(sids, '{}') AS sids
+            FROM cohort_filters
+            WHERE id = ANY(:cohort_ids) AND :track_membership_changes
+        ),
+        added AS (
+            INSERT INTO cohort_filter_events (cohort_filter_id, sid, event_type, created_at)
+            SELECT previous.id, s.sid, CAST('added' AS cohort_filter_event_types), :now
+            FROM previous, unnest(CAST(:sids AS VARCHAR[])) AS s(sid)
+            WHERE NOT (s.sid = ANY(previous.sids))
+        ),
+        removed AS (
+            INSERT INTO cohort_filter_events (cohort_filter_id, sid, event_type, created_at)
+            SELECT previous.id, s.sid, CAST('removed' AS cohort_filter_event_types), :now
+            FROM previous, unnest(previous.sids) AS s(sid)
+            WHERE NOT (s.sid = ANY(CAST(:sids AS VARCHAR[])))
+        )
+        UPDATE cohort_filters
+        SET sids = :sids, student_count = :student_count, alert_count = NULL
+        WHERE id = ANY(:cohort_ids)
+    """)
+    db.session.execute(
+        query,
+        {
+            'cohort_ids': cohort_ids,
+            'now': now,
+            'sids': sids,
+            'student_count': student_count,
+            'track_membership_changes': track_membership_changes,
+        },
+    )
+
+
 def _query_students(
         benchmark,
         criteria,
+        cursor,
         include_profiles,
+        include_sids,
         limit,
         offset,
         order_by,
@@ -404,6 +529,7 @@ def _query_students(
         coe_underrepresented=criteria.get('coeUnderrepresented'),
         colleges=criteria.get('colleges'),
         curated_group_ids=criteria.get('curatedGroupIds'),
+        cursor=cursor,
         degrees=criteria.get('degrees'),
         degree_terms=criteria.get('degreeTerms'),
         entering_terms=criteria.get('enteringTerms'),
@@ -415,6 +541,7 @@ def _query_students(
         group_codes=criteria.get('groupCodes'),
         in_intensive_cohort=criteria.get('inIntensiveCohort'),
         include_profiles=include_profiles,
+        include_sids=include_sids,
         intended_majors=criteria.get('intendedMajors'),
         is_active_asc=None if criteria.get('isInactiveAsc') is None else not criteria.get('isInactiveAsc'),
         is_active_coe=None if criteria.get('isInactiveCoe') is None else not criteria.get('isInactiveCoe'),
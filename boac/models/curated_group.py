@@ -172,7 +172,7 @@ class CuratedGroup(Base):
                 cohort_filter_ids.append(row['id'])
         return cohort_filter_ids
 
-    def to_api_json(self, include_students, order_by='last_name', offset=0, limit=50):
+    def to_api_json(self, include_students, order_by='last_name', offset=0, limit=50, cursor=None):
         benchmark = get_benchmarker(f'CuratedGroup {self.id} to_api_json')
         benchmark('begin')
         sids = CuratedGroupStudent.get_sids(curated_group_id=self.id)
@@ -197,11 +197,14 @@ class CuratedGroup(Base):
                     result = query_students(
                         sids=sids,
                         academic_career_status=('all'),
+                        cursor=cursor,
                         include_profiles=False,
+                        include_sids=False,
                         order_by=order_by,
                         offset=offset,
                         limit=limit,
                     )
+                    feed['nextCursor'] = result['nextCursor']
                     feed['students'] = result['students']
             else:
                 feed['students'] = []
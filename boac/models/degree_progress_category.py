@@ -168,7 +168,7 @@ class DegreeProgressCategory(Base):
     def get_categories(cls, template_id):
         hierarchy = []
         categories = []
-        for category in cls.query.filter_by(template_id=template_id).order_by(asc(cls.created_at)).all():
+        for category in cls.query.filter_by(template_id=template_id).order_by(asc(cls.created_at), asc(cls.id)).all():
             category_type = category.category_type
             api_json = category.to_api_json()
             if category_type == 'Category':
@@ -23,6 +23,8 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import json
+
 from boac import db, std_commit
 from boac.externals import data_loch
 from boac.lib.util import utc_now
@@ -102,6 +104,118 @@ class DegreeProgressTemplate(Base):
         std_commit()
         return degree
 
+    @classmethod
+    def create_batch_clones(cls, template_id, advisor_dept_codes, created_by, sids):
+        """Copy the template, its unit requirements and its category tree once per SID, in a handful of statements.
+
+        Copied fields match those copied by a one-off clone. Return the ids of the new degree checks, keyed by SID.
+        """
+        # A student gets one degree check, however often the SID is listed. Order is preserved.
+        sids = list(dict.fromkeys(sids))
+        now = utc_now().strftime('%Y-%m-%dT%H:%M:%S+00')
+        template = cls.query.filter_by(id=template_id).first()
+        unit_requirements = db.session.execute(
+            text('SELECT id, min_units::text AS min_units, name FROM degree_progress_unit_requirements WHERE template_id = :template_id ORDER BY id'),
+            {'template_id': template_id},
+        ).all()
+        categories = db.session.execute(
+            text("""
+                SELECT id, category_type, course_units::text AS course_units, description, name, parent_category_id, position
+                FROM degree_progress_categories
+                WHERE template_id = :template_id
+                ORDER BY created_at, id"""),
+            {'template_id': template_id},
+        ).all()
+        category_unit_requirements = db.session.execute(
+            text("""
+                SELECT m.category_id, m.unit_requirement_id
+                FROM degree_progress_category_unit_requirements m
+                JOIN degree_progress_categories c ON c.id = m.category_id AND c.template_id = :template_id"""),
+            {'template_id': template_id},
+        ).all()
+        ids_by_sid = {}
+        count_per_chunk = 1000
+        for chunk in range(0, len(sids), count_per_chunk):
+            sids_subset = sids[chunk:chunk + count_per_chunk]
+            query = """
+                INSERT INTO degree_progress_templates (advisor_dept_codes, created_by, degree_name, parent_template_id, student_sid,
+                                                       updated_by, created_at, updated_at)
+                SELECT advisor_dept_codes, created_by, degree_name, parent_template_id, student_sid, updated_by, created_at, updated_at
+                FROM json_populate_recordset(null::degree_progress_templates, :json_dumps)
+                RETURNING id, student_sid;
+            """
+            data = [
+                {
+                    # The syntax of the following is what Postgres expects in json_populate_recordset(...)
+                    'advisor_dept_codes': '{' + ','.join(advisor_dept_codes) + '}',
+                    'created_by': created_by,
+                    'degree_name': template.degree_name,
+                    'parent_template_id': template_id,
+                    'student_sid': sid,
+                    'updated_by': created_by,
+                    'created_at': now,
+                    'updated_at': now,
+                } for sid in sids_subset
+            ]
+            clone_ids_by_sid = {row['student_sid']: row['id'] for row in db.session.execute(query, {'json_dumps': json.dumps(data)})}
+            clone_ids = list(clone_ids_by_sid.values())
+
+            # Ids are drawn up front so that parent and unit requirement references can be mapped before insert.
+            unit_requirement_ids = _next_ids('degree_progress_unit_requirements_id_seq', len(clone_ids) * len(unit_requirements))
+            unit_requirement_data = []
+            unit_requirement_id_map = {}
+            for clone_id in clone_ids:
+                for unit_requirement in unit_requirements:
+                    new_id = next(unit_requirement_ids)
+                    unit_requirement_id_map[(clone_id, unit_requirement['id'])] = new_id
+                    unit_requirement_data.append({
+                        'id': new_id,
+                        'created_by': created_by,
+                        'min_units': unit_requirement['min_units'],
+                        'name': unit_requirement['name'],
+                        'template_id': clone_id,
+                        'updated_by': created_by,
+                        'created_at': now,
+                        'updated_at': now,
+                    })
+            _insert_records('degree_progress_unit_requirements', unit_requirement_data)
+
+            category_ids = _next_ids('degree_progress_categories_id_seq', len(clone_ids) * len(categories))
+            category_data = []
+            category_id_map = {}
+            for clone_id in clone_ids:
+                for category in categories:
+                    category_id_map[(clone_id, category['id'])] = next(category_ids)
+                for category in categories:
+                    parent_category_id = category['parent_category_id']
+                    category_data.append({
+                        'id': category_id_map[(clone_id, category['id'])],
+                        'category_type': category['category_type'],
+                        'course_units': category['course_units'],
+                        'description': category['description'],
+                        'is_recommended': False,
+                        'name': category['name'],
+                        'parent_category_id': parent_category_id and category_id_map[(clone_id, parent_category_id)],
+                        'position': category['position'],
+                        'template_id': clone_id,
+                        'created_at': now,
+                        'updated_at': now,
+                    })
+            _insert_records('degree_progress_categories', category_data)
+
+            _insert_records(
+                'degree_progress_category_unit_requirements',
+                [
+                    {
+                        'category_id': category_id_map[(clone_id, mapping['category_id'])],
+                        'unit_requirement_id': unit_requirement_id_map[(clone_id, mapping['unit_requirement_id'])],
+                    } for clone_id in clone_ids for mapping in category_unit_requirements
+                ],
+            )
+            ids_by_sid.update(clone_ids_by_sid)
+        std_commit()
+        return ids_by_sid
+
     @classmethod
     def delete(cls, template_id):
         template = cls.query.filter_by(id=template_id).first()
@@ -323,3 +437,17 @@ def _row_to_simple_json(row):
         'updatedAt': _isoformat(row['updated_at']),
         'updatedBy': row['updated_by'],
     }
+
+
+def _insert_records(table_name, records):
+    if records:
+        query = f"""
+            INSERT INTO {table_name}
+            SELECT * FROM json_populate_recordset(null::{table_name}, :json_dumps);
+        """
+        db.session.execute(query, {'json_dumps': json.dumps(records)})
+
+
+def _next_ids(sequence_name, count):
+    sql = text(f"SELECT nextval('{sequence_name}') AS id FROM generate_series(1, :count)")
+    return iter([row['id'] for row in db.session.execute(sql, {'count': count})])
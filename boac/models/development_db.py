@@ -37,6 +37,7 @@ from boac.models.authorized_user_extension import DropInAdvisor
 from boac.models.cohort_filter import CohortFilter
 from boac.models.curated_group import CuratedGroup
 from boac.models.json_cache import insert_row as insert_in_json_cache
+from boac.models.note_search_index import NoteSearchIndex
 from boac.models.topic import Topic
 from boac.models.university_dept import UniversityDept
 from boac.models.university_dept_member import UniversityDeptMember
@@ -402,6 +403,7 @@ def load(load_test_data=False):
         _create_appointments()
         _create_curated_groups()
         _create_cohorts()
+        _index_loch_notes()
     return db
 
 
@@ -758,6 +760,11 @@ def _create_cohorts():
     std_commit(allow_test_environment=True)
 
 
+def _index_loch_notes():
+    NoteSearchIndex.sync_loch_notes()
+    std_commit(allow_test_environment=True)
+
+
 if __name__ == '__main__':
     import boac.factory
     boac.factory.create_app()
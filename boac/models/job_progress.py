@@ -92,6 +92,26 @@ class JobProgress:
         update_jsonb_row(row)
         return progress
 
+    def checkpoint(self, checkpoint_key, duration):
+        """Record a completed step so that a continued job can skip it."""
+        progress = self.get() or {}
+        checkpoints = progress.get('checkpoints', [])
+        if checkpoint_key not in checkpoints:
+            checkpoints.append(checkpoint_key)
+        step_durations = progress.get('step_durations', {})
+        step_durations[checkpoint_key] = round(duration, 3)
+        return self.update(
+            f'{checkpoint_key} completed in {duration:.1f} seconds',
+            properties={
+                'checkpoints': checkpoints,
+                'step_durations': step_durations,
+            },
+        )
+
+    def checkpoints(self):
+        progress = self.get()
+        return set(progress.get('checkpoints', [])) if progress else set()
+
     def end(self):
         row = JsonCache.query.filter_by(key=self.key()).first()
         if row and row.json.get('start'):
@@ -24,14 +24,21 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 
+from collections import OrderedDict
+import json
+import re
+import select
 import threading
+import time
 
 from boac import db, std_commit
 from boac.lib.berkeley import term_name_for_sis_id
-from boac.lib.util import get_args_dict
+from boac.lib.util import get_args_dict, utc_now
 from boac.models.base import Base
 from decorator import decorator
 from flask import current_app as app
+import psycopg2
+from sqlalchemy import func, or_
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm.attributes import flag_modified
@@ -39,12 +46,19 @@ from sqlalchemy.sql import text
 
 cache_thread = threading.local()
 
+# Postgres channel on which json_cache deletions are broadcast to the in-memory tier of every worker.
+INVALIDATION_CHANNEL = 'json_cache_invalidation'
+
+# Callbacks by which other per-worker caches follow memory tier evictions. See on_invalidation.
+invalidation_callbacks = []
+
 
 class JsonCache(Base):
     __tablename__ = 'json_cache'
     id = db.Column(db.Integer, nullable=False, primary_key=True)  # noqa: A003
     key = db.Column(db.String, nullable=False, unique=True)
     json = db.Column(JSONB)
+    expires_at = db.Column(db.DateTime(timezone=True))
 
     def __init__(self, key, json=None):
         self.key = key
@@ -54,16 +68,198 @@ class JsonCache(Base):
         return f'<JsonCache {self.key}, json={self.json}>'
 
 
+class MemoryTier:
+    """Per-worker LRU cache, bounded by entry count and TTL, which sits in front of the json_cache table.
+
+    Values are held as serialized JSON so that callers who mutate a returned feed cannot corrupt the cached copy.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, json.loads(entry[1])
+            if entry:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, ttl=None):
+        self.put_serialized(key, json.dumps(value), ttl=ttl)
+
+    def put_serialized(self, key, serialized, ttl=None):
+        # An entry never outlives its json_cache row.
+        lifetime = self.ttl if ttl is None else min(self.ttl, ttl)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + lifetime, serialized)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def evict(self, key_like):
+        pattern = _like_to_regex(key_like)
+        with self.lock:
+            for key in [k for k in self.entries if pattern.match(k)]:
+                del self.entries[key]
+
+    def evict_keys(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def flush(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+memory_tier = None
+
+
+def get_memory_tier():
+    """Return the in-memory tier, or None if disabled by a non-positive JSON_CACHE_MEMORY_TTL."""
+    global memory_tier
+    ttl = app.config['JSON_CACHE_MEMORY_TTL']
+    if not ttl or ttl <= 0:
+        return None
+    if memory_tier is None:
+        memory_tier = MemoryTier(max_entries=app.config['JSON_CACHE_MEMORY_MAX_ENTRIES'], ttl=ttl)
+    return memory_tier
+
+
+def memory_tier_stats():
+    tier = get_memory_tier()
+    return tier.stats() if tier else None
+
+
+def on_invalidation(callback):
+    """Register callback(is_invalidated) to be called whenever the memory tier evicts, here or on another worker.
+
+    The callback receives a predicate that is true for every evicted key, and should drop whatever it derived from them.
+    """
+    invalidation_callbacks.append(callback)
+
+
+def _notify_invalidation(is_invalidated):
+    for callback in invalidation_callbacks:
+        callback(is_invalidated)
+
+
+def start_invalidation_listener(app):
+    """LISTEN for json_cache deletions by other workers and evict matching keys from this worker's memory tier."""
+    with app.app_context():
+        if get_memory_tier() is None:
+            return
+    thread = threading.Thread(target=_listen_for_invalidations, daemon=True, kwargs={'app': app})
+    thread.start()
+
+
+def _listen_for_invalidations(app):
+    while True:
+        connection = None
+        try:
+            connection = psycopg2.connect(app.config['SQLALCHEMY_DATABASE_URI'])
+            connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            connection.cursor().execute(f'LISTEN {INVALIDATION_CHANNEL}')
+            # Anything cleared while we were not listening may be stale.
+            _flush_all()
+            app.logger.info(f'Listening for json_cache invalidations on channel {INVALIDATION_CHANNEL}')
+            while True:
+                if select.select([connection], [], [], 60) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    key_like = connection.notifies.pop(0).payload
+                    memory_tier.evict(key_like)
+                    _notify_invalidation(_like_to_regex(key_like).match)
+        except psycopg2.Error as e:
+            app.logger.error(f'json_cache invalidation listener failed: {e}')
+            _flush_all()
+            time.sleep(5)
+        finally:
+            if connection:
+                connection.close()
+
+
+def _flush_all():
+    memory_tier.flush()
+    _notify_invalidation(lambda key: True)
+
+
+def _like_to_regex(key_like):
+    return re.compile('^' + ''.join('.' if c == '_' else '.*' if c == '%' else re.escape(c) for c in key_like) + '$', re.DOTALL)
+
+
+def _broadcast_invalidation(key_like):
+    tier = get_memory_tier()
+    if tier:
+        tier.evict(key_like)
+        _notify_invalidation(_like_to_regex(key_like).match)
+        # NOTIFY is transactional: other workers evict once the deletion is committed.
+        db.session.execute(text('SELECT pg_notify(:channel, :key_like)'), {'channel': INVALIDATION_CHANNEL, 'key_like': key_like})
+
+
+def _broadcast_invalidations(keys):
+    tier = get_memory_tier()
+    if tier:
+        tier.evict_keys(keys)
+        evicted = set(keys)
+        _notify_invalidation(lambda key: key in evicted)
+        db.session.execute(
+            text('SELECT pg_notify(:channel, key) FROM unnest(CAST(:keys AS VARCHAR[])) AS key'),
+            {'channel': INVALIDATION_CHANNEL, 'keys': keys},
+        )
+
+
 def clear(key_like):
     matches = db.session.query(JsonCache).filter(JsonCache.key.like(key_like))
     app.logger.info(f'Will delete {matches.count()} entries matching {key_like}')
     matches.delete(synchronize_session=False)
+    _broadcast_invalidation(key_like)
+
 
+def expire(key_like, keep_negative=False):
+    """Mark entries matching key_like as expired, so that the next lookup regenerates them.
 
-def stow(key_pattern, for_term=False):
+    With keep_negative, negative entries (those stowed for a None result) run out their own TTLs instead.
+    """
+    negative_filter = "AND json IS NOT NULL AND json != 'null'::jsonb" if keep_negative else ''
+    result = db.session.execute(
+        text(f"""
+            UPDATE json_cache SET expires_at = now()
+            WHERE key LIKE :key_like
+                AND (expires_at IS NULL OR expires_at > now())
+                {negative_filter}
+        """),
+        {'key_like': key_like},
+    )
+    app.logger.info(f'Expired {result.rowcount} entries matching {key_like}')
+    _broadcast_invalidation(key_like)
+
+
+def stow(key_pattern, for_term=False, ttl_config=None, negative_ttl_config=None):
     """Use Decorator module to preserve the wrapped function's signature, allowing easy wrapping by other decorators.
 
     If the for_term option is enabled, the wrapped function is expected to take a term_id argument.
+    Entries live until cleared or expired, or for as many seconds as the app config value named by ttl_config. A None
+    result is not stowed unless negative_ttl_config names the config value for how long such misses are remembered.
     TODO Mockingbird does not currently preserve signatures, and so JsonCache cannot directly wrap a @fixture.
     """
     @decorator
@@ -73,17 +269,28 @@ def stow(key_pattern, for_term=False):
         if for_term:
             term_name = term_name_for_sis_id(args_dict.get('term_id'))
             key = f'term_{term_name}-{key}'
-        stowed = JsonCache.query.filter_by(key=key).first()
+        tier = get_memory_tier()
+        if tier:
+            found, value = tier.get(key)
+            if found:
+                return value
+        stowed = _unexpired(JsonCache.query.filter_by(key=key)).first()
         # Note that the query returns a DB row rather than the value of the JSON column.
         if stowed is not None:
             app.logger.debug(f'Returning stowed JSON for key {key}')
+            if tier:
+                tier.put(key, stowed.json, ttl=_seconds_to_live(stowed))
             return stowed.json
         else:
             app.logger.info(f'{key} not found in runtime DB')
             to_stow = func(*args, **kw)
-            if to_stow is not None:
+            if to_stow is not None or negative_ttl_config:
                 app.logger.debug(f'Will stow JSON for key {key}')
-                insert_row(key=key, json=to_stow)
+                ttl_key = ttl_config if to_stow is not None else negative_ttl_config
+                ttl = app.config[ttl_key] if ttl_key else None
+                insert_rows({key: to_stow}, ttl=ttl)
+                if tier:
+                    tier.put(key, to_stow, ttl=ttl)
             else:
                 app.logger.info(f'{key} not generated and will not be stowed in DB')
             return to_stow
@@ -95,13 +302,13 @@ def fetch(key, term_id=None):
     if term_id:
         term_name = term_name_for_sis_id(term_id)
         key = f'term_{term_name}-{key}'
-    stowed = JsonCache.query.filter_by(key=key).first()
+    stowed = _unexpired(JsonCache.query.filter_by(key=key)).first()
     if stowed is not None:
         return stowed.json
 
 
 def fetch_bulk(keys):
-    stowed_results = JsonCache.query.filter(JsonCache.key.in_(keys))
+    stowed_results = _unexpired(JsonCache.query.filter(JsonCache.key.in_(keys)))
     return {r.key: r.json for r in stowed_results}
 
 
@@ -118,10 +325,45 @@ def insert_row(key, json):
             return stowed.json
 
 
+def insert_rows(json_by_key, update_existing=False, ttl=None):
+    """Insert many cache rows in bulk, either overwriting or keeping any unexpired row of the same key.
+
+    Unlike a failed insert_row, a conflicting key does not abort the batch. Rows expire after ttl seconds, if given.
+    Returns the count of rows written.
+    """
+    rows = [{'key': key, 'json': value} for key, value in json_by_key.items()]
+    count = 0
+    count_per_chunk = 10000
+    for chunk in range(0, len(rows), count_per_chunk):
+        query = text(f"""
+            INSERT INTO json_cache (key, json, expires_at, created_at, updated_at)
+            SELECT key, json, now() + make_interval(secs => :ttl), now(), now()
+            FROM json_to_recordset(:json_dumps) AS v(key VARCHAR, json JSONB)
+            ON CONFLICT (key) DO UPDATE SET json = EXCLUDED.json, expires_at = EXCLUDED.expires_at, updated_at = now()
+            {'' if update_existing else 'WHERE json_cache.expires_at <= now()'}
+        """)
+        result = db.session.execute(query, {'json_dumps': json.dumps(rows[chunk:chunk + count_per_chunk]), 'ttl': ttl})
+        count += result.rowcount
+    if update_existing and rows:
+        _broadcast_invalidations(list(json_by_key.keys()))
+    std_commit()
+    return count
+
+
+def _unexpired(query):
+    return query.filter(or_(JsonCache.expires_at == None, JsonCache.expires_at > func.now()))  # noqa: E711
+
+
+def _seconds_to_live(stowed):
+    if stowed.expires_at is not None:
+        return max((stowed.expires_at - utc_now()).total_seconds(), 0)
+
+
 def update_jsonb_row(stowed):
     """Jump through some hoops to commit changes to a JSONB column."""
     flag_modified(stowed, 'json')
     db.session.merge(stowed)
+    _broadcast_invalidation(stowed.key)
     std_commit()
 
 
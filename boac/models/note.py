@@ -26,16 +26,16 @@ ENHANCEMENTS, OR MODIFICATIONS.
 import json
 
 from boac import db, std_commit
-from boac.lib.background import bg_execute
 from boac.lib.util import get_benchmarker, put_attachment_to_s3, safe_strftime, utc_now
+from boac.models.advisor_author_index import AdvisorAuthorIndex
 from boac.models.authorized_user import AuthorizedUser
 from boac.models.base import Base
 from boac.models.note_attachment import NoteAttachment
+from boac.models.note_search_index import NoteSearchIndex
 from boac.models.note_template_attachment import NoteTemplateAttachment
 from boac.models.note_topic import NoteTopic
 from sqlalchemy import and_
 from sqlalchemy.dialects.postgresql import ARRAY, ENUM
-from sqlalchemy.sql import text
 
 
 note_contact_type_enum = ENUM(
@@ -190,82 +190,12 @@ class Note(Base):
             note_ids=note_ids,
         )
         benchmark('begin refresh search index')
-        cls.refresh_search_index()
+        NoteSearchIndex.index_boa_notes(note_ids)
+        AdvisorAuthorIndex.add(author_name, author_uid)
+        std_commit()
         benchmark('end note creation' if sid_count == 1 else f'end creation of {sid_count} notes')
         return ids_by_sid
 
-    @classmethod
-    def search(
-            cls,
-            search_phrase,
-            author_uid,
-            student_csid,
-            topic,
-            datetime_from,
-            datetime_to,
-            include_private_notes=False,
-    ):
-        if search_phrase:
-            fts_selector = """SELECT id, ts_rank(fts_index, plainto_tsquery('english', :search_phrase)) AS rank
-                FROM notes_fts_index
-                WHERE fts_index @@ plainto_tsquery('english', :search_phrase)"""
-            params = {
-                'search_phrase': search_phrase,
-            }
-        else:
-            fts_selector = 'SELECT id, 0 AS rank FROM notes WHERE deleted_at IS NULL'
-            params = {}
-
-        if author_uid:
-            author_filter = 'AND notes.author_uid = :author_uid'
-            params.update({'author_uid': author_uid})
-        else:
-            author_filter = ''
-
-        if student_csid:
-            student_filter = 'AND notes.sid = :student_csid'
-            params.update({'student_csid': student_csid})
-        else:
-            student_filter = ''
-
-        date_filter = ''
-        if datetime_from:
-            date_filter += ' AND updated_at >= :datetime_from'
-            params.update({'datetime_from': datetime_from})
-        if datetime_to:
-            date_filter += ' AND updated_at < :datetime_to'
-            params.update({'datetime_to': datetime_to})
-        if topic:
-            topic_join = 'JOIN note_topics nt on nt.topic = :topic AND nt.note_id = notes.id'
-            params.update({'topic': topic})
-        else:
-            topic_join = ''
-
-        where_clause = '' if include_private_notes else 'WHERE notes.is_private IS FALSE'
-
-        query = text(f"""
-            SELECT notes.* FROM ({fts_selector}) AS fts
-            JOIN notes
-                ON fts.id = notes.id
-                {author_filter}
-                {student_filter}
-                {date_filter}
-            {topic_join}
-            {where_clause}
-            ORDER BY fts.rank DESC, notes.id
-        """).bindparams(**params)
-        result = db.session.execute(query)
-        keys = result.keys()
-        return [dict(zip(keys, row)) for row in result.fetchall()]
-
-    @classmethod
-    def refresh_search_index(cls):
-        def _refresh_search_index(db_session):
-            db_session.execute(text('REFRESH MATERIALIZED VIEW notes_fts_index'))
-            db_session.execute(text('REFRESH MATERIALIZED VIEW advisor_author_index'))
-            std_commit(session=db_session)
-        bg_execute(_refresh_search_index)
-
     @classmethod
     def update(cls, note_id, subject, body=None, contact_type=None, is_private=False, set_date=None, topics=()):
         note = cls.find_by_id(note_id=note_id)
@@ -276,9 +206,9 @@ class Note(Base):
             note.set_date = set_date
             note.subject = subject
             cls._update_note_topics(note, topics)
+            NoteSearchIndex.index_boa_notes([note.id])
             std_commit()
             db.session.refresh(note)
-            cls.refresh_search_index()
             return note
         else:
             return None
@@ -362,8 +292,8 @@ class Note(Base):
                 attachment.deleted_at = now
             for topic in note.topics:
                 topic.deleted_at = now
+            NoteSearchIndex.index_boa_notes([note.id])
             std_commit()
-            cls.refresh_search_index()
 
     def to_api_json(self):
         attachments = self.attachments_to_api_json()
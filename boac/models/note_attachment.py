@@ -66,6 +66,10 @@ class NoteAttachment(db.Model):
     def find_by_id(cls, attachment_id):
         return cls.query.filter(and_(cls.id == attachment_id, cls.deleted_at == None)).first()  # noqa: E711
 
+    @classmethod
+    def find_by_ids(cls, attachment_ids):
+        return cls.query.filter(and_(cls.id.in_(attachment_ids), cls.deleted_at == None)).all()  # noqa: E711
+
     def get_user_filename(self):
         return get_attachment_filename(self.id, self.path_to_attachment)
 
@@ -0,0 +1,288 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from itertools import islice
+import json
+
+from boac import db
+from boac.externals import data_loch
+from boac.lib.util import join_if_present
+from flask import current_app as app
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.sql import text
+
+
+class NoteSearchIndex(db.Model):
+    """One row per searchable advising note, whether a BOA note ('boa') or a legacy note synced from the loch ('loch')."""
+
+    __tablename__ = 'note_search_index'
+
+    source = db.Column(db.String(10), nullable=False, primary_key=True)
+    note_id = db.Column(db.String(255), nullable=False, primary_key=True)
+    sid = db.Column(db.String(80), nullable=False)
+    author_uid = db.Column(db.String(255))
+    author_sid = db.Column(db.String(80))
+    author_name = db.Column(db.String(255))
+    topics = db.Column(ARRAY(db.String), nullable=False)
+    is_private = db.Column(db.Boolean, nullable=False, default=False)
+    is_student_available = db.Column(db.Boolean, nullable=False, default=True)
+    created_by = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    filter_date = db.Column(db.DateTime)
+    snippet_source = db.Column(db.Text)
+    fts_index = db.Column(TSVECTOR)
+    content_hash = db.Column(db.String(32))
+
+    @classmethod
+    def index_boa_notes(cls, note_ids):
+        """Add, update or remove index rows of the given BOA notes, according to their current state in the notes table."""
+        # Pending ORM changes to the notes must reach the database before the raw SQL below reads them.
+        db.session.flush()
+        count_per_chunk = 10000
+        for chunk in range(0, len(note_ids), count_per_chunk):
+            ids = [int(note_id) for note_id in note_ids[chunk:chunk + count_per_chunk]]
+            query = text("""
+                WITH deleted AS (
+                    DELETE FROM note_search_index
+                    WHERE source = 'boa'
+                        AND note_id = ANY(:note_ids)
+                        AND note_id NOT IN (SELECT id::text FROM notes WHERE id = ANY(:ids) AND deleted_at IS NULL)
+                )
+                INSERT INTO note_search_index (
+                    source, note_id, sid, author_uid, author_name, topics, is_private, is_student_available,
+                    created_at, updated_at, filter_date, snippet_source, fts_index
+                )
+                SELECT
+                    'boa', n.id::text, n.sid, n.author_uid, n.author_name,
+                    ARRAY(SELECT nt.topic FROM note_topics nt WHERE nt.note_id = n.id AND nt.deleted_at IS NULL ORDER BY nt.topic),
+                    n.is_private, TRUE, n.created_at, n.updated_at, n.updated_at,
+                    CASE WHEN n.is_private THEN n.subject ELSE concat_ws(' - ', NULLIF(n.subject, ''), NULLIF(n.body, '')) END,
+                    CASE WHEN (n.body IS NULL OR n.is_private) THEN to_tsvector('english', n.subject)
+                        ELSE to_tsvector('english', n.subject || ' ' || n.body)
+                        END
+                FROM notes n
+                WHERE n.id = ANY(:ids) AND n.deleted_at IS NULL
+                ON CONFLICT (source, note_id) DO UPDATE SET
+                    sid = EXCLUDED.sid,
+                    author_uid = EXCLUDED.author_uid,
+                    author_name = EXCLUDED.author_name,
+                    topics = EXCLUDED.topics,
+                    is_private = EXCLUDED.is_private,
+                    created_at = EXCLUDED.created_at,
+                    updated_at = EXCLUDED.updated_at,
+                    filter_date = EXCLUDED.filter_date,
+                    snippet_source = EXCLUDED.snippet_source,
+                    fts_index = EXCLUDED.fts_index
+            """)
+            db.session.execute(query, {'ids': ids, 'note_ids': [str(note_id) for note_id in ids]})
+
+    @classmethod
+    def sync_loch_notes(cls):
+        """Bring loch rows of the index up to date with legacy advising notes in the loch.
+
+        The loch reports an id and content hash per note. Only notes whose hash differs from that of their index row are
+        fetched in full, and index rows of notes gone from the loch are deleted. Availability of every note's student is
+        rechecked along the way.
+        """
+        count_per_chunk = 10000
+        db.session.execute(text('DROP TABLE IF EXISTS loch_note_hashes'))
+        db.session.execute(text('CREATE TEMPORARY TABLE loch_note_hashes (note_id VARCHAR(255) PRIMARY KEY, content_hash VARCHAR(32))'))
+        hash_count = 0
+        hashes = data_loch.iter_advising_note_search_hashes()
+        while True:
+            batch = [{'note_id': note_id, 'content_hash': content_hash} for note_id, content_hash in islice(hashes, count_per_chunk)]
+            if not batch:
+                break
+            hash_count += len(batch)
+            db.session.execute(
+                text("""
+                    INSERT INTO loch_note_hashes (note_id, content_hash)
+                    SELECT note_id, content_hash FROM json_to_recordset(:json_dumps) AS v(note_id VARCHAR, content_hash VARCHAR)
+                    ON CONFLICT DO NOTHING
+                """),
+                {'json_dumps': json.dumps(batch)},
+            )
+        if not hash_count:
+            # An empty result more likely means a loch mid-rebuild than the disappearance of every legacy note.
+            app.logger.warning('No advising notes found in the loch; search index left unchanged')
+            db.session.execute(text('DROP TABLE loch_note_hashes'))
+            return
+
+        deleted_count = db.session.execute(text("""
+            DELETE FROM note_search_index i
+            WHERE i.source = 'loch' AND NOT EXISTS (SELECT 1 FROM loch_note_hashes h WHERE h.note_id = i.note_id)
+        """)).rowcount
+        upserted_count = 0
+        last_note_id = ''
+        while True:
+            # Paging by note_id guarantees progress even if a note vanishes from the loch between queries.
+            changed_note_ids = [
+                row['note_id'] for row in db.session.execute(
+                    text("""
+                        SELECT h.note_id
+                        FROM loch_note_hashes h
+                        LEFT JOIN note_search_index i ON i.source = 'loch' AND i.note_id = h.note_id
+                        WHERE h.note_id > :last_note_id AND i.content_hash IS DISTINCT FROM h.content_hash
+                        ORDER BY h.note_id
+                        LIMIT :limit
+                    """),
+                    {'last_note_id': last_note_id, 'limit': count_per_chunk},
+                )
+            ]
+            if not changed_note_ids:
+                break
+            last_note_id = changed_note_ids[-1]
+            loch_rows = data_loch.get_advising_note_search_rows(changed_note_ids)
+            if loch_rows is None:
+                raise RuntimeError('Failed to fetch advising notes from the loch')
+            records = {row['id']: _loch_record(row) for row in loch_rows}
+            cls._upsert_loch_records(list(records.values()))
+            upserted_count += len(records)
+        db.session.execute(text('DROP TABLE loch_note_hashes'))
+
+        # Notes of every source may outlive their students' presence in the loch.
+        indexed_sids = [row['sid'] for row in db.session.execute(text('SELECT DISTINCT sid FROM note_search_index'))]
+        student_rows = data_loch.get_basic_student_data(indexed_sids) if indexed_sids else []
+        if student_rows is not None:
+            db.session.execute(
+                text("""
+                    UPDATE note_search_index SET is_student_available = (sid = ANY(:sids))
+                    WHERE is_student_available IS DISTINCT FROM (sid = ANY(:sids))
+                """),
+                {'sids': [row['sid'] for row in student_rows]},
+            )
+        app.logger.info(f'Advising note search index synced with loch: {upserted_count} upserted, {deleted_count} deleted')
+
+    @classmethod
+    def _upsert_loch_records(cls, records):
+        query = text("""
+            INSERT INTO note_search_index (
+                source, note_id, sid, author_uid, author_sid, author_name, topics, is_private, is_student_available,
+                created_by, created_at, updated_at, filter_date, snippet_source, fts_index, content_hash
+            )
+            SELECT
+                'loch', note_id, sid, author_uid, author_sid, author_name, ARRAY(SELECT json_array_elements_text(topics)), FALSE, TRUE,
+                created_by, created_at, updated_at, filter_date, snippet_source, fts_index::tsvector, content_hash
+            FROM json_to_recordset(:json_dumps) AS v(
+                note_id VARCHAR, sid VARCHAR, author_uid VARCHAR, author_sid VARCHAR, author_name VARCHAR, topics JSON,
+                created_by VARCHAR, created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ, filter_date TIMESTAMPTZ,
+                snippet_source TEXT, fts_index TEXT, content_hash VARCHAR
+            )
+            ON CONFLICT (source, note_id) DO UPDATE SET
+                sid = EXCLUDED.sid,
+                author_uid = EXCLUDED.author_uid,
+                author_sid = EXCLUDED.author_sid,
+                author_name = EXCLUDED.author_name,
+                topics = EXCLUDED.topics,
+                is_student_available = TRUE,
+                created_by = EXCLUDED.created_by,
+                created_at = EXCLUDED.created_at,
+                updated_at = EXCLUDED.updated_at,
+                filter_date = EXCLUDED.filter_date,
+                snippet_source = EXCLUDED.snippet_source,
+                fts_index = EXCLUDED.fts_index,
+                content_hash = EXCLUDED.content_hash
+        """)
+        db.session.execute(query, {'json_dumps': json.dumps(records)})
+
+    @classmethod
+    def search(
+            cls,
+            search_phrase,
+            author_uid,
+            author_csid,
+            student_csid,
+            topic,
+            datetime_from,
+            datetime_to,
+            offset,
+            limit,
+    ):
+        """Return one page of matching notes, BOA notes ahead of legacy notes and each ordered by relevance."""
+        params = {'offset': offset, 'limit': limit}
+        if search_phrase:
+            rank = "ts_rank(fts_index, plainto_tsquery('english', :search_phrase))"
+            filters = ["fts_index @@ plainto_tsquery('english', :search_phrase)"]
+            params['search_phrase'] = search_phrase
+        else:
+            rank = '0'
+            filters = []
+        author_filters = []
+        if author_uid:
+            author_filters.append('author_uid = :author_uid')
+            params['author_uid'] = author_uid
+        if author_csid:
+            author_filters.append('author_sid = :author_csid')
+            params['author_csid'] = author_csid
+        if author_filters:
+            filters.append(f"({' OR '.join(author_filters)})")
+        if student_csid:
+            filters.append('sid = :student_csid')
+            params['student_csid'] = student_csid
+        if topic:
+            filters.append(':topic = ANY(topics)')
+            params['topic'] = topic
+        if datetime_from:
+            filters.append('filter_date >= :datetime_from')
+            params['datetime_from'] = datetime_from
+        if datetime_to:
+            filters.append('filter_date < :datetime_to')
+            params['datetime_to'] = datetime_to
+
+        query = text(f"""
+            SELECT source, note_id, sid, author_uid, author_sid, author_name, created_by, created_at, updated_at, snippet_source
+            FROM note_search_index
+            WHERE is_student_available
+                AND is_private IS FALSE
+                {''.join(f' AND {f}' for f in filters)}
+            ORDER BY source = 'loch', {rank} DESC, CASE WHEN source = 'boa' THEN note_id::int END, note_id
+            OFFSET :offset
+            LIMIT :limit
+        """)
+        result = db.session.execute(query, params)
+        keys = result.keys()
+        return [dict(zip(keys, row)) for row in result.fetchall()]
+
+
+def _loch_record(row):
+    # We prefer to filter on updated_at, but that value is not meaningful for UCBCONVERSION notes.
+    filter_date = row['created_at'] if row['created_by'] == 'UCBCONVERSION' else row['updated_at']
+    note_body = (row['note_body'] or '').strip() or join_if_present(', ', [row['note_category'], row['note_subcategory']])
+    return {
+        'note_id': row['id'],
+        'sid': row['sid'],
+        'author_uid': row['advisor_uid'],
+        'author_sid': row['advisor_sid'],
+        'author_name': join_if_present(' ', [row['advisor_first_name'], row['advisor_last_name']]) or None,
+        'topics': [t for t in row['topics'] or [] if t],
+        'created_by': row['created_by'],
+        'created_at': row['created_at'] and row['created_at'].isoformat(),
+        'updated_at': row['updated_at'] and row['updated_at'].isoformat(),
+        'filter_date': filter_date and filter_date.isoformat(),
+        'snippet_source': note_body,
+        'fts_index': row['fts_index'],
+        'content_hash': row['content_hash'],
+    }
@@ -0,0 +1,61 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+
+import time
+
+from scriptpath import scriptify
+from sqlalchemy.sql import text
+
+
+# Run against a development database loaded with test data (see development_db), whose notes and appointments
+# come from the fixtures.
+SEARCH_PHRASES = ['campus', 'confounded student', 'life', '2/1/2019', 'nowhere to be found']
+ROUNDS = 20
+
+
+@scriptify.in_app
+def main(app):
+    from boac import db
+    from boac.lib.util import search_result_text_snippet, TEXT_SEARCH_PATTERN
+
+    bodies = [row['body'] for row in db.session.execute(text("""
+        SELECT snippet_source AS body FROM note_search_index WHERE snippet_source IS NOT NULL
+        UNION ALL
+        SELECT details AS body FROM appointments WHERE details IS NOT NULL
+    """))]
+    print(f'Snippeting {len(bodies)} note and appointment bodies, {ROUNDS} rounds per search phrase.')
+    for search_phrase in SEARCH_PHRASES:
+        search_terms = search_phrase.split()
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for body in bodies:
+                search_result_text_snippet(body, search_terms, TEXT_SEARCH_PATTERN)
+        elapsed = time.perf_counter() - start
+        per_snippet = 1000000 * elapsed / (ROUNDS * len(bodies) or 1)
+        print(f"'{search_phrase}': {elapsed:.3f}s total, {per_snippet:.1f}µs per snippet")
+
+
+main()
@@ -34,6 +34,7 @@ SET row_security = off;
 
 --
 
+ALTER TABLE IF EXISTS ONLY public.alert_dismissal_counts DROP CONSTRAINT IF EXISTS alert_dismissal_counts_viewer_id_fkey;
 ALTER TABLE IF EXISTS ONLY public.alert_views DROP CONSTRAINT IF EXISTS alert_views_alert_id_fkey;
 ALTER TABLE IF EXISTS ONLY public.alert_views DROP CONSTRAINT IF EXISTS alert_views_viewer_id_fkey;
 ALTER TABLE IF EXISTS ONLY public.alerts DROP CONSTRAINT IF EXISTS alerts_sid_fkey;
@@ -119,6 +120,10 @@ DROP INDEX IF EXISTS public.degree_progress_categories_id_idx;
 DROP INDEX IF EXISTS public.degree_progress_unit_requirements_template_id_idx;
 DROP INDEX IF EXISTS public.idx_advisor_author_index;
 DROP INDEX IF EXISTS public.idx_notes_fts_index;
+DROP INDEX IF EXISTS public.note_search_index_author_sid_idx;
+DROP INDEX IF EXISTS public.note_search_index_author_uid_idx;
+DROP INDEX IF EXISTS public.note_search_index_fts_index_idx;
+DROP INDEX IF EXISTS public.note_search_index_sid_idx;
 DROP INDEX IF EXISTS public.note_attachments_note_id_idx;
 DROP INDEX IF EXISTS public.note_template_attachments_note_template_id_idx;
 DROP INDEX IF EXISTS public.note_template_topics_note_template_id_idx;
@@ -137,13 +142,17 @@ DROP INDEX IF EXISTS public.user_logins_uid_idx;
 
 --
 
+ALTER TABLE IF EXISTS ONLY public.advisor_author_index DROP CONSTRAINT IF EXISTS advisor_author_index_pkey;
 ALTER TABLE IF EXISTS ONLY public.alembic_version DROP CONSTRAINT IF EXISTS alembic_version_pkc;
+ALTER TABLE IF EXISTS ONLY public.alert_counts DROP CONSTRAINT IF EXISTS alert_counts_pkey;
+ALTER TABLE IF EXISTS ONLY public.alert_dismissal_counts DROP CONSTRAINT IF EXISTS alert_dismissal_counts_pkey;
 ALTER TABLE IF EXISTS ONLY public.alert_views DROP CONSTRAINT IF EXISTS alert_views_pkey;
 ALTER TABLE IF EXISTS ONLY public.alerts DROP CONSTRAINT IF EXISTS alerts_pkey;
 ALTER TABLE IF EXISTS ONLY public.alerts DROP CONSTRAINT IF EXISTS alerts_sid_alert_type_key_unique_constraint;
 ALTER TABLE IF EXISTS ONLY public.alerts DROP CONSTRAINT IF EXISTS alerts_sid_alert_type_key_created_at_unique_constraint;
 ALTER TABLE IF EXISTS ONLY public.appointment_availability DROP CONSTRAINT IF EXISTS appointment_availability_pkey;
 ALTER TABLE IF EXISTS ONLY public.appointment_topics DROP CONSTRAINT IF EXISTS appointment_topics_pkey;
+ALTER TABLE IF EXISTS ONLY public.appointments_fts_index DROP CONSTRAINT IF EXISTS appointments_fts_index_pkey;
 ALTER TABLE IF EXISTS ONLY public.appointments_read DROP CONSTRAINT IF EXISTS appointments_read_pkey;
 ALTER TABLE IF EXISTS ONLY public.appointments DROP CONSTRAINT IF EXISTS appointments_pkey;
 ALTER TABLE IF EXISTS ONLY public.authorized_users DROP CONSTRAINT IF EXISTS authorized_users_pkey;
@@ -162,6 +171,7 @@ ALTER TABLE IF EXISTS ONLY public.drop_in_advisors DROP CONSTRAINT IF EXISTS dro
 ALTER TABLE IF EXISTS ONLY public.json_cache DROP CONSTRAINT IF EXISTS json_cache_key_key;
 ALTER TABLE IF EXISTS ONLY public.json_cache DROP CONSTRAINT IF EXISTS json_cache_pkey;
 ALTER TABLE IF EXISTS ONLY public.note_attachments DROP CONSTRAINT IF EXISTS note_attachments_pkey;
+ALTER TABLE IF EXISTS ONLY public.note_search_index DROP CONSTRAINT IF EXISTS note_search_index_pkey;
 ALTER TABLE IF EXISTS ONLY public.note_template_attachments DROP CONSTRAINT IF EXISTS note_template_attachments_pkey;
 ALTER TABLE IF EXISTS ONLY public.note_template_topics DROP CONSTRAINT IF EXISTS note_template_topics_pkey;
 ALTER TABLE IF EXISTS ONLY public.note_templates DROP CONSTRAINT IF EXISTS note_templates_pkey;
@@ -185,10 +195,11 @@ ALTER TABLE IF EXISTS public.json_cache ALTER COLUMN id DROP DEFAULT;
 
 --
 
-DROP MATERIALIZED VIEW IF EXISTS public.advisor_author_index;
+DROP TABLE IF EXISTS public.advisor_author_index;
 DROP MATERIALIZED VIEW IF EXISTS public.notes_fts_index;
 DROP TABLE IF EXISTS public.notes;
 DROP TABLE IF EXISTS public.note_attachments;
+DROP TABLE IF EXISTS public.note_search_index;
 DROP SEQUENCE IF EXISTS public.note_attachments_id_seq;
 DROP TABLE IF EXISTS public.note_template_attachments;
 DROP SEQUENCE IF EXISTS public.note_template_attachments_id_seq;
@@ -214,7 +225,7 @@ DROP SEQUENCE IF EXISTS public.cohort_filter_events_id_seq;
 DROP TABLE IF EXISTS public.cohort_filter_owners;
 DROP SEQUENCE IF EXISTS public.authorized_users_id_seq;
 DROP TABLE IF EXISTS public.authorized_users;
-DROP MATERIALIZED VIEW IF EXISTS public.appointments_fts_index;
+DROP TABLE IF EXISTS public.appointments_fts_index;
 DROP TABLE IF EXISTS public.appointment_availability;
 DROP SEQUENCE IF EXISTS public.appointment_availability_id_seq;
 DROP TABLE IF EXISTS public.appointment_events;
@@ -225,6 +236,8 @@ DROP TABLE IF EXISTS public.appointments;
 DROP SEQUENCE IF EXISTS public.appointments_id_seq;
 DROP TABLE IF EXISTS public.appointments_read;
 DROP SEQUENCE IF EXISTS public.alerts_id_seq;
+DROP TABLE IF EXISTS public.alert_counts;
+DROP TABLE IF EXISTS public.alert_dismissal_counts;
 DROP TABLE IF EXISTS public.alerts;
 DROP TABLE IF EXISTS public.alert_views;
 DROP TABLE IF EXISTS public.alembic_version;
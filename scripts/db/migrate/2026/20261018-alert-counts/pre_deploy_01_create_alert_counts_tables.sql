@@ -0,0 +1,35 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS alert_counts (
+    term_id character varying(4) NOT NULL,
+    sid character varying(80) NOT NULL,
+    alert_count integer NOT NULL,
+    PRIMARY KEY (term_id, sid)
+);
+
+CREATE TABLE IF NOT EXISTS alert_dismissal_counts (
+    viewer_id integer NOT NULL REFERENCES authorized_users(id) ON DELETE CASCADE,
+    term_id character varying(4) NOT NULL,
+    sid character varying(80) NOT NULL,
+    dismissed_count integer NOT NULL,
+    PRIMARY KEY (viewer_id, term_id, sid)
+);
+
+-- Populate from existing alerts. Thereafter, the application keeps both tables current.
+
+INSERT INTO alert_counts (term_id, sid, alert_count)
+    SELECT split_part(key, '_', 1), sid, count(*)
+    FROM alerts
+    WHERE key ~ '^\d{4}_' AND deleted_at IS NULL
+    GROUP BY split_part(key, '_', 1), sid
+ON CONFLICT (term_id, sid) DO UPDATE SET alert_count = EXCLUDED.alert_count;
+
+INSERT INTO alert_dismissal_counts (viewer_id, term_id, sid, dismissed_count)
+    SELECT v.viewer_id, split_part(a.key, '_', 1), a.sid, count(*)
+    FROM alerts a
+    JOIN alert_views v ON v.alert_id = a.id
+    WHERE a.key ~ '^\d{4}_' AND a.deleted_at IS NULL AND v.dismissed_at IS NOT NULL
+    GROUP BY v.viewer_id, split_part(a.key, '_', 1), a.sid
+ON CONFLICT (viewer_id, term_id, sid) DO UPDATE SET dismissed_count = EXCLUDED.dismissed_count;
+
+COMMIT;
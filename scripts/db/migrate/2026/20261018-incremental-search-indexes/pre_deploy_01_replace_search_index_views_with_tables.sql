@@ -0,0 +1,42 @@
+BEGIN;
+
+-- Materialized views, fully refreshed after every write, become tables that the application maintains row by row.
+
+DROP MATERIALIZED VIEW IF EXISTS appointments_fts_index;
+
+CREATE TABLE IF NOT EXISTS appointments_fts_index (
+    id integer NOT NULL PRIMARY KEY,
+    fts_index tsvector NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_appointments_fts_index ON appointments_fts_index USING gin(fts_index);
+
+INSERT INTO appointments_fts_index (id, fts_index)
+    SELECT
+        a.id,
+        to_tsvector('english', trim(concat(a.details, ' ', e.cancel_reason, ' ', e.cancel_reason_explained)))
+    FROM (SELECT MAX(id) as id FROM appointment_events GROUP BY appointment_id) as recent_events
+    JOIN appointment_events e ON e.id = recent_events.id
+    JOIN appointments a ON a.id = e.appointment_id
+    WHERE a.details IS NOT NULL AND a.deleted_at IS NULL
+ON CONFLICT (id) DO UPDATE SET fts_index = EXCLUDED.fts_index;
+
+DROP MATERIALIZED VIEW IF EXISTS advisor_author_index;
+
+CREATE TABLE IF NOT EXISTS advisor_author_index (
+    advisor_name character varying(255) NOT NULL,
+    advisor_uid character varying(255) NOT NULL,
+    PRIMARY KEY (advisor_name, advisor_uid)
+);
+
+CREATE INDEX IF NOT EXISTS idx_advisor_author_index ON advisor_author_index USING btree(advisor_name);
+
+INSERT INTO advisor_author_index (advisor_name, advisor_uid)
+    SELECT advisor_name, advisor_uid FROM appointments
+    WHERE advisor_name IS NOT NULL AND advisor_uid IS NOT NULL
+    UNION
+    SELECT author_name, author_uid FROM notes
+    WHERE author_name IS NOT NULL AND author_uid IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,5 @@
+BEGIN;
+
+ALTER TABLE json_cache ADD COLUMN IF NOT EXISTS expires_at timestamp with time zone;
+
+COMMIT;
@@ -0,0 +1,48 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS note_search_index (
+    source character varying(10) NOT NULL,
+    note_id character varying(255) NOT NULL,
+    sid character varying(80) NOT NULL,
+    author_uid character varying(255),
+    author_sid character varying(80),
+    author_name character varying(255),
+    topics character varying[] NOT NULL,
+    is_private boolean DEFAULT false NOT NULL,
+    is_student_available boolean DEFAULT true NOT NULL,
+    created_by character varying(255),
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone,
+    filter_date timestamp with time zone,
+    snippet_source text,
+    fts_index tsvector,
+    content_hash character varying(32),
+    PRIMARY KEY (source, note_id)
+);
+
+CREATE INDEX IF NOT EXISTS note_search_index_author_sid_idx ON note_search_index (author_sid);
+CREATE INDEX IF NOT EXISTS note_search_index_author_uid_idx ON note_search_index (author_uid);
+CREATE INDEX IF NOT EXISTS note_search_index_fts_index_idx ON note_search_index USING gin(fts_index);
+CREATE INDEX IF NOT EXISTS note_search_index_sid_idx ON note_search_index (sid);
+
+-- BOA notes are indexed here. Legacy notes are added by the next refresh job, which syncs the index with the loch.
+
+INSERT INTO note_search_index (
+    source, note_id, sid, author_uid, author_name, topics, is_private, is_student_available,
+    created_at, updated_at, filter_date, snippet_source, fts_index
+)
+SELECT
+    'boa', n.id::text, n.sid, n.author_uid, n.author_name,
+    ARRAY(SELECT nt.topic FROM note_topics nt WHERE nt.note_id = n.id AND nt.deleted_at IS NULL ORDER BY nt.topic),
+    n.is_private, TRUE, n.created_at, n.updated_at, n.updated_at,
+    CASE WHEN n.is_private THEN n.subject ELSE concat_ws(' - ', NULLIF(n.subject, ''), NULLIF(n.body, '')) END,
+    CASE WHEN (n.body IS NULL OR n.is_private) THEN to_tsvector('english', n.subject)
+        ELSE to_tsvector('english', n.subject || ' ' || n.body)
+        END
+FROM notes n
+WHERE n.deleted_at IS NULL
+ON CONFLICT (source, note_id) DO NOTHING;
+
+DROP MATERIALIZED VIEW IF EXISTS notes_fts_index;
+
+COMMIT;
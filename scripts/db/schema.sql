@@ -54,6 +54,29 @@ CREATE INDEX alert_views_viewer_id_idx ON alert_views USING btree (viewer_id);
 
 --
 
+CREATE TABLE alert_counts (
+    term_id character varying(4) NOT NULL,
+    sid character varying(80) NOT NULL,
+    alert_count integer NOT NULL
+);
+ALTER TABLE alert_counts OWNER TO boac;
+ALTER TABLE ONLY alert_counts
+    ADD CONSTRAINT alert_counts_pkey PRIMARY KEY (term_id, sid);
+
+--
+
+CREATE TABLE alert_dismissal_counts (
+    viewer_id integer NOT NULL,
+    term_id character varying(4) NOT NULL,
+    sid character varying(80) NOT NULL,
+    dismissed_count integer NOT NULL
+);
+ALTER TABLE alert_dismissal_counts OWNER TO boac;
+ALTER TABLE ONLY alert_dismissal_counts
+    ADD CONSTRAINT alert_dismissal_counts_pkey PRIMARY KEY (viewer_id, term_id, sid);
+
+--
+
 CREATE TABLE alerts (
     id integer NOT NULL,
     sid character varying(80) NOT NULL,
@@ -220,17 +243,13 @@ CREATE INDEX appointment_events_user_id_idx ON appointment_events (user_id);
 
 --
 
-CREATE MATERIALIZED VIEW appointments_fts_index AS (
-  SELECT
-    a.id,
-    to_tsvector('english', trim(concat(a.details, ' ', e.cancel_reason, ' ', e.cancel_reason_explained))) AS fts_index
-  FROM (SELECT MAX(id) as id FROM appointment_events GROUP BY appointment_id) as recent_events
-  JOIN appointment_events e ON e.id = recent_events.id
-  JOIN appointments a ON a.id = e.appointment_id
-  WHERE
-    a.details IS NOT NULL
-    AND a.deleted_at IS NULL
+CREATE TABLE appointments_fts_index (
+    id integer NOT NULL,
+    fts_index tsvector NOT NULL
 );
+ALTER TABLE appointments_fts_index OWNER TO boac;
+ALTER TABLE ONLY appointments_fts_index
+    ADD CONSTRAINT appointments_fts_index_pkey PRIMARY KEY (id);
 
 CREATE INDEX idx_appointments_fts_index
 ON appointments_fts_index
@@ -612,32 +631,14 @@ CREATE INDEX notes_deleted_at_idx ON notes (deleted_at);
 CREATE INDEX notes_is_private_idx ON notes (is_private);
 CREATE INDEX notes_sid_idx ON notes USING btree (sid);
 
-CREATE MATERIALIZED VIEW notes_fts_index AS (
-  SELECT
-    id,
-    CASE WHEN (body IS NULL OR is_private) THEN to_tsvector('english', subject)
-         ELSE to_tsvector('english', subject || ' ' || body)
-         END AS fts_index
-  FROM notes
-  WHERE deleted_at IS NULL
-);
-
-CREATE INDEX idx_notes_fts_index
-ON notes_fts_index
-USING gin(fts_index);
 
---
-
-CREATE MATERIALIZED VIEW advisor_author_index AS (
-  SELECT DISTINCT aa.* FROM (
-    SELECT a.advisor_name, a.advisor_uid
-    FROM appointments a
-    UNION
-    SELECT n.author_name AS advisor_name, n.author_uid AS advisor_uid
-    FROM notes n
-  ) aa
-  ORDER BY aa.advisor_name
+CREATE TABLE advisor_author_index (
+    advisor_name character varying(255) NOT NULL,
+    advisor_uid character varying(255) NOT NULL
 );
+ALTER TABLE advisor_author_index OWNER TO boac;
+ALTER TABLE ONLY advisor_author_index
+    ADD CONSTRAINT advisor_author_index_pkey PRIMARY KEY (advisor_name, advisor_uid);
 
 CREATE INDEX idx_advisor_author_index ON advisor_author_index USING btree(advisor_name);
 
@@ -669,6 +670,34 @@ CREATE INDEX note_attachments_note_id_idx ON note_attachments USING btree (note_
 
 --
 
+CREATE TABLE note_search_index (
+    source character varying(10) NOT NULL,
+    note_id character varying(255) NOT NULL,
+    sid character varying(80) NOT NULL,
+    author_uid character varying(255),
+    author_sid character varying(80),
+    author_name character varying(255),
+    topics character varying[] NOT NULL,
+    is_private boolean DEFAULT false NOT NULL,
+    is_student_available boolean DEFAULT true NOT NULL,
+    created_by character varying(255),
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone,
+    filter_date timestamp with time zone,
+    snippet_source text,
+    fts_index tsvector,
+    content_hash character varying(32)
+);
+ALTER TABLE note_search_index OWNER TO boac;
+ALTER TABLE ONLY note_search_index
+    ADD CONSTRAINT note_search_index_pkey PRIMARY KEY (source, note_id);
+CREATE INDEX note_search_index_author_sid_idx ON note_search_index (author_sid);
+CREATE INDEX note_search_index_author_uid_idx ON note_search_index (author_uid);
+CREATE INDEX note_search_index_fts_index_idx ON note_search_index USING gin(fts_index);
+CREATE INDEX note_search_index_sid_idx ON note_search_index (sid);
+
+--
+
 CREATE TABLE note_templates (
     id INTEGER NOT NULL,
     body text,
@@ -909,7 +938,8 @@ CREATE TABLE json_cache (
     updated_at timestamp with time zone NOT NULL,
     id integer NOT NULL,
     key character varying NOT NULL,
-    json jsonb
+    json jsonb,
+    expires_at timestamp with time zone
 );
 ALTER TABLE json_cache OWNER TO boac;
 CREATE SEQUENCE json_cache_id_seq
@@ -1077,6 +1107,8 @@ ALTER TABLE ONLY university_dept_members
 
 ALTER TABLE ONLY alert_views
     ADD CONSTRAINT alert_views_alert_id_fkey FOREIGN KEY (alert_id) REFERENCES alerts(id) ON DELETE CASCADE;
+ALTER TABLE ONLY alert_dismissal_counts
+    ADD CONSTRAINT alert_dismissal_counts_viewer_id_fkey FOREIGN KEY (viewer_id) REFERENCES authorized_users(id) ON DELETE CASCADE;
 ALTER TABLE ONLY alert_views
     ADD CONSTRAINT alert_views_viewer_id_fkey FOREIGN KEY (viewer_id) REFERENCES authorized_users(id) ON DELETE CASCADE;
 
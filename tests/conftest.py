@@ -172,6 +172,9 @@ def db_session(db):
     except TypeError:
         pass
     db.session.remove()
+    # The term snapshot is derived from runtime DB content that is about to be rolled back.
+    from boac.merged.sis_terms import reset_term_snapshot
+    reset_term_snapshot()
 
     connection = db.engine.connect()
     options = dict(bind=connection, binds={})
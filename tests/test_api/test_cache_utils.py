@@ -27,10 +27,12 @@ from boac import std_commit
 from boac.models.alert import Alert
 from boac.models.authorized_user import AuthorizedUser
 from boac.models.curated_group import CuratedGroup, CuratedGroupStudent
+from boac.models.job_progress import JobProgress
 from boac.models.university_dept import UniversityDept
 from boac.models.university_dept_member import UniversityDeptMember
 import pytest
 from tests.test_api.api_test_utils import all_cohorts_owned_by
+from tests.util import override_config
 
 
 coe_advisor_uid = '1022796'
@@ -82,6 +84,49 @@ class TestCacheUtils:
             assert cohort['alertCount'] >= 0
 
 
+@pytest.mark.usefixtures('db_session')
+class TestRunRefreshSteps:
+    """Checkpointed refresh job steps."""
+
+    def test_skips_checkpointed_steps(self, app):
+        """A continued job resumes after its last completed step."""
+        from boac.api.cache_utils import RefreshStep, run_refresh_steps
+        JobProgress().start({'term_id': '2178'})
+        JobProgress().checkpoint('2178:first', 1.0)
+        calls = []
+
+        def _record(label):
+            calls.append(label)
+        steps = [
+            RefreshStep('first', 'first step', _record, label='first'),
+            RefreshStep('second', 'second step', _record, depends_on=['first'], label='second'),
+        ]
+        run_refresh_steps('2178', steps)
+        assert calls == ['second']
+        progress = JobProgress().get()
+        assert progress['checkpoints'] == ['2178:first', '2178:second']
+        assert set(progress['step_durations'].keys()) == {'2178:first', '2178:second'}
+
+    def test_concurrent_steps_respect_dependencies(self, app):
+        """Independent steps run on worker threads; dependent steps wait their turn."""
+        from boac.api.cache_utils import RefreshStep, run_refresh_steps
+        JobProgress().start({'term_id': '2178'})
+        calls = []
+
+        def _record(label):
+            calls.append(label)
+        steps = [
+            RefreshStep('first', 'first step', _record, label='first'),
+            RefreshStep('second', 'second step', _record, label='second'),
+            RefreshStep('third', 'third step', _record, depends_on=['first', 'second'], label='third'),
+        ]
+        with override_config(app, 'REFRESH_JOB_MAX_WORKERS', 2):
+            run_refresh_steps('2178', steps)
+        assert set(calls[0:2]) == {'first', 'second'}
+        assert calls[2] == 'third'
+        assert len(JobProgress().checkpoints()) == 3
+
+
 class TestRefreshCalnetAttributes:
 
     def test_removes_and_restores(self, app):
@@ -23,6 +23,9 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import csv
+import io
+
 from boac import std_commit
 from boac.models.authorized_user import AuthorizedUser
 from boac.models.cohort_filter import CohortFilter
@@ -1347,6 +1350,21 @@ class TestDownloadCohortCsv:
         sids_in_csv = [s for s in data.decode('utf-8').split() if s.isdigit()]
         assert sids_in_csv == expected_sids
 
+    def test_download_csv_sorted_by_name(self, app, asc_advisor_login, client):
+        """CSV rows are streamed in batches, ordered by last name and then first name."""
+        cohort = CohortFilter.create(
+            uid=asc_advisor_uid,
+            name='Download Me',
+            filter_criteria={
+                'cohortOwnerAcademicPlans': ['*'],
+            },
+        )
+        with override_config(app, 'DATA_LOCH_FETCH_BATCH_SIZE', 2):
+            data = self._api_download_cohort_csv(client, cohort['id'], csv_columns_selected=['first_name', 'last_name', 'sid'])
+        rows = list(csv.DictReader(io.StringIO(data.decode('utf-8'))))
+        assert [r['last_name'] for r in rows] == ['Barney', 'Davies', 'Doolittle', 'Farestveit', 'Jayaprakash', 'Kerschen']
+        assert rows[0] == {'first_name': 'Nora Stanton', 'last_name': 'Barney', 'sid': '9100000000'}
+
 
 class TestDownloadCsvPerFilters:
 
@@ -33,6 +33,7 @@ from boac.models.degree_progress_category import DegreeProgressCategory
 from boac.models.degree_progress_course import DegreeProgressCourse
 from boac.models.degree_progress_note import DegreeProgressNote
 from boac.models.degree_progress_template import DegreeProgressTemplate
+from boac.models.degree_progress_unit_requirement import DegreeProgressUnitRequirement
 import pytest
 from sqlalchemy import create_engine, text
 
@@ -305,6 +306,93 @@ class TestBatchStudentDegreeChecks:
             assert degree_check
             assert degree_check.student_sid == sid
 
+    def test_create_batch_duplicate_sids(self, client, fake_auth, mock_template):
+        """A SID listed twice gets a single, complete degree check."""
+        user = AuthorizedUser.find_by_uid(coe_advisor_read_write_uid)
+        DegreeProgressUnitRequirement.create(
+            created_by=user.id,
+            min_units=12,
+            name='Lower division units',
+            template_id=mock_template.id,
+        )
+        DegreeProgressCategory.create(
+            category_type='Category',
+            name='Breadth',
+            position=1,
+            template_id=mock_template.id,
+        )
+        fake_auth.login(coe_advisor_read_write_uid)
+        api_json = self._api_batch_degree_checks(client, sids=['11667051', '7890123456', '11667051'], template_id=mock_template.id)
+        assert len(api_json) == 2
+        degree_checks = DegreeProgressTemplate.query.filter_by(parent_template_id=mock_template.id, student_sid='11667051').all()
+        assert [d.id for d in degree_checks] == [api_json['11667051']]
+        assert DegreeProgressUnitRequirement.query.filter_by(template_id=api_json['11667051']).count() == 1
+        assert len(DegreeProgressCategory.get_categories(template_id=api_json['11667051'])) == 1
+
+    def test_create_batch_copies_template(self, client, fake_auth, mock_template):
+        """Each degree check in a batch gets its own copy of the template's unit requirements and categories."""
+        user = AuthorizedUser.find_by_uid(coe_advisor_read_write_uid)
+        unit_requirement = DegreeProgressUnitRequirement.create(
+            created_by=user.id,
+            min_units=12,
+            name='Lower division units',
+            template_id=mock_template.id,
+        )
+        category = DegreeProgressCategory.create(
+            category_type='Category',
+            name='Breadth',
+            position=1,
+            template_id=mock_template.id,
+            unit_requirement_ids=[unit_requirement.id],
+        )
+        subcategory = DegreeProgressCategory.create(
+            category_type='Subcategory',
+            name='Arts and Literature',
+            parent_category_id=category.id,
+            position=1,
+            template_id=mock_template.id,
+        )
+        for name in ['ART 8', 'ENGLISH 45A']:
+            DegreeProgressCategory.create(
+                category_type='Course Requirement',
+                course_units_lower=3,
+                course_units_upper=4,
+                name=name,
+                parent_category_id=subcategory.id,
+                position=1,
+                template_id=mock_template.id,
+                unit_requirement_ids=[unit_requirement.id],
+            )
+
+        def _tree(categories):
+            return [
+                {
+                    'categoryType': c['categoryType'],
+                    'children': _tree(c.get('subcategories', []) + c.get('courseRequirements', [])),
+                    'name': c['name'],
+                    'position': c['position'],
+                    'unitRequirements': [u['name'] for u in c['unitRequirements']],
+                    'units': (c['unitsLower'], c['unitsUpper']),
+                } for c in categories
+            ]
+        expected_tree = _tree(DegreeProgressCategory.get_categories(template_id=mock_template.id))
+
+        fake_auth.login(coe_advisor_read_write_uid)
+        student_sids = ['11667051', '7890123456']
+        api_json = self._api_batch_degree_checks(client, sids=student_sids, template_id=mock_template.id)
+        assert len(set(api_json.values())) == 2
+        for sid in student_sids:
+            degree_check_id = api_json[sid]
+            degree_check = DegreeProgressTemplate.find_by_id(degree_check_id)
+            assert degree_check.parent_template_id == mock_template.id
+            assert degree_check.degree_name == mock_template.degree_name
+            assert [(u.name, u.min_units) for u in DegreeProgressUnitRequirement.query.filter_by(template_id=degree_check_id)] == [
+                ('Lower division units', 12),
+            ]
+            categories = DegreeProgressCategory.get_categories(template_id=degree_check_id)
+            assert _tree(categories) == expected_tree
+            assert categories[0]['unitRequirements'][0]['templateId'] == degree_check_id
+
 
 class TestCreateStudentDegreeCheck:
 
@@ -27,10 +27,14 @@ ENHANCEMENTS, OR MODIFICATIONS.
 class TestStatusController:
     """Status API."""
 
-    def test_ping(self, client):
+    def test_ping(self, app, client):
         """Answers the phone when pinged."""
         response = client.get('/api/ping')
         assert response.status_code == 200
         assert response.json['app'] is True
         assert response.json['db'] is True
         assert response.json['data_loch'] is True
+        pool = response.json['data_loch_pool']
+        assert pool['checkouts'] > 0
+        assert pool['minConnections'] == app.config['DATA_LOCH_MIN_CONNECTIONS']
+        assert pool['exhausted'] == 0
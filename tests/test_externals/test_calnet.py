@@ -0,0 +1,84 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.externals import calnet
+import ldap3
+from ldap3.core.exceptions import LDAPServerPoolExhaustedError, LDAPSocketOpenError
+import mock
+import pytest
+
+uids = ['1133399', '2040', '53791', '95509', '177473', '90412', '1081940', '33333']
+
+
+class TestCalnetClient:
+    """LDAP client, searching mock CalNet fixtures."""
+
+    def test_search_in_batches(self, app):
+        """Ids are searched in batches, with results the same as those of a single search."""
+        client = calnet.client(app)
+        expected = client.search_uids(uids)
+        assert sorted(p['uid'] for p in expected) == sorted(uids)
+        with mock.patch.object(calnet, 'BATCH_QUERY_MAXIMUM', 3):
+            assert sorted(client.search_uids(uids), key=lambda p: p['uid']) == sorted(expected, key=lambda p: p['uid'])
+        assert [p['uid'] for p in client.search_csids(['800700600', '333333333', '999999999'])] == ['1133399', '33333']
+
+    def test_search_including_expired(self, app):
+        """A single search covers active and expired users, flagging each record found."""
+        search_filter = calnet.Client._ldap_search_filter(['2040'], 'uid', include_expired=True)
+        assert '(ou=people) (ou=advcon people) (ou=expired people)' in search_filter
+        persons = calnet.client(app).search_uids(['2040', 'no_such_uid'], include_expired=True)
+        assert len(persons) == 1
+        assert persons[0]['uid'] == '2040'
+        assert persons[0]['expired'] is False
+
+    def test_unavailable_server(self, app):
+        """An unavailable server fails the search after a bounded number of checks, and nothing is pooled."""
+        client = calnet.Client(app)
+        with mock.patch.object(ldap3.Server, 'check_availability', return_value=False) as check_availability:
+            with mock.patch('ldap3.core.pooling.sleep'):
+                with pytest.raises(LDAPServerPoolExhaustedError):
+                    client.search_uids(['2040'])
+        assert 1 <= check_availability.call_count <= calnet.SERVER_POOL_ACTIVE_TRIES
+        assert client.host not in calnet.pooled_connections
+
+    def test_failed_pooled_connection_dropped(self, app):
+        """A pooled connection that can no longer reach the server is dropped, so the next search rebuilds it."""
+        client = calnet.Client(app)
+        broken = mock.MagicMock()
+        broken.strategy.sync = True
+        broken.search.side_effect = LDAPSocketOpenError('unable to open socket')
+        calnet.pooled_connections[client.host] = broken
+        try:
+            with pytest.raises(LDAPSocketOpenError):
+                client.search_uids(['2040'])
+            assert client.host not in calnet.pooled_connections
+        finally:
+            calnet.pooled_connections.pop(client.host, None)
+
+    def test_expired_per_ou(self):
+        """Records are expired only when found solely in the expired scope."""
+        assert calnet._attributes_to_dict({'ou': ['Expired People'], 'uid': ['2040']})['expired'] is True
+        assert calnet._attributes_to_dict({'ou': ['people', 'expired people'], 'uid': ['2040']})['expired'] is False
+        assert calnet._attributes_to_dict({'uid': ['2040']}) == {**dict.fromkeys(calnet.SCHEMA_DICT.values()), 'uid': '2040', 'expired': False}
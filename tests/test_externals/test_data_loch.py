@@ -29,6 +29,7 @@ import io
 from boac.externals import data_loch
 from boac.lib.mockingdata import MockRows, register_mock
 import pytest
+from tests.util import override_config
 
 
 @pytest.mark.usefixtures('db_session')
@@ -235,6 +236,33 @@ class TestDataLoch:
         assert 'LEFT JOIN student.student_enrollment_terms set' in supplemental_query_tables
         assert 'ON set.sid = spi.sid AND set.term_id = \'2202\'' in supplemental_query_tables
 
+    def test_iter_enrollments_for_term(self, app):
+        """Streams the same rows as get_enrollments_for_term, as tuples, across fetch batches."""
+        rows = data_loch.get_enrollments_for_term('2178')
+        assert len(rows) > 1
+        with override_config(app, 'DATA_LOCH_FETCH_BATCH_SIZE', 1):
+            streamed = list(data_loch.iter_enrollments_for_term('2178'))
+        assert all(isinstance(row, tuple) for row in streamed)
+        assert sorted(streamed) == sorted((row['sid'], row['enrollment_term']) for row in rows)
+
+    def test_iter_active_student_profiles(self):
+        sids = [sid for sid, profile in data_loch.iter_active_student_profiles()]
+        assert '11667051' in sids
+
+    def test_iter_academic_standing_for_term(self):
+        standings = list(data_loch.iter_academic_standing_for_term('2178'))
+        assert ('11667051', 'PRO', '2017-12-30') in standings
+
+    def test_abandoned_stream_returns_connection(self):
+        """A stream closed before exhaustion releases its server-side cursor and pooled connection."""
+        in_use = data_loch.pool_stats()['inUse']
+        stream = data_loch.iter_enrollments_for_term('2178')
+        next(stream)
+        assert data_loch.pool_stats()['inUse'] == in_use + 1
+        stream.close()
+        assert data_loch.pool_stats()['inUse'] == in_use
+        assert data_loch.safe_execute_rds('SELECT 1 AS one') == [{'one': 1}]
+
     def test_override_fixture(self, app):
         mr = MockRows(io.StringIO('sid,first_name,last_name\n20000000,Martin,Van Buren'))
         with register_mock(data_loch.get_sis_section_enrollments, mr):
@@ -246,3 +274,38 @@ class TestDataLoch:
         no_db = data_loch.get_sis_section_enrollments(0, 0)
         # TODO Real data_loch queries will return an empty list if the course is not found.
         assert no_db is None
+
+
+class TestDataLochConnectionPool:
+
+    def test_pool_is_warm(self, app):
+        """Opens the minimum number of connections at startup."""
+        stats = data_loch.pool_stats()
+        assert stats['idle'] + stats['inUse'] >= app.config['DATA_LOCH_MIN_CONNECTIONS']
+
+    def test_discards_closed_connection(self):
+        """Closed connections are dropped from the pool rather than handed to the next query."""
+        pool = data_loch.connection_pool
+        discarded = pool.stats()['discarded']
+        connection = pool.checkout()
+        connection.close()
+        pool.checkin(connection)
+        assert pool.stats()['discarded'] == discarded + 1
+        assert data_loch.safe_execute_rds('SELECT 1 AS one') == [{'one': 1}]
+
+    def test_validates_idle_connection(self):
+        """Connections idle past the validation threshold are tested on checkout."""
+        pool = data_loch.connection_pool
+        connection = pool.checkout()
+        pool.checkin(connection)
+        pool.last_used[id(connection)] = 0
+        connection = pool.checkout()
+        assert not connection.closed
+        pool.checkin(connection)
+
+    def test_statement_timeout_per_query_class(self, app):
+        """Applies the statement timeout of the query class."""
+        timeouts = {'default': None, 'search': 1}
+        with override_config(app, 'DATA_LOCH_STATEMENT_TIMEOUTS', timeouts):
+            assert data_loch.safe_execute_rds('SELECT pg_sleep(0.1)', query_class='search') is None
+            assert data_loch.safe_execute_rds('SELECT pg_sleep(0.1)') is not None
@@ -0,0 +1,91 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from threading import Thread
+
+from boac.externals import s3
+import mock
+import pytest
+from tests.util import override_config
+
+
+bucket = 'photo-bucket'
+
+
+@pytest.fixture()
+def s3_clients():
+    s3.reset_clients()
+    yield
+    s3.reset_clients()
+
+
+@pytest.mark.usefixtures('s3_clients')
+class TestS3:
+
+    def test_credentials_reused_until_near_expiry(self, app):
+        with mock.patch.object(s3, '_assume_role', wraps=s3._assume_role) as assume_role:
+            s3.get_signed_urls(bucket, ['photo-path/61889.jpg'], 900)
+            s3.get_signed_urls(bucket, ['photo-path/98765.jpg'], 900)
+            assert assume_role.call_count == 1
+            # Credentials from the mock STS last 900 seconds, well inside this margin.
+            with override_config(app, 'AWS_CREDENTIALS_EXPIRY_MARGIN', 1000):
+                s3.get_signed_urls(bucket, ['photo-path/242881.jpg'], 900)
+            assert assume_role.call_count == 2
+
+    def test_client_per_thread(self, app):
+        clients = []
+
+        def _get_client():
+            with app.app_context():
+                clients.append(s3._get_client())
+        threads = [Thread(target=_get_client) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert s3._get_client() is s3._get_client()
+        assert len({id(c) for c in clients + [s3._get_client()]}) == 3
+
+    def test_signed_urls_reused(self, app):
+        keys = ['photo-path/61889.jpg', 'photo-path/98765.jpg']
+        with mock.patch.object(s3, '_get_signed_url', wraps=s3._get_signed_url) as get_signed_url:
+            urls = s3.get_signed_urls(bucket, keys, 900)
+            assert get_signed_url.call_count == 2
+            assert s3.get_signed_urls(bucket, keys + ['photo-path/242881.jpg'], 900) == {
+                **urls,
+                'photo-path/242881.jpg': mock.ANY,
+            }
+            assert get_signed_url.call_count == 3
+            # A different expiration calls for a new signature.
+            s3.get_signed_urls(bucket, keys[:1], 60)
+            assert get_signed_url.call_count == 4
+
+    def test_signed_urls_not_reused_when_disabled(self, app):
+        keys = ['photo-path/61889.jpg']
+        with override_config(app, 'S3_SIGNED_URL_REUSE_FRACTION', 0):
+            with mock.patch.object(s3, '_get_signed_url', wraps=s3._get_signed_url) as get_signed_url:
+                s3.get_signed_urls(bucket, keys, 900)
+                s3.get_signed_urls(bucket, keys, 900)
+                assert get_signed_url.call_count == 2
@@ -0,0 +1,69 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.lib import background
+import mock
+from tests.util import override_config
+
+
+class TestBackground:
+    """Background task execution."""
+
+    def test_debounced_requests_coalesce(self, app):
+        """Requests under the same key share one scheduled run; a request made after the run starts schedules another."""
+        method = mock.MagicMock()
+        with override_config(app, 'BACKGROUND_TASKS', True):
+            with mock.patch.object(background, 'Timer') as timer:
+                for _ in range(3):
+                    background.bg_execute_debounced('test_key', method, 5)
+                background.bg_execute_debounced('other_key', method, 5)
+                assert timer.call_count == 2
+                assert timer.call_args_list[0][0] == (5, background._debounced_executor)
+
+                run_kwargs = timer.call_args_list[0][1]['kwargs']
+                with mock.patch.object(background, '_bg_executor', return_value=True) as bg_executor:
+                    background._debounced_executor(**run_kwargs)
+                    bg_executor.assert_called_once_with(run_kwargs['app'], method)
+                background.bg_execute_debounced('test_key', method, 5)
+                assert timer.call_count == 3
+        background.debounced_keys.clear()
+
+    def test_debounced_run_retries_when_locked_out(self, app):
+        """A debounced run that cannot get the background lock is rescheduled rather than dropped."""
+        method = mock.MagicMock()
+        with mock.patch.object(background, 'Timer') as timer:
+            with mock.patch.object(background, '_bg_executor', return_value=False):
+                background._debounced_executor(app=app, key='test_key', method=method, delay=5)
+            assert timer.call_count == 1
+            assert 'test_key' in background.debounced_keys
+        background.debounced_keys.clear()
+
+    def test_debounce_runs_inline_without_background_tasks(self, app):
+        """With background tasks disabled, as under test, debounced methods run immediately."""
+        method = mock.MagicMock()
+        with mock.patch.object(background, 'Timer') as timer:
+            background.bg_execute_debounced('test_key', method, 5)
+            timer.assert_not_called()
+        method.assert_called_once()
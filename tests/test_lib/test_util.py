@@ -25,6 +25,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 
 from boac.lib import util
+from tests.util import override_config
 
 
 class TestUtil:
@@ -43,6 +44,16 @@ class TestUtil:
         assert util.titleize('bOw dOwn bEfOrE thE OnE yOu sErvE') == 'BOW Down Before the One YOU Serve'
         assert util.titleize('YOU\'RE GOING To GET WHAT (you) DESERVE') == 'You\'re Going to Get What (YOU) Deserve'
 
+    def test_search_result_text_snippet(self, app):
+        """Strips HTML and highlights stemmed matches within padding around the first match."""
+        pattern = util.TEXT_SEARCH_PATTERN
+        with override_config(app, 'NOTES_SEARCH_RESULT_SNIPPET_PADDING', 2):
+            text = '<p>One two three &amp; <b>confounding</b> five six seven</p>'
+            assert util.search_result_text_snippet(text, ['confounded'], pattern) == '...three & <strong>confounding</strong> five six...'
+            assert util.search_result_text_snippet('Confound it all', ['confounding'], pattern) == '<strong>Confound</strong> it all'
+            assert util.search_result_text_snippet('One two three four', ['nowhere'], pattern) == 'One two three...'
+            assert util.search_result_text_snippet('One two', ['nowhere'], pattern) == 'One two'
+
     def test_tolerant_remove(self):
         """Ignores error if item not found in list."""
         assert not util.tolerant_remove([], 'foo')
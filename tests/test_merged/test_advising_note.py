@@ -25,13 +25,15 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 from datetime import datetime, timedelta
 import io
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
+from boac.externals import data_loch
 from boac.merged.advising_note import get_advising_notes, get_zip_stream, search_advising_notes
 from boac.models.note import Note
 from dateutil.parser import parse
+import mock
 import pytz
-from tests.util import mock_legacy_note_attachment
+from tests.util import mock_legacy_note_attachment, override_config
 
 
 asc_advisor = '6446'
@@ -178,6 +180,15 @@ class TestMergedAdvisingNote:
         assert parse(cs_note['createdAt']) == parse('2017-11-02T12:00:00+00')
         assert parse(cs_note['updatedAt']) == parse('2017-11-02T13:00:00+00')
 
+    def test_get_advising_notes_omits_failed_source(self, app, mock_advising_note, fake_auth):
+        fake_auth.login(coe_advisor)
+        with mock.patch.object(data_loch, 'get_asc_advising_notes', side_effect=Exception('Loch is down')):
+            notes = get_advising_notes('11667051')
+        legacy_sources = {n.get('legacySource') for n in notes}
+        assert 'ASC' not in legacy_sources
+        assert {'CE3', 'Data Science', 'SIS'} <= legacy_sources
+        assert next((n for n in notes if n['id'] == mock_advising_note.id), None)
+
     def test_search_advising_notes(self, app, fake_auth):
         fake_auth.login(coe_advisor)
         notes = search_advising_notes(search_phrase='herostratus')
@@ -379,6 +390,18 @@ class TestMergedAdvisingNote:
         )
         assert len(search_advising_notes(search_phrase='loch')) == 1
 
+    def test_search_advising_notes_paginates_around_missing_students(self, app, fake_auth):
+        """Notes of a student missing from the loch are omitted without shifting later pages."""
+        fake_auth.login(coe_advisor)
+        _create_coe_advisor_note(sid='6767676767', subject='Quincunx', body='Quincunx note 0')
+        for i in range(1, 4):
+            _create_coe_advisor_note(sid='11667051', subject='Quincunx', body=f'Quincunx note {i}')
+        first_page = search_advising_notes(search_phrase='quincunx', offset=0, limit=2)
+        second_page = search_advising_notes(search_phrase='quincunx', offset=2, limit=2)
+        assert [n['noteSnippet'] for n in first_page + second_page] == [
+            f'<strong>Quincunx</strong> - <strong>Quincunx</strong> note {i}' for i in range(1, 4)
+        ]
+
     def test_search_advising_notes_narrowed_by_topic(self, app, fake_auth):
         for topic in ['Good Show', 'Bad Show']:
             _create_coe_advisor_note(
@@ -477,6 +500,20 @@ class TestMergedAdvisingNote:
                                   'False,Late Grading Basis Change,In Error,Fall 2020,' \
                                   '24460 PSYCH 110 - INTROD BIOL PSYCH 001'
 
+    def test_zipped_bundle_compression(self, app):
+        """Attachments that are already compressed are stored, and everything else deflated, unless configured otherwise."""
+        def _compress_types():
+            with mock_legacy_note_attachment(app):
+                sid = '9000000000'
+                stream = get_zip_stream(filename='advising_notes', notes=get_advising_notes(sid), student={'sid': sid})
+                zipfile = ZipFile(io.BytesIO(b''.join(stream)), 'r')
+                return {info.filename: info.compress_type for info in zipfile.infolist()}
+
+        with override_config(app, 'NOTES_DOWNLOAD_PREFETCH_DEPTH', 1):
+            assert _compress_types() == {'advising_notes.csv': ZIP_DEFLATED, 'dog_eaten_homework.pdf': ZIP_STORED}
+        with override_config(app, 'NOTES_DOWNLOAD_COMPRESSION', 'stored'):
+            assert _compress_types() == {'advising_notes.csv': ZIP_STORED, 'dog_eaten_homework.pdf': ZIP_STORED}
+
 
 def _create_coe_advisor_note(
     sid,
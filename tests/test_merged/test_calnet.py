@@ -0,0 +1,42 @@
+"""Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.externals import calnet as ldap_calnet
+from boac.merged import calnet
+from boac.models import json_cache
+import mock
+
+
+class TestMergedCalnetUser:
+    """Cached CalNet user feeds."""
+
+    def test_expired_user_cached_for_all_callers(self, app):
+        """An expired user is cached as such, then skipped only by callers who ask."""
+        json_cache.clear('calnet_user_for_uid_%')
+        expired = {**ldap_calnet._attributes_to_dict({'ou': ['expired people'], 'uid': ['777']}), 'first_name': 'Ex'}
+        with mock.patch.object(ldap_calnet.Client, 'search_uids', return_value=[expired]) as search_uids:
+            assert calnet.get_calnet_user_for_uid(app, '777', force_feed=False, skip_expired_users=True) is None
+            assert search_uids.call_args.kwargs['include_expired'] is True
+            assert calnet.get_calnet_user_for_uid(app, '777')['firstName'] == 'Ex'
+            assert search_uids.call_count == 1
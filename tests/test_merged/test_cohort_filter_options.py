@@ -0,0 +1,85 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.externals import data_loch
+from boac.lib.cohort_utils import colleges
+from boac.merged import cohort_filter_options
+from boac.merged.cohort_filter_options import CohortFilterOptions, get_option_catalog
+from boac.models import json_cache
+import mock
+import pytest
+from tests.util import override_config
+
+coe_advisor_uid = '1133399'
+
+
+@pytest.fixture()
+def option_catalog(app):
+    with override_config(app, 'JSON_CACHE_MEMORY_TTL', 60):
+        json_cache.clear('cohort_filter_options_%')
+        yield
+
+
+@pytest.mark.usefixtures('db_session')
+class TestOptionCatalog:
+    """Filter menu options built once per refresh."""
+
+    def test_stored_as_one_artifact(self):
+        """The catalog is stowed in a single json_cache row, with a version."""
+        json_cache.clear('cohort_filter_options_%')
+        catalog = get_option_catalog()
+        assert json_cache.fetch('cohort_filter_options_catalog') == catalog
+        assert catalog['version']
+        assert catalog['options']['colleges'] == colleges()
+
+    def test_base_json_skips_options(self):
+        """Serializing a cohort needs filter keys and types, not menu options."""
+        with mock.patch.object(cohort_filter_options, 'get_option_catalog') as get_catalog:
+            option_groups = CohortFilterOptions(coe_advisor_uid, ['COENG']).get_filter_option_groups()
+            assert [o['key'] for o in option_groups['Academic']][0:2] == ['academicStandings', 'academicCareerStatus']
+            assert get_catalog.call_count == 0
+
+    @pytest.mark.usefixtures('option_catalog')
+    def test_served_from_memory(self):
+        """Menus are populated without querying the loch, and callers get their own copies of options."""
+        get_option_catalog()
+        with mock.patch.object(data_loch, 'get_majors', wraps=data_loch.get_majors) as get_majors:
+            for i in range(2):
+                option_groups = CohortFilterOptions(coe_advisor_uid, ['COENG']).get_available_filter_option_groups('default')
+                majors = next(o for o in option_groups['Academic'] if o['key'] == 'majors')
+                majors['options'][0]['disabled'] = True
+            assert get_majors.call_count == 0
+        assert 'disabled' not in get_option_catalog()['options']['majors'][0]
+        keys = [o['key'] for option_group in option_groups.values() for o in option_group]
+        assert 'coeEthnicities' in keys
+        assert 'groupCodes' not in keys
+
+    @pytest.mark.usefixtures('option_catalog')
+    def test_cleared_on_refresh(self):
+        """Clearing cohort filter options from json_cache drops the in-memory catalog."""
+        catalog = get_option_catalog()
+        assert get_option_catalog() is catalog
+        json_cache.clear('cohort_filter_options_%')
+        assert get_option_catalog() is not catalog
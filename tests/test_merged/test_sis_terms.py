@@ -24,6 +24,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from boac.merged import sis_terms
+import mock
 from tests.util import override_config
 
 
@@ -78,3 +79,19 @@ class TestSisTerms:
         """Falls back on configured future term ID when not set to auto."""
         with override_config(app, 'CANVAS_FUTURE_ENROLLMENT_TERM', 'Summer 1969'):
             assert(sis_terms.future_term_id()) == '1695'
+
+    def test_term_snapshot_resolves_index_once(self):
+        """Resolves the current term index once per app context, however many term lookups follow."""
+        with mock.patch.object(sis_terms, 'get_current_term_index', wraps=sis_terms.get_current_term_index) as index_lookup:
+            for _ in range(20):
+                assert sis_terms.current_term_id() == '2178'
+                assert sis_terms.current_term_name() == 'Fall 2017'
+                assert sis_terms.future_term_id() == '2182'
+            assert index_lookup.call_count == 1
+
+    def test_term_snapshot_follows_config(self, app):
+        """Rebuilds the term snapshot when term configs change."""
+        assert sis_terms.current_term_id() == '2178'
+        with override_config(app, 'CANVAS_CURRENT_ENROLLMENT_TERM', 'Summer 1969'):
+            assert sis_terms.current_term_id() == '1695'
+        assert sis_terms.current_term_id() == '2178'
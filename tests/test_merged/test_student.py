@@ -23,7 +23,11 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-from boac.merged.student import get_course_student_profiles, get_distilled_student_profiles
+from boac.api.errors import BadRequestError
+from boac.externals import data_loch
+from boac.merged.student import get_course_student_profiles, get_distilled_student_profiles, query_students, search_for_students
+import mock
+import pytest
 
 
 coe_advisor = '1133399'
@@ -60,3 +64,54 @@ class TestMergedStudent:
         assert profiles[1]['sid'] == '2718281828'
         assert profiles[1]['uid'] == '27182'
         assert profiles[1]['underrepresented'] is None
+
+    def test_query_students_page_and_count_in_one_query(self):
+        """Page, total count and full SID list come from a single loch round-trip."""
+        criteria = {'group_codes': ['MFB-DB', 'MFB-DL', 'MFB-MLB', 'MFB-OLB'], 'order_by': 'last_name'}
+        all_sids = query_students(sids_only=True, **criteria)['sids']
+        assert len(all_sids) > 1
+        with mock.patch.object(data_loch, 'safe_execute_rds', wraps=data_loch.safe_execute_rds) as safe_execute_rds:
+            first_page = query_students(limit=1, **criteria)
+            cohort_queries = [c for c in safe_execute_rds.call_args_list if c.kwargs.get('query_class') == 'cohort']
+            assert len(cohort_queries) == 1
+        assert first_page['totalStudentCount'] == len(all_sids)
+        assert set(first_page['sids']) == set(all_sids)
+        assert len(first_page['students']) == 1
+
+        second_page = query_students(include_sids=False, limit=1, offset=1, **criteria)
+        assert 'sids' not in second_page
+        assert second_page['totalStudentCount'] == len(all_sids)
+        assert second_page['students'][0]['sid'] != first_page['students'][0]['sid']
+
+    def test_query_students_cursor_pagination(self):
+        """Pages fetched by cursor match pages fetched by offset, for ascending and descending sorts."""
+        for order_by in ['last_name', 'gpa desc', 'units']:
+            criteria = {'group_codes': ['MFB-DB', 'MFB-DL', 'MFB-MLB', 'MFB-OLB'], 'order_by': order_by}
+            total = query_students(sids_only=True, **criteria)['totalStudentCount']
+            by_offset = [s['sid'] for offset in range(total) for s in query_students(limit=1, offset=offset, **criteria)['students']]
+            by_cursor = []
+            cursor = None
+            for _ in range(total + 1):
+                page = query_students(cursor=cursor, include_sids=False, limit=1, **criteria)
+                by_cursor += [s['sid'] for s in page['students']]
+                cursor = page['nextCursor']
+                if not cursor:
+                    break
+            assert by_cursor == by_offset
+            # Asking for the full SID list brings the count along.
+            with_sids = query_students(cursor=query_students(limit=1, **criteria)['nextCursor'], include_sids=True, limit=1, **criteria)
+            assert with_sids['totalStudentCount'] == total
+            assert len(with_sids['sids']) == total
+            assert with_sids['students'][0]['sid'] == by_offset[1]
+
+    def test_search_for_students_cursor(self):
+        """Search results accept the cursor of a previous page, but not one issued for another sort order."""
+        first_page = search_for_students(search_phrase='dav', order_by='last_name', limit=1)
+        assert first_page['totalStudentCount'] == 3
+        assert first_page['students'][0]['lastName'] == 'Crossman'
+        second_page = search_for_students(search_phrase='dav', order_by='last_name', limit=1, cursor=first_page['nextCursor'])
+        # Pages after the first skip the count.
+        assert second_page['totalStudentCount'] is None
+        assert second_page['students'][0]['lastName'] == 'Davies'
+        with pytest.raises(BadRequestError):
+            search_for_students(search_phrase='dav', order_by='first_name', limit=1, cursor=first_page['nextCursor'])
@@ -0,0 +1,71 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.externals import data_loch
+from boac.merged import student_profile_cache
+from boac.merged.student import get_full_student_profiles
+import mock
+import pytest
+from tests.util import override_config
+
+
+@pytest.fixture()
+def profile_cache(app):
+    student_profile_cache.reset_profile_cache()
+    with override_config(app, 'STUDENT_PROFILE_CACHE_MAX_ENTRIES', 100):
+        with override_config(app, 'STUDENT_PROFILE_CACHE_GENERATION_CHECK_INTERVAL', 0):
+            yield
+    student_profile_cache.reset_profile_cache()
+
+
+@pytest.mark.usefixtures('profile_cache')
+class TestStudentProfileCache:
+    """Per-worker cache of decoded loch profiles."""
+
+    def test_cached_profiles_skip_the_loch(self):
+        """Repeat lookups are served from memory, as fresh copies."""
+        with mock.patch.object(data_loch, 'get_student_profiles', wraps=data_loch.get_student_profiles) as get_student_profiles:
+            first = get_full_student_profiles(['11667051', '2345678901'])
+            first[0]['sisProfile']['mutated'] = True
+            second = get_full_student_profiles(['11667051', '2345678901'])
+            assert get_student_profiles.call_count == 1
+        assert [p['sid'] for p in second] == ['11667051', '2345678901']
+        assert 'mutated' not in second[0]['sisProfile']
+        assert second[0]['athleticsProfile']
+
+    def test_missing_profiles_are_cached(self):
+        """SIDs with no profile of a given kind are remembered as such."""
+        with mock.patch.object(data_loch, 'get_coe_profiles', wraps=data_loch.get_coe_profiles) as get_coe_profiles:
+            assert student_profile_cache.get_decoded_profiles('coe', ['2345678901']) == {}
+            assert student_profile_cache.get_decoded_profiles('coe', ['2345678901']) == {}
+            assert get_coe_profiles.call_count == 1
+
+    def test_loch_generation_change_flushes(self):
+        """A change in the loch generation marker drops cached profiles."""
+        with mock.patch.object(data_loch, 'get_student_profiles_generation', side_effect=['1', '1', '2']):
+            with mock.patch.object(data_loch, 'get_student_profiles', wraps=data_loch.get_student_profiles) as get_student_profiles:
+                for _ in range(3):
+                    student_profile_cache.get_decoded_profiles('profile', ['11667051'])
+                assert get_student_profiles.call_count == 2
@@ -0,0 +1,112 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.merged.user_session import UserSession
+from boac.models.authorized_user import AuthorizedUser
+from boac.models.json_cache import get_memory_tier
+import pytest
+from tests.util import override_config
+
+admin_uid = '2040'
+asc_advisor_uid = '1081940'
+ce3_advisor_uid = '2525'
+coe_scheduler_uid = '6972201'
+deleted_user_uid = '33333'
+l_s_college_drop_in_advisor_uid = '53791'
+
+
+@pytest.fixture()
+def principal_cache(app):
+    with override_config(app, 'JSON_CACHE_MEMORY_TTL', 60):
+        get_memory_tier().flush()
+        yield
+
+
+@pytest.mark.usefixtures('db_session')
+class TestSessionPrincipal:
+    """Compact, cached summary of user permissions."""
+
+    def test_agrees_with_api_json(self):
+        """Principal-backed properties match the full session feed."""
+        for uid in [admin_uid, asc_advisor_uid, ce3_advisor_uid, coe_scheduler_uid, l_s_college_drop_in_advisor_uid]:
+            user_session = UserSession(AuthorizedUser.get_id_per_uid(uid))
+            api_json = user_session.to_api_json()
+            assert user_session.get_uid() == api_json['uid'] == uid
+            assert user_session.is_active is api_json['isActive']
+            assert bool(user_session.is_admin) is bool(api_json['isAdmin'])
+            assert user_session.can_access_advising_data is api_json['canAccessAdvisingData']
+            assert user_session.can_access_canvas_data is api_json['canAccessCanvasData']
+            assert bool(user_session.can_access_admitted_students) is bool(api_json['canAccessAdmittedStudents'])
+            assert bool(user_session.can_access_private_notes) is bool(api_json['canAccessPrivateNotes'])
+            assert user_session.can_edit_degree_progress is api_json['canEditDegreeProgress']
+            assert user_session.can_read_degree_progress is api_json['canReadDegreeProgress']
+            assert user_session.is_drop_in_advisor is bool(api_json['dropInAdvisorStatus'])
+            assert user_session.is_same_day_advisor is bool(api_json['sameDayAdvisorStatus'])
+            assert sorted(user_session.principal.department_roles) == sorted((d['code'], d['role']) for d in api_json['departments'])
+
+    def test_deleted_user(self):
+        """Deleted users get an inactive principal."""
+        user_session = UserSession(AuthorizedUser.get_id_per_uid(deleted_user_uid, include_deleted=True))
+        assert user_session.is_active is False
+        assert user_session.is_authenticated is False
+        assert user_session.get_uid() is None
+
+    def test_anonymous(self):
+        """Anonymous sessions have no permissions."""
+        user_session = UserSession()
+        assert user_session.is_authenticated is False
+        assert user_session.is_admin is False
+        assert user_session.principal.department_roles == ()
+
+    @pytest.mark.usefixtures('principal_cache')
+    def test_cached_without_api_json(self):
+        """Repeat sessions share a cached principal and never load the full feed."""
+        user_id = AuthorizedUser.get_id_per_uid(coe_scheduler_uid)
+        first = UserSession(user_id)
+        second = UserSession(user_id)
+        assert second.principal is first.principal
+        assert second.principal.department_roles == (('COENG', 'scheduler'),)
+        assert second.is_authenticated is True
+        assert first._api_json is None
+        assert second._api_json is None
+
+    @pytest.mark.usefixtures('principal_cache')
+    def test_flush_evicts(self):
+        """Flushing a user's session evicts the principal, and a newer version is loaded."""
+        user_id = AuthorizedUser.get_id_per_uid(admin_uid)
+        principal = UserSession(user_id).principal
+        other_principal = UserSession(AuthorizedUser.get_id_per_uid(coe_scheduler_uid)).principal
+        UserSession.flush_cache_for_id(user_id)
+        reloaded = UserSession(user_id).principal
+        assert reloaded is not principal
+        assert reloaded.version > principal.version
+        assert UserSession(AuthorizedUser.get_id_per_uid(coe_scheduler_uid)).principal is other_principal
+
+    @pytest.mark.usefixtures('principal_cache')
+    def test_flush_on_login(self):
+        """A session created with flush_cached reloads the principal."""
+        user_id = AuthorizedUser.get_id_per_uid(admin_uid)
+        principal = UserSession(user_id).principal
+        assert UserSession(user_id, flush_cached=True).principal is not principal
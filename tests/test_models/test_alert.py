@@ -28,6 +28,7 @@ from time import sleep
 
 from boac import std_commit
 from boac.models.alert import Alert
+from boac.models.authorized_user import AuthorizedUser
 import pytest
 from tests.util import override_config
 
@@ -181,6 +182,53 @@ class TestAlert:
         assert created_at.startswith(actual_action_date)
         assert academic_standing_alert['updatedAt'] == created_at
 
+    def test_refresh_all_for_term(self):
+        """Reactivates surviving alerts in place and deactivates the rest, same as deactivate-then-update."""
+        Alert.update_assignment_alerts(**alert_props)
+        Alert.update_all_for_term(2178)
+        ids_before = {a['alertType']: a['id'] for a in get_current_alerts('11667051')}
+        assert len(ids_before) == 3
+        sleep(1.0)
+        Alert.refresh_all_for_term(2178)
+        alerts = get_current_alerts('11667051')
+        assert len(alerts) == 2
+        assert {a['alertType']: a['id'] for a in alerts} == {
+            'academic_standing': ids_before['academic_standing'],
+            'midterm': ids_before['midterm'],
+        }
+        for alert in alerts:
+            assert alert['updatedAt'] == alert['createdAt']
+        stale_alert = Alert.query.filter_by(id=ids_before['missing_assignment']).first()
+        assert stale_alert.deleted_at is not None
+        no_activity_alerts = get_current_alerts('3456789012')
+        assert len(no_activity_alerts) == 1
+        assert no_activity_alerts[0]['updatedAt'] > no_activity_alerts[0]['createdAt']
+
+    def test_alert_counts_follow_dismissal_and_deactivation(self, create_alerts):
+        """Per-viewer alert counts track dismissals and deactivations."""
+        viewer_id = AuthorizedUser.find_by_uid('2040').id
+        other_viewer_id = AuthorizedUser.find_by_uid('1081940').id
+
+        def _alert_counts(viewer):
+            results = Alert.current_alert_counts_for_sids(lambda *args: None, viewer, ['11667051', '2345678901'], count_only=True)
+            return {r['sid']: r['alertCount'] for r in results}
+
+        counts = _alert_counts(viewer_id)
+        assert counts == _alert_counts(other_viewer_id)
+        assert counts['2345678901'] == 1
+        alert = Alert.query.filter_by(key='2178_800900300').first()
+        Alert.dismiss(alert.id, viewer_id)
+        assert _alert_counts(viewer_id) == {**counts, '11667051': counts['11667051'] - 1}
+        assert _alert_counts(other_viewer_id) == counts
+
+        Alert.query.filter_by(key='2178_100200300').first().deactivate()
+        assert '2345678901' not in _alert_counts(viewer_id)
+        # A dismissed alert stays dismissed once reactivated.
+        alert.deactivate()
+        alert.activate()
+        assert _alert_counts(viewer_id) == {'11667051': counts['11667051'] - 1}
+        assert _alert_counts(other_viewer_id) == {'11667051': counts['11667051']}
+
 
 class TestAssignmentAlert:
     """Assignment alerts."""
@@ -0,0 +1,95 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac import db
+from boac.models.advisor_author_index import AdvisorAuthorIndex
+from boac.models.appointment import Appointment
+from boac.models.authorized_user import AuthorizedUser
+import pytest
+from sqlalchemy.sql import text
+
+advisor_attrs = {
+    'deptCodes': ['COENG'],
+    'id': None,
+    'name': 'Ima Indexed',
+    'role': 'Advisor',
+    'uid': '1133399',
+}
+
+
+def _fts_index_row(appointment_id):
+    return db.session.execute(text('SELECT * FROM appointments_fts_index WHERE id = :id'), {'id': appointment_id}).first()
+
+
+def _indexed_advisor(advisor_name):
+    return AdvisorAuthorIndex.query.filter_by(advisor_name=advisor_name).first()
+
+
+@pytest.mark.usefixtures('db_session')
+class TestAppointmentSearchIndexes:
+    """Appointment and advisor search index rows are maintained as appointments change."""
+
+    def test_fts_index_follows_appointment(self):
+        """Full-text index row of an appointment follows its details, cancellation and deletion."""
+        user_id = AuthorizedUser.get_id_per_uid('6972201')
+        appointment = Appointment.create(
+            appointment_type='Drop-in',
+            created_by=user_id,
+            dept_code='COENG',
+            details='Incrementally indexed',
+            student_sid='11667051',
+        )
+        assert _fts_index_row(appointment.id)
+
+        Appointment.cancel(
+            appointment_id=appointment.id,
+            cancelled_by=user_id,
+            cancel_reason='Thunderstorm',
+            cancel_reason_explained=None,
+        )
+        assert [a['id'] for a in Appointment.search('thunderstorm')] == [appointment.id]
+
+        Appointment.delete(appointment.id)
+        assert _fts_index_row(appointment.id) is None
+        assert Appointment.search('thunderstorm') == []
+
+    def test_advisor_author_index_follows_assignment(self):
+        """Advisor names are indexed on assignment and dropped once no appointment or note carries them."""
+        user_id = AuthorizedUser.get_id_per_uid('6972201')
+        appointment = Appointment.create(
+            appointment_type='Drop-in',
+            created_by=user_id,
+            dept_code='COENG',
+            details='Who will take this one?',
+            student_sid='11667051',
+        )
+        assert _indexed_advisor('Ima Indexed') is None
+
+        Appointment.reserve(appointment_id=appointment.id, reserved_by=user_id, advisor_attrs=advisor_attrs)
+        assert _indexed_advisor('Ima Indexed').advisor_uid == '1133399'
+
+        Appointment.find_by_id(appointment.id).set_to_waiting(updated_by=user_id)
+        db.session.expire_all()
+        assert _indexed_advisor('Ima Indexed') is None
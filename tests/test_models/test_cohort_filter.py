@@ -27,6 +27,8 @@ from boac import std_commit
 from boac.api.errors import InternalServerError
 from boac.models.authorized_user import AuthorizedUser
 from boac.models.cohort_filter import CohortFilter
+from boac.models.cohort_filter_event import CohortFilterEvent
+import mock
 import pytest
 from tests.test_api.api_test_utils import all_cohorts_owned_by
 
@@ -167,6 +169,29 @@ class TestCohortFilter:
         assert admit_cohort
         assert admit_cohort.to_api_json()['name'] == expected_name
 
+    def test_refresh_all_sids_and_counts(self):
+        """Evaluates identical criteria once and records membership changes for every cohort sharing them."""
+        criteria = {'groupCodes': ['MFB-DB', 'MFB-DL']}
+        cohort_ids = [CohortFilter.create(uid=uid, name='Defensive line', filter_criteria=criteria)['id'] for uid in ('2040', '1022796')]
+        expected_sids = CohortFilter.get_sids(cohort_ids[0])
+        assert expected_sids
+        CohortFilter.query.filter(CohortFilter.id.in_(cohort_ids)).update({'sids': expected_sids[1:]}, synchronize_session=False)
+        std_commit(allow_test_environment=True)
+
+        from boac.models import cohort_filter
+        with mock.patch.object(cohort_filter, 'query_students', wraps=cohort_filter.query_students) as query_students:
+            CohortFilter.refresh_all_sids_and_counts()
+            criteria_evaluated = [call.kwargs['group_codes'] for call in query_students.call_args_list]
+        assert criteria_evaluated.count(criteria['groupCodes']) == 1
+        for cohort_id in cohort_ids:
+            assert set(CohortFilter.get_sids(cohort_id)) == set(expected_sids)
+            cohort = CohortFilter.query.filter_by(id=cohort_id).first()
+            assert cohort.student_count == len(expected_sids)
+            assert cohort.alert_count is not None
+            events = CohortFilterEvent.events_for_cohort(cohort_id)['events']
+            assert events[0].event_type == 'added'
+            assert events[0].sid == expected_sids[0]
+
 
 def cohort_count(user_uid):
     return len(all_cohorts_owned_by(user_uid))
@@ -82,3 +82,13 @@ class TestJobProgress:
         progress = JobProgress().get()
         assert progress['start'].startswith(str(date.today()))
         assert progress['term_id'] == '2178'
+
+    def test_checkpoints(self):
+        assert JobProgress().checkpoints() == set()
+        JobProgress().start({'term_id': '2178'})
+        JobProgress().checkpoint('2178:alerts', 12.3456)
+        progress = JobProgress().checkpoint('2178:alerts', 10)
+        assert progress['checkpoints'] == ['2178:alerts']
+        assert progress['step_durations'] == {'2178:alerts': 10}
+        assert progress['steps'][-1].endswith('2178:alerts completed in 10.0 seconds')
+        assert JobProgress().checkpoints() == {'2178:alerts'}
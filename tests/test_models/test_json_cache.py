@@ -0,0 +1,142 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac.models import json_cache
+from boac.models.json_cache import JsonCache, MemoryTier, stow
+import pytest
+from tests.util import override_config
+
+
+@stow('memory_tier_test_{value}')
+def _stowed_feed(value):
+    return {'value': value}
+
+
+@stow('negative_test_{value}', negative_ttl_config='CALNET_USER_NEGATIVE_CACHE_TTL')
+def _stowed_miss(value, calls):
+    calls.append(value)
+    return None
+
+
+@pytest.mark.usefixtures('db_session')
+class TestMemoryTier:
+    """In-process tier in front of the json_cache table."""
+
+    def test_lru_eviction(self):
+        tier = MemoryTier(max_entries=2, ttl=60)
+        tier.put('a', 1)
+        tier.put('b', 2)
+        assert tier.get('a') == (True, 1)
+        tier.put('c', 3)
+        assert tier.get('b') == (False, None)
+        assert tier.get('a') == (True, 1)
+        assert tier.stats() == {'entries': 2, 'hits': 2, 'misses': 1}
+
+    def test_ttl_expiry(self):
+        tier = MemoryTier(max_entries=10, ttl=-1)
+        tier.put('a', 1)
+        assert tier.get('a') == (False, None)
+
+    def test_evict_by_key_like(self):
+        tier = MemoryTier(max_entries=10, ttl=60)
+        for key in ['calnet_user_for_uid_1', 'calnet_user_for_uid_2', 'calnet_user_for_csid_1', 'current_term_index']:
+            tier.put(key, {})
+        tier.evict('calnet_user_for_uid_%')
+        assert tier.get('calnet_user_for_uid_1')[0] is False
+        assert tier.get('calnet_user_for_uid_2')[0] is False
+        assert tier.get('calnet_user_for_csid_1')[0] is True
+        assert tier.get('current_term_index')[0] is True
+
+    def test_returns_copies(self):
+        tier = MemoryTier(max_entries=10, ttl=60)
+        tier.put('a', {'list': [1]})
+        tier.get('a')[1]['list'].append(2)
+        assert tier.get('a')[1] == {'list': [1]}
+
+    def test_stow_skips_db_on_hit(self, app):
+        with override_config(app, 'JSON_CACHE_MEMORY_TTL', 60):
+            json_cache.get_memory_tier().flush()
+            assert _stowed_feed('foo') == {'value': 'foo'}
+            # Remove the DB row behind the memory tier's back: the memory tier still answers.
+            JsonCache.query.filter_by(key='memory_tier_test_foo').delete()
+            assert _stowed_feed('foo') == {'value': 'foo'}
+            assert json_cache.memory_tier_stats()['hits'] >= 1
+
+    def test_clear_evicts_memory_tier(self, app):
+        with override_config(app, 'JSON_CACHE_MEMORY_TTL', 60):
+            tier = json_cache.get_memory_tier()
+            tier.flush()
+            _stowed_feed('bar')
+            assert tier.get('memory_tier_test_bar')[0] is True
+            json_cache.clear('memory_tier_test_%')
+            assert tier.get('memory_tier_test_bar')[0] is False
+            assert JsonCache.query.filter_by(key='memory_tier_test_bar').first() is None
+
+
+@pytest.mark.usefixtures('db_session')
+class TestInsertRows:
+    """Bulk insert of cache rows."""
+
+    def test_existing_rows_kept(self):
+        json_cache.insert_row('bulk_test_1', {'value': 'old'})
+        count = json_cache.insert_rows({'bulk_test_1': {'value': 'new'}, 'bulk_test_2': {'value': 'new'}})
+        assert count == 1
+        assert json_cache.fetch_bulk(['bulk_test_1', 'bulk_test_2']) == {
+            'bulk_test_1': {'value': 'old'},
+            'bulk_test_2': {'value': 'new'},
+        }
+
+    def test_existing_rows_updated(self, app):
+        with override_config(app, 'JSON_CACHE_MEMORY_TTL', 60):
+            tier = json_cache.get_memory_tier()
+            tier.put('bulk_test_1', {'value': 'old'})
+            json_cache.insert_row('bulk_test_1', {'value': 'old'})
+            count = json_cache.insert_rows({'bulk_test_1': {'value': 'new'}, 'bulk_test_2': {'value': 'new'}}, update_existing=True)
+            assert count == 2
+            assert json_cache.fetch('bulk_test_1') == {'value': 'new'}
+            assert tier.get('bulk_test_1')[0] is False
+
+
+@pytest.mark.usefixtures('db_session')
+class TestExpiry:
+    """Per-key TTLs and negative entries."""
+
+    def test_negative_entries(self, app):
+        calls = []
+        assert _stowed_miss('foo', calls) is None
+        assert _stowed_miss('foo', calls) is None
+        assert calls == ['foo']
+        with override_config(app, 'CALNET_USER_NEGATIVE_CACHE_TTL', 0):
+            assert _stowed_miss('bar', calls) is None
+            assert _stowed_miss('bar', calls) is None
+        assert calls == ['foo', 'bar', 'bar']
+
+    def test_expire_keeps_negative_entries(self):
+        json_cache.insert_rows({'expiry_test_1': {'value': 1}})
+        json_cache.insert_rows({'expiry_test_2': None}, ttl=60)
+        json_cache.expire('expiry_test_%', keep_negative=True)
+        assert json_cache.fetch_bulk(['expiry_test_1', 'expiry_test_2']) == {'expiry_test_2': None}
+        json_cache.insert_rows({'expiry_test_1': {'value': 2}})
+        assert json_cache.fetch('expiry_test_1') == {'value': 2}
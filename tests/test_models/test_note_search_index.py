@@ -0,0 +1,84 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from boac import db
+from boac.externals import data_loch
+from boac.models.note import Note
+from boac.models.note_search_index import NoteSearchIndex
+import mock
+import pytest
+from sqlalchemy.sql import text
+
+coe_advisor = '1133399'
+
+
+def _index_row(source, note_id):
+    return NoteSearchIndex.query.filter_by(source=source, note_id=str(note_id)).first()
+
+
+@pytest.mark.usefixtures('db_session')
+class TestNoteSearchIndex:
+    """Unified search index of BOA and legacy advising notes."""
+
+    def test_boa_note_lifecycle(self):
+        """Index rows of BOA notes follow creation, update and deletion."""
+        note = Note.create(
+            author_uid=coe_advisor,
+            author_name='Balloon Man',
+            author_role='Spherical',
+            author_dept_codes=['COENG'],
+            sid='11667051',
+            subject='Indexed subject',
+            body='Indexed body',
+            topics=['Good Show'],
+        )
+        row = _index_row('boa', note.id)
+        assert row.snippet_source == 'Indexed subject - Indexed body'
+        assert row.topics == ['Good Show']
+        assert row.author_uid == coe_advisor
+
+        Note.update(note_id=note.id, subject='Revised subject', body='Revised body', topics=[])
+        db.session.expire_all()
+        row = _index_row('boa', note.id)
+        assert row.snippet_source == 'Revised subject - Revised body'
+        assert row.topics == []
+
+        Note.delete(note.id)
+        assert _index_row('boa', note.id) is None
+
+    def test_loch_sync_fetches_only_changed_notes(self):
+        """Syncing with the loch fetches only notes whose content hash differs from that of the index row."""
+        fetch = data_loch.get_advising_note_search_rows
+        with mock.patch.object(data_loch, 'get_advising_note_search_rows', wraps=fetch) as get_rows:
+            NoteSearchIndex.sync_loch_notes()
+            get_rows.assert_not_called()
+
+            db.session.execute(text("DELETE FROM note_search_index WHERE source = 'loch' AND note_id = '11667051-00003'"))
+            db.session.execute(text("UPDATE note_search_index SET content_hash = 'stale' WHERE source = 'loch' AND note_id = '11667051-00001'"))
+            NoteSearchIndex.sync_loch_notes()
+            get_rows.assert_called_once_with(['11667051-00001', '11667051-00003'])
+        db.session.expire_all()
+        assert _index_row('loch', '11667051-00003').author_sid == '600500400'
+        assert _index_row('loch', '11667051-00001').content_hash != 'stale'